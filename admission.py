@@ -0,0 +1,275 @@
+# AI调用准入控制模块
+# 该文件为每个上游（模型 + 接口地址）提供并发上限、令牌桶限速和有界等待队列，
+# 队列已满或等待超时时立即失败（UpstreamBusyError，接口返回503），
+# 并提供遵循 Retry-After 的抖动指数退避重试
+
+from contextlib import contextmanager
+import random
+import threading
+import time
+import requests
+from config import config
+from metrics import llm_retries
+from utils.logger import setup_logger
+from utils.stats import register_stats
+
+# 设置日志
+logger = setup_logger(__name__)
+
+# 可重试的上游状态码
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class UpstreamBusyError(Exception):
+    """上游繁忙异常（等待队列已满或等待超时）"""
+
+    def __init__(self, upstream, retry_after=None):
+        """初始化异常
+
+        Args:
+            upstream (str): 上游标识
+            retry_after (int): 建议客户端重试的等待秒数
+        """
+        super().__init__('当前分析请求过多，请稍后再试')
+        self.upstream = upstream
+        self.retry_after = retry_after or config.ADMISSION_RETRY_AFTER
+
+
+class TokenBucket:
+    """令牌桶限速器"""
+
+    def __init__(self, rate, capacity):
+        """初始化令牌桶
+
+        Args:
+            rate (float): 每秒补充的令牌数
+            capacity (int): 桶容量（允许的突发请求数）
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """取出一个令牌，令牌不足时等待
+
+        Args:
+            timeout (float): 最长等待时间（秒）
+
+        Returns:
+            bool: 是否取得令牌
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class UpstreamLimiter:
+    """单个上游的并发上限和请求速率控制
+
+    限制按进程生效，多进程部署时总并发为 进程数 × 上限。
+    """
+
+    def __init__(self, name, max_concurrency, rate, burst, max_queue, model=None):
+        """初始化限制器
+
+        Args:
+            name (str): 上游标识
+            max_concurrency (int): 最大并发请求数
+            rate (float): 每秒请求数
+            burst (int): 允许的突发请求数
+            max_queue (int): 最多排队等待的请求数
+            model (str): 模型名称（监控指标的标签）
+        """
+        self.name = name
+        self.model = model or name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.bucket = TokenBucket(rate, burst)
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    def _reject(self):
+        """记录拒绝并抛出上游繁忙异常"""
+        with self._lock:
+            self.rejected += 1
+        logger.warning(f'上游 {self.name} 繁忙，拒绝请求')
+        raise UpstreamBusyError(self.name)
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """占用一个并发名额，退出时释放
+
+        Args:
+            timeout (float): 最长排队时间（秒），默认使用 ADMISSION_WAIT_TIMEOUT
+
+        Raises:
+            UpstreamBusyError: 等待队列已满或等待超时
+        """
+        timeout = config.ADMISSION_WAIT_TIMEOUT if timeout is None else timeout
+        with self._lock:
+            if self.waiting >= self.max_queue:
+                full = True
+            else:
+                full = False
+                self.waiting += 1
+        if full:
+            self._reject()
+
+        start = time.monotonic()
+        try:
+            acquired = self._semaphore.acquire(timeout=timeout)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+        if not acquired:
+            self._reject()
+
+        try:
+            if not self.bucket.acquire(max(timeout - (time.monotonic() - start), 0)):
+                self._reject()
+        except UpstreamBusyError:
+            self._semaphore.release()
+            raise
+
+        with self._lock:
+            self.active += 1
+            self.admitted += 1
+            self.wait_seconds += time.monotonic() - start
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._semaphore.release()
+
+    def throttle(self):
+        """在同一并发名额内发起下一次请求（重试）前再取一个令牌"""
+        if not self.bucket.acquire(config.ADMISSION_WAIT_TIMEOUT):
+            self._reject()
+
+    def stats(self):
+        """返回限制器统计信息"""
+        with self._lock:
+            return {
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'avg_wait': round(self.wait_seconds / self.admitted, 4) if self.admitted else 0.0,
+                'max_concurrency': self.max_concurrency
+            }
+
+
+# 上游标识 -> 限制器
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(model, api_url=None):
+    """获取模型和接口地址对应的限制器
+
+    Args:
+        model (str): 模型名称
+        api_url (str): 接口地址，为None时表示 api.py 内置调用
+
+    Returns:
+        UpstreamLimiter: 限制器
+    """
+    name = f"{model}@{api_url or 'api.py'}"
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = UpstreamLimiter(name,
+                                      config.ADMISSION_MAX_CONCURRENCY,
+                                      config.ADMISSION_RATE,
+                                      config.ADMISSION_BURST,
+                                      config.ADMISSION_MAX_QUEUE,
+                                      model=model)
+            _limiters[name] = limiter
+    return limiter
+
+
+def backoff_delay(attempt, retry_after=None):
+    """计算第 attempt 次重试前的等待时间
+
+    优先使用上游给出的 Retry-After，否则使用全抖动指数退避：
+    在 [0, min(上限, 基数 × 2^attempt)] 内随机取值，避免大量请求同时重试。
+
+    Args:
+        attempt (int): 已失败的次数（从0开始）
+        retry_after (str): 响应头 Retry-After 的值（秒数）
+
+    Returns:
+        float: 等待秒数
+    """
+    if retry_after:
+        try:
+            return min(float(retry_after), config.AI_BACKOFF_MAX)
+        except ValueError:
+            pass
+    return random.uniform(0, min(config.AI_BACKOFF_MAX, config.AI_BACKOFF_BASE * (2 ** attempt)))
+
+
+def send_with_retry(limiter, send):
+    """在已占用的并发名额内发送请求，对限流、上游错误和网络异常进行退避重试
+
+    Args:
+        limiter (UpstreamLimiter): 当前上游的限制器
+        send (callable): 发送请求的函数，返回 requests.Response
+
+    Returns:
+        requests.Response: 状态码正常的响应
+
+    Raises:
+        requests.RequestException: 重试次数用尽后仍失败
+    """
+    attempt = 0
+    while True:
+        retry_after = None
+        try:
+            response = send()
+            if response.status_code not in RETRYABLE_STATUS:
+                response.raise_for_status()
+                return response
+            retry_after = response.headers.get('Retry-After')
+            error = requests.HTTPError(f'{response.status_code} Error: {response.reason}', response=response)
+            response.close()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = e
+
+        if attempt >= config.AI_MAX_RETRIES:
+            raise error
+        reason = str(error.response.status_code) if isinstance(error, requests.HTTPError) else type(error).__name__
+        llm_retries.inc(model=limiter.model, reason=reason)
+        delay = backoff_delay(attempt, retry_after)
+        logger.warning(f'上游 {limiter.name} 请求失败（{str(error)}），{delay:.1f}秒后第{attempt + 1}次重试')
+        time.sleep(delay)
+        limiter.throttle()
+        attempt += 1
+
+
+def admission_stats():
+    """返回所有限制器的统计信息"""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
+
+
+register_stats('admission', admission_stats)
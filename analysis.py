@@ -0,0 +1,660 @@
+# 六爻分析流程模块
+# 该文件定义了解卦流水线的各个阶段及其依赖关系，并负责保存解卦记录
+
+from collections import defaultdict
+from datetime import datetime
+import threading
+import uuid
+import json
+from sqlalchemy.orm import undefer_group
+from models import db, Hexagram, HexagramRecord
+from pipeline import Stage, StagePipeline
+from shuzilianghua import shuzilianghua_batch
+from hexagram_parser import extract_shuzi_inputs, HexagramParseError
+from hexagram_store import hexagram_store
+from llm_client import resolve_endpoint, stream_ai
+from llm_cache import llm_cache, cached_ai, make_cache_key
+from config import config
+from metrics import llm_call, llm_invalid_responses
+from utils import jsoncodec
+from utils.logger import setup_logger
+from utils.stats import register_stats
+
+# 设置日志
+logger = setup_logger(__name__)
+
+# 完整记录JSON中卦象信息的占位（引用卦象表的记录不保存卦象信息副本）
+HEXAGRAM_PLACEHOLDER = '"hexagram_info":null'
+
+# 阶段名称（按页面展示顺序）
+STAGES = ['yongshen', 'yongshen_guli', 'dongyao_guli', 'shuzi_lianghua', 'zonghe_jiedu']
+
+# 分析模式：staged 各阶段分别请求；fast 一次请求返回全部阶段，未通过校验的阶段再单独请求
+MODES = ('staged', 'fast')
+
+# 地支
+DIZHI = frozenset('子丑寅卯辰巳午未申酉戌亥')
+
+# 用神卦理分析结果的字段
+YONGSHEN_GULI_FIELDS = ('月建关系', '日辰关系', '动爻关系', '特殊状态', '回头生克', '原神忌神', '旺衰评估')
+
+
+class AnalysisError(Exception):
+    """分析失败异常（如AI响应无法解析）"""
+    pass
+
+
+def _is_valid_json(result, valid):
+    """判断AI返回的文本是否为合法JSON且通过阶段校验（未通过的响应不写入缓存）"""
+    try:
+        return valid(json.loads(result))
+    except (TypeError, json.JSONDecodeError):
+        return False
+
+
+def _valid_yongshen(section):
+    """校验用神判断结果"""
+    return (isinstance(section, dict) and isinstance(section.get('text'), str) and section['text'].strip() != ''
+            and isinstance(section.get('yiju'), str))
+
+
+def _valid_yongshen_guli(section):
+    """校验用神卦理分析结果"""
+    return isinstance(section, dict) and all(isinstance(section.get(name), str) for name in YONGSHEN_GULI_FIELDS)
+
+
+def _valid_dongyao_guli(section):
+    """校验动爻卦理分析结果"""
+    return (isinstance(section, dict) and isinstance(section.get('有动爻'), bool)
+            and isinstance(section.get('动爻列表'), list) and all(isinstance(item, dict) for item in section['动爻列表']))
+
+
+def _valid_shuzi_lianghua(section):
+    """校验数字量化提取结果（地支必须合法）"""
+    return (isinstance(section, dict) and all(section.get(name) in DIZHI for name in ('月建', '日辰', '用神'))
+            and isinstance(section.get('动爻列表'), list) and all(dizhi in DIZHI for dizhi in section['动爻列表']))
+
+
+def _valid_zonghe_jiedu(section):
+    """校验综合解读"""
+    return isinstance(section, str) and section.strip() != ''
+
+
+# 各阶段结果的校验函数（快速模式取用组合结果、分阶段请求决定是否纠正重试时使用）
+SECTION_VALIDATORS = {
+    'yongshen': _valid_yongshen,
+    'yongshen_guli': _valid_yongshen_guli,
+    'dongyao_guli': _valid_dongyao_guli,
+    'shuzi_lianghua': _valid_shuzi_lianghua,
+    'zonghe_jiedu': _valid_zonghe_jiedu
+}
+
+
+def parse_combined(result):
+    """解析快速模式的组合响应，逐个阶段校验
+
+    响应被 ``` 代码块包裹或前后带有说明文字时，取第一个 { 到最后一个 } 之间的内容。
+
+    Args:
+        result (str): AI返回的文本
+
+    Returns:
+        dict: 通过校验的阶段结果（未通过校验的阶段不包含在内）
+    """
+    text = result or ''
+    start, end = text.find('{'), text.rfind('}')
+    try:
+        data = json.loads(text[start:end + 1]) if 0 <= start < end else None
+    except json.JSONDecodeError:
+        data = None
+    if not isinstance(data, dict):
+        return {}
+    return {name: data[name] for name, valid in SECTION_VALIDATORS.items() if valid(data.get(name))}
+
+
+def resolve_mode(mode, model):
+    """确定分析模式
+
+    Args:
+        mode (str): 请求指定的模式，为空时按模型配置（FAST_MODE_MODELS），再使用默认模式（ANALYSIS_MODE）
+        model (str): 使用的模型
+
+    Returns:
+        str: staged 或 fast
+
+    Raises:
+        ValueError: 不支持的模式
+    """
+    if mode:
+        if mode not in MODES:
+            raise ValueError(f'不支持的分析模式: {mode}')
+        return mode
+    return 'fast' if model in config.FAST_MODE_MODELS else config.ANALYSIS_MODE
+
+
+class FastModeStats:
+    """快速模式统计：组合请求次数和各阶段通过校验、改为单独处理的次数"""
+
+    def __init__(self):
+        """初始化统计"""
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.sections = defaultdict(lambda: {'ok': 0, 'fallback': 0})
+
+    def record_request(self):
+        """记录一次组合请求"""
+        with self._lock:
+            self.requests += 1
+
+    def record_section(self, name, ok):
+        """记录一个阶段使用了组合结果（ok），或因未通过校验改为单独处理（fallback）"""
+        with self._lock:
+            self.sections[name]['ok' if ok else 'fallback'] += 1
+
+    def stats(self):
+        """返回统计信息（failure_rate 为未通过校验、需要单独处理的比例）"""
+        with self._lock:
+            sections = {name: dict(counts) for name, counts in self.sections.items()}
+            requests = self.requests
+        for counts in sections.values():
+            total = counts['ok'] + counts['fallback']
+            counts['failure_rate'] = round(counts['fallback'] / total, 4) if total else 0.0
+        return {'requests': requests, 'sections': sections}
+
+
+# 全局快速模式统计
+fast_mode_stats = FastModeStats()
+register_stats('fast_mode', fast_mode_stats.stats)
+
+
+def build_pipeline(question, hexagram_info, model, user_yongshen='', on_delta=None, user_id=None, cancel=None,
+                   bypass_cache=False, mode=None):
+    """构建解卦流水线
+
+    依赖关系：
+        yongshen、dongyao_guli 无依赖，可同时开始；
+        yongshen_guli、shuzi_lianghua 仅依赖 yongshen；
+        zonghe_jiedu 依赖以上全部阶段。
+
+    Args:
+        question (str): 问题
+        hexagram_info (str): 卦象信息
+        model (str): 使用的模型
+        user_yongshen (str): 用户指定的用神（可为空）
+        on_delta (callable): 综合解读的增量文本回调，给出时综合解读阶段使用流式调用
+        user_id (int): 用户ID，用于查找自定义模型的接口地址
+        cancel (threading.Event): 取消标志，置位后中断流式调用
+        bypass_cache (bool): 强制重新分析，不读取AI响应缓存
+        mode (str): 分析模式（staged 或 fast），为空时按模型配置确定，见 resolve_mode
+
+    Returns:
+        StagePipeline: 解卦流水线
+    """
+    from prompt import (yongshen_prompt, yongshen_guli_prompt, dongyao_guli_prompt,
+                        shuzi_lianghua_prompt, zonghe_jiedu_prompt, fast_analysis_prompt, json_repair_prompt)
+
+    # 接口地址需要在构建时（应用上下文中）确定，同时参与缓存键计算
+    endpoint = resolve_endpoint(model, user_id)
+    endpoint_url = endpoint[0] if endpoint else ''
+
+    def ask(text, agent, stage):
+        # 响应无法解析或未通过校验时，附上原因和原响应单独重新请求该阶段（最多 STAGE_REPAIR_ATTEMPTS 次），
+        # 被丢弃的上游响应计入 wasted_calls
+        valid = SECTION_VALIDATORS[stage]
+        prompt = text
+        for attempt in range(config.STAGE_REPAIR_ATTEMPTS + 1):
+            fetched = []
+            result = cached_ai(prompt, model, agent, stage, endpoint=endpoint, bypass=bypass_cache,
+                               validate=lambda result: _is_valid_json(result, valid),
+                               on_upstream=lambda: fetched.append(True))
+            pipeline.count('upstream_calls', len(fetched))
+            try:
+                data = json.loads(result)
+            except (TypeError, json.JSONDecodeError) as e:
+                data, problem = None, f'不是合法的JSON（{str(e)}）'
+            else:
+                if valid(data):
+                    if attempt:
+                        pipeline.count('repaired_stages')
+                    return data
+                problem = '缺少要求的字段或字段格式不正确'
+            if fetched:
+                llm_invalid_responses.inc(stage=stage, model=model, reason='json' if data is None else 'schema')
+            if data is None or attempt < config.STAGE_REPAIR_ATTEMPTS:
+                pipeline.count('wasted_calls', len(fetched))
+            if attempt < config.STAGE_REPAIR_ATTEMPTS:
+                logger.warning(f'阶段 {stage} 的响应{problem}，使用纠正提示重新请求')
+                prompt = json_repair_prompt.format(text=text, problem=problem, reply=(result or '')[:2000])
+        if data is None:
+            raise AnalysisError(f'无法解析AI响应 - {problem}')
+        # 纠正后仍缺少字段时沿用可以解析的结果，与之前的行为一致
+        return data
+
+    # 卦象的解析结果保存在卦象表中，每个不同的卦象只解析一次；无法本地解析时数字量化阶段回退到AI提取
+    hexagram = hexagram_store.get(hexagram_info)
+    hexagram_info = hexagram.content
+    parsed = hexagram.parsed
+
+    # 1. 用神判断（优先使用用户指定用神）
+    def yongshen(results):
+        if user_yongshen:
+            return {
+                'text': user_yongshen,
+                'yiju': f'用户指定用神为：{user_yongshen}'
+            }
+        return ask(f"问题：{question}\n卦象信息：{hexagram_info}", yongshen_prompt, 'yongshen')
+
+    # 2. 用神卦理分析
+    def yongshen_guli(results):
+        return ask(
+            f"问题：{question}\n卦象信息：{hexagram_info}\n已确定用神：{results['yongshen']['text']}",
+            yongshen_guli_prompt,
+            'yongshen_guli'
+        )
+
+    # 3. 动爻卦理分析
+    def dongyao_guli(results):
+        return ask(
+            f"卦象信息：{hexagram_info}",
+            dongyao_guli_prompt,
+            'dongyao_guli'
+        )
+
+    # 4. 数字量化分析（优先从卦象信息中直接提取，无法提取时使用快速模式已返回的提取结果或调用AI）
+    def shuzi_lianghua(results, extracted=None):
+        if parsed is not None:
+            try:
+                return compute_strengths(extract_shuzi_inputs(parsed, results['yongshen']['text']))
+            except HexagramParseError as e:
+                logger.warning(f'用神地支无法本地确定，数字量化将使用AI提取: {str(e)}')
+        if extracted is not None:
+            return compute_strengths(extracted)
+        data = ask(
+            f"卦象信息：{hexagram_info}\n已确定用神：{results['yongshen']['text']}",
+            shuzi_lianghua_prompt,
+            'shuzi_lianghua'
+        )
+        return compute_strengths(data)
+
+    # 5. 综合解读
+    def zonghe_jiedu(results):
+        shuzi = results['shuzi_lianghua']
+        text = f"问题：{question}\n卦象信息：{hexagram_info}\n用神判断：{results['yongshen']['text']}\n用神卦理：{json.dumps(results['yongshen_guli'], ensure_ascii=False)}\n动爻卦理：{json.dumps(results['dongyao_guli'], ensure_ascii=False)}\n数字量化：月建={shuzi['月建']}，日辰={shuzi['日辰']}，用神地支={shuzi['用神']}，用神指数={shuzi['用神指数']['总指数']}"
+        if on_delta is None:
+            return cached_ai(text, model, zonghe_jiedu_prompt, 'zonghe_jiedu', endpoint=endpoint,
+                             bypass=bypass_cache, on_upstream=lambda: pipeline.count('upstream_calls'))
+
+        # 命中缓存时一次性输出完整解读
+        key = make_cache_key(model, zonghe_jiedu_prompt, text, endpoint_url)
+        if bypass_cache:
+            llm_cache.record_bypass('zonghe_jiedu')
+        else:
+            cached = llm_cache.get(key, 'zonghe_jiedu')
+            if cached is not None:
+                on_delta(cached)
+                return cached
+
+        # 流式输出：逐段回调增量文本，结束后返回完整解读
+        # 流式调用仅在配置了接口地址时使用，否则 stream_ai 回退到 api.AI
+        chunks = []
+        pipeline.count('upstream_calls')
+        with llm_call('zonghe_jiedu', model):
+            for chunk in stream_ai(text, model, zonghe_jiedu_prompt, endpoint=endpoint, cancel=cancel):
+                chunks.append(chunk)
+                on_delta(chunk)
+        result = ''.join(chunks)
+        if cancel is None or not cancel.is_set():
+            llm_cache.set(key, result, 'zonghe_jiedu', model)
+        return result
+
+    stage_funcs = {
+        'yongshen': yongshen,
+        'dongyao_guli': dongyao_guli,
+        'yongshen_guli': yongshen_guli,
+        'shuzi_lianghua': shuzi_lianghua,
+        'zonghe_jiedu': zonghe_jiedu
+    }
+
+    # 快速模式：最先开始的阶段发送组合请求（卦象信息只发送一次），同时开始的阶段等待其结果；
+    # 各阶段取组合结果中通过校验的部分，未通过校验的阶段按上面的方式单独请求
+    if resolve_mode(mode, model) == 'fast':
+        lock = threading.Lock()
+        combined = {}
+
+        def combined_sections():
+            with lock:
+                if 'error' in combined:
+                    raise combined['error']
+                if 'sections' not in combined:
+                    text = f"问题：{question}\n卦象信息：{hexagram_info}"
+                    if user_yongshen:
+                        text += f"\n已确定用神：{user_yongshen}"
+                    fast_mode_stats.record_request()
+                    fetched = []
+                    try:
+                        result = cached_ai(text, model, fast_analysis_prompt, 'fast', endpoint=endpoint, bypass=bypass_cache,
+                                           validate=lambda result: len(parse_combined(result)) == len(SECTION_VALIDATORS),
+                                           on_upstream=lambda: fetched.append(True))
+                    except Exception as e:
+                        combined['error'] = e
+                        raise
+                    finally:
+                        pipeline.count('upstream_calls', len(fetched))
+                    combined['sections'] = parse_combined(result)
+                    if fetched and len(combined['sections']) < len(SECTION_VALIDATORS):
+                        llm_invalid_responses.inc(stage='fast', model=model,
+                                                  reason='schema' if combined['sections'] else 'json')
+                return combined['sections']
+
+        def same_yongshen(results, sections):
+            """组合结果中的其他部分是否基于本次使用的用神（用神是单独请求得到时可能不同）"""
+            return bool(user_yongshen) or results['yongshen'] == sections.get('yongshen')
+
+        def from_combined(name, staged, accept=lambda results, section: section, by_yongshen=False):
+            def stage(results):
+                sections = combined_sections()
+                section = sections.get(name)
+                if section is not None and by_yongshen and not same_yongshen(results, sections):
+                    logger.info(f'快速模式的 {name} 结果基于另一个用神，单独请求')
+                    section = None
+                elif section is None:
+                    logger.info(f'快速模式的 {name} 结果未通过校验，单独请求')
+                fast_mode_stats.record_section(name, section is not None)
+                if section is None:
+                    return staged(results)
+                return accept(results, section)
+            return stage
+
+        def fast_zonghe_jiedu(results):
+            sections = combined_sections()
+            section = sections.get('zonghe_jiedu')
+            # 用神是单独请求得到的，组合结果中的综合解读基于另一个用神，同样单独请求
+            if section is not None and not same_yongshen(results, sections):
+                section = None
+            fast_mode_stats.record_section('zonghe_jiedu', section is not None)
+            if section is None:
+                return zonghe_jiedu(results)
+            if on_delta is not None:
+                on_delta(section)
+            return section
+
+        stage_funcs['dongyao_guli'] = from_combined('dongyao_guli', dongyao_guli)
+        # 用户指定的用神不使用组合结果
+        if not user_yongshen:
+            stage_funcs['yongshen'] = from_combined('yongshen', yongshen)
+        # 用神卦理和数字量化依赖用神，用神与组合结果不同时单独请求
+        stage_funcs['yongshen_guli'] = from_combined('yongshen_guli', yongshen_guli, by_yongshen=True)
+        stage_funcs['shuzi_lianghua'] = from_combined(
+            'shuzi_lianghua', shuzi_lianghua, lambda results, section: shuzi_lianghua(results, extracted=dict(section)),
+            by_yongshen=True)
+        stage_funcs['zonghe_jiedu'] = fast_zonghe_jiedu
+
+    # 阶段函数在 run() 中执行，此时 pipeline 已经赋值，可以累加其计数器
+    pipeline = StagePipeline([
+        Stage('yongshen', stage_funcs['yongshen']),
+        Stage('dongyao_guli', stage_funcs['dongyao_guli']),
+        Stage('yongshen_guli', stage_funcs['yongshen_guli'], deps=['yongshen']),
+        Stage('shuzi_lianghua', stage_funcs['shuzi_lianghua'], deps=['yongshen']),
+        Stage('zonghe_jiedu', stage_funcs['zonghe_jiedu'], deps=['yongshen', 'yongshen_guli', 'dongyao_guli', 'shuzi_lianghua'])
+    ])
+    return pipeline
+
+
+def compute_strengths(data):
+    """根据月建、日辰计算用神和动爻的强弱指数
+
+    Args:
+        data (dict): 包含月建、日辰、用神、动爻列表的数字量化数据
+
+    Returns:
+        dict: 补充了用神指数和动爻指数的数字量化数据
+    """
+    yuejian = data['月建']
+    richen = data['日辰']
+
+    # 用神和全部动爻一次查表
+    scores = shuzilianghua_batch(yuejian, richen, [data['用神']] + list(data['动爻列表']))
+    yuejianshu, richenshu = scores[0]
+
+    # 计算动爻强弱指数
+    dongyao_strengths = []
+    for dizhi, (dy_yuejianshu, dy_richenshu) in zip(data['动爻列表'], scores[1:]):
+        dongyao_strengths.append({
+            '地支': dizhi,
+            '月建数': dy_yuejianshu,
+            '日辰数': dy_richenshu,
+            '总指数': dy_yuejianshu + dy_richenshu
+        })
+
+    data['用神指数'] = {
+        '月建数': yuejianshu,
+        '日辰数': richenshu,
+        '总指数': yuejianshu + richenshu
+    }
+    data['动爻指数'] = dongyao_strengths
+    return data
+
+
+def save_record(user_id, question, hexagram_info, model, results, record_id=None):
+    """保存解卦记录到数据库
+
+    Args:
+        user_id (int): 用户ID
+        question (str): 问题
+        hexagram_info (str): 卦象信息
+        model (str): 使用的模型
+        results (dict): 各阶段的结果
+        record_id (str): 记录ID，为空时生成
+
+    Returns:
+        str: 记录ID
+    """
+    record_id = record_id or str(uuid.uuid4())
+    hexagram = hexagram_store.get(hexagram_info)
+
+    hexagram_record = HexagramRecord(
+        user_id=user_id,
+        record_id=record_id,
+        question=question,
+        hexagram_id=hexagram.id,
+        hexagram_info='',
+        model=model,
+        yongshen=json.dumps(results['yongshen'], ensure_ascii=False),
+        yongshen_guli=json.dumps(results['yongshen_guli'], ensure_ascii=False),
+        dongyao_guli=json.dumps(results['dongyao_guli'], ensure_ascii=False),
+        shuzi_lianghua=json.dumps(results['shuzi_lianghua'], ensure_ascii=False),
+        zonghe_jiedu=results['zonghe_jiedu'],
+        timestamp=datetime.now(),
+        **history_summary(results['yongshen'], results['shuzi_lianghua'])
+    )
+
+    db.session.add(hexagram_record)
+    # 先写入以获得主键，再生成完整记录JSON，与记录在同一事务中提交
+    db.session.flush()
+    hexagram_record.payload = jsoncodec.dumps(record_payload(hexagram_record, results, with_hexagram=False))
+    db.session.commit()
+
+    return record_id
+
+
+def record_payload(record, results=None, with_hexagram=True):
+    """生成记录详情接口返回的完整记录
+
+    Args:
+        record (HexagramRecord): 解卦记录
+        results (dict): 各阶段的结果，为None时从记录的JSON列解析
+        with_hexagram (bool): 是否包含卦象信息，为False时卦象信息为null（保存到 payload 列时使用，读取时补上）
+
+    Returns:
+        dict: 完整记录
+    """
+    if results is None:
+        results = {
+            'yongshen': jsoncodec.loads(record.yongshen),
+            'yongshen_guli': jsoncodec.loads(record.yongshen_guli),
+            'dongyao_guli': jsoncodec.loads(record.dongyao_guli),
+            'shuzi_lianghua': jsoncodec.loads(record.shuzi_lianghua),
+            'zonghe_jiedu': record.zonghe_jiedu
+        }
+    return {
+        'id': record.id,
+        'record_id': record.record_id,
+        'question': record.question,
+        'hexagram_info': record.hexagram_text if with_hexagram else None,
+        'model': record.model,
+        'yongshen': results['yongshen'],
+        'yongshen_guli': results['yongshen_guli'],
+        'dongyao_guli': results['dongyao_guli'],
+        'shuzi_lianghua': results['shuzi_lianghua'],
+        'zonghe_jiedu': results['zonghe_jiedu'],
+        'timestamp': record.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+
+def strip_payload_hexagram(payload):
+    """将完整记录JSON中的卦象信息置为null
+
+    Args:
+        payload (str): 完整记录JSON
+
+    Returns:
+        str: 不含卦象信息的完整记录JSON
+    """
+    data = jsoncodec.loads(payload)
+    data['hexagram_info'] = None
+    return jsoncodec.dumps(data)
+
+
+def fill_payload_hexagram(payload, content):
+    """在不含卦象信息的完整记录JSON中补上卦象信息
+
+    JSON字符串中的引号都经过转义，占位文本只可能是 hexagram_info 键本身。
+
+    Args:
+        payload (str): 完整记录JSON
+        content (str): 卦象信息，为None时原样返回
+
+    Returns:
+        str: 完整记录JSON
+    """
+    if content is None:
+        return payload
+    return payload.replace(HEXAGRAM_PLACEHOLDER, '"hexagram_info":' + jsoncodec.dumps(content), 1)
+
+
+def record_owner(record_id):
+    """查询记录的所属用户（按 record_id 索引只读取一列）
+
+    Args:
+        record_id (str): 记录ID
+
+    Returns:
+        tuple: (是否存在, 用户ID)
+    """
+    row = db.session.query(HexagramRecord.user_id).filter(HexagramRecord.record_id == record_id).first()
+    return (False, None) if row is None else (True, row.user_id)
+
+
+def load_payload(record_id):
+    """读取记录的完整JSON和所属用户
+
+    只读取 payload、user_id 和引用的卦象三列；旧记录尚未生成 payload 时从各列现场生成。
+
+    Args:
+        record_id (str): 记录ID
+
+    Returns:
+        tuple: (JSON文本, 用户ID)，记录不存在时返回 (None, None)
+    """
+    row = (db.session.query(HexagramRecord.payload, HexagramRecord.user_id, Hexagram.content)
+           .outerjoin(Hexagram, HexagramRecord.hexagram_id == Hexagram.id)
+           .filter(HexagramRecord.record_id == record_id)
+           .first())
+    if row is None:
+        return None, None
+    if row.payload is not None:
+        return fill_payload_hexagram(row.payload, row.content), row.user_id
+    record = HexagramRecord.query.options(undefer_group('body')).filter_by(record_id=record_id).first()
+    return jsoncodec.dumps(record_payload(record)), record.user_id
+
+
+def backfill_payloads(batch_size=200):
+    """为旧记录生成完整记录JSON
+
+    Args:
+        batch_size (int): 每批处理的记录数
+
+    Returns:
+        int: 处理的记录数
+    """
+    count = 0
+    last_id = 0
+    while True:
+        records = (HexagramRecord.query
+                   .options(undefer_group('body'))
+                   .filter(HexagramRecord.payload.is_(None), HexagramRecord.id > last_id)
+                   .order_by(HexagramRecord.id)
+                   .limit(batch_size)
+                   .all())
+        if not records:
+            break
+        for record in records:
+            try:
+                record.payload = jsoncodec.dumps(record_payload(record, with_hexagram=record.hexagram_id is None))
+            except ValueError as e:
+                logger.warning(f'解卦记录 {record.record_id} 无法生成完整记录JSON: {str(e)}')
+        db.session.commit()
+        count += len(records)
+        last_id = records[-1].id
+    logger.info(f'已为{count}条解卦记录生成完整记录JSON')
+    return count
+
+
+def history_summary(yongshen, shuzi_lianghua):
+    """提取历史列表展示的冗余字段
+
+    Args:
+        yongshen (dict): 用神判断结果
+        shuzi_lianghua (dict): 数字量化结果
+
+    Returns:
+        dict: {'yongshen_text': 用神, 'yongshen_zhishu': 用神总指数}
+    """
+    zhishu = (shuzi_lianghua.get('用神指数') or {}).get('总指数')
+    return {
+        'yongshen_text': str(yongshen.get('text', ''))[:255],
+        'yongshen_zhishu': float(zhishu) if isinstance(zhishu, (int, float)) else None
+    }
+
+
+def backfill_history_summary(batch_size=500):
+    """为旧记录补齐历史列表的冗余字段
+
+    Args:
+        batch_size (int): 每批处理的记录数
+
+    Returns:
+        int: 补齐的记录数
+    """
+    count = 0
+    last_id = 0
+    while True:
+        rows = (db.session.query(HexagramRecord.id, HexagramRecord.yongshen, HexagramRecord.shuzi_lianghua)
+                .filter(HexagramRecord.yongshen_text.is_(None), HexagramRecord.id > last_id)
+                .order_by(HexagramRecord.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+        for record_id, yongshen, shuzi_lianghua in rows:
+            try:
+                summary = history_summary(json.loads(yongshen), json.loads(shuzi_lianghua))
+            except (ValueError, TypeError, AttributeError):
+                summary = {'yongshen_text': '', 'yongshen_zhishu': None}
+            db.session.query(HexagramRecord).filter_by(id=record_id).update(summary)
+        db.session.commit()
+        count += len(rows)
+        last_id = rows[-1][0]
+    if count:
+        logger.info(f'已为{count}条解卦记录补齐历史列表字段')
+    return count
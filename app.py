@@ -1,13 +1,13 @@
 # 主应用文件
 # 该文件是应用程序的入口点，整合了所有蓝图和配置
-
-# 使用pymysql代替MySQLdb
-import pymysql
-pymysql.install_as_MySQLdb()
+# 应用由 create_app() 工厂创建，导入本模块不会创建应用、连接数据库或执行建表；
+# 数据库结构的创建和升级由命令行 flask --app app init-db 显式执行，生产环境入口见 wsgi.py
 
 from flask import Flask, render_template, request, jsonify, redirect, url_for
 from flask_cors import CORS
-from flask_login import LoginManager
+from flask_login import LoginManager, login_required
+import click
+import requests
 import os
 
 # 导入配置
@@ -16,288 +16,571 @@ from config import config
 # 导入数据库模型
 from models import db
 
+# 导入AI调用准入控制
+from admission import UpstreamBusyError
+
 # 导入蓝图
 from auth import auth_bp
-from hexagram import hexagram_bp
+from hexagram import hexagram_bp, busy_response
 from models_manager import models_bp
 
-# 创建Flask应用
-app = Flask(__name__)
-CORS(app)  # 启用CORS支持
-
-# 配置应用
-app.config.from_object(config)
-
-# 初始化数据库
-app.config['SQLALCHEMY_DATABASE_URI'] = config.SQLALCHEMY_DATABASE_URI
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config.SQLALCHEMY_TRACK_MODIFICATIONS
-app.secret_key = config.SECRET_KEY
-
-# 初始化数据库
-db.init_app(app)
-
 # 初始化Flask-Login
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'auth.login'  # 设置登录页面路由
 
 # 加载用户
-from models import User
+from user_cache import user_cache
 
 @login_manager.user_loader
 def load_user(user_id):
-    """加载用户
+    """加载用户（优先使用进程内缓存的用户快照）
     
     Args:
-        user_id (str): 用户ID
+        user_id (str): 会话中的用户标识
         
     Returns:
-        User: 用户对象
+        UserSnapshot: 用户快照
+    """
+    return user_cache.get(user_id)
+
+def create_app(config_object=None, start_workers=True):
+    """创建Flask应用
+    
+    Args:
+        config_object: 配置对象，默认使用 config.config
+        start_workers (bool): 是否在当前进程中启动异步解卦任务工作线程；
+                              预加载应用的多进程服务器应在各工作进程中启动（见 gunicorn.conf.py）
+        
+    Returns:
+        Flask: Flask应用
+    """
+    config_object = config_object or config
+    
+    # 创建Flask应用
+    app = Flask(__name__)
+    CORS(app)  # 启用CORS支持
+    
+    # 配置应用
+    app.config.from_object(config_object)
+    app.secret_key = config_object.SECRET_KEY
+    
+    # 未指定驱动的MySQL连接地址使用pymysql代替MySQLdb（只在使用MySQL时导入）
+    if config_object.SQLALCHEMY_DATABASE_URI.startswith('mysql://'):
+        import pymysql
+        pymysql.install_as_MySQLdb()
+    
+    # 初始化数据库和Flask-Login
+    db.init_app(app)
+    login_manager.init_app(app)
+    
+    # 注册蓝图
+    app.register_blueprint(auth_bp)
+    app.register_blueprint(hexagram_bp)
+    app.register_blueprint(models_bp)
+    
+    # 注册应用路由和命令行
+    register_routes(app)
+    register_commands(app)
+    
+    # 初始化AI响应缓存（数据库层在阶段线程中通过该应用的上下文访问）
+    from llm_cache import llm_cache
+    llm_cache.init_app(app)
+    
+    # 挂接请求计时和数据库查询统计（/metrics）
+    import metrics
+    metrics.init_app(app)
+    
+    # 启动异步解卦任务工作线程
+    if start_workers:
+        from jobs import start_job_workers
+        start_job_workers(app)
+    
+    return app
+
+def register_routes(app):
+    """注册应用级页面和API路由
+    
+    Args:
+        app (Flask): Flask应用
     """
-    return User.query.get(int(user_id))
-
-# 注册蓝图
-app.register_blueprint(auth_bp)
-app.register_blueprint(hexagram_bp)
-app.register_blueprint(models_bp)
-
-# 首页路由
-@app.route('/')
-def index():
-    """首页"""
-    # 检查用户是否已登录
-    from flask_login import current_user
-    if not current_user.is_authenticated:
-        return redirect(url_for('auth.login'))
-    
-    # 合并内置模型和自定义模型
-    from models import CustomModel
-    all_models = config.SUPPORTED_MODELS.copy()
-    
-    # 添加该用户的自定义模型
-    custom_models = CustomModel.query.filter_by(user_id=current_user.id).all()
-    for model in custom_models:
-        all_models.append(model.name)
-    
-    return render_template('index.html', models=all_models, user=current_user)
-
-# 分析结果页面
-@app.route('/result/<record_id>')
-def result(record_id):
-    """分析结果页面"""
-    # 查询解卦记录
-    from models import HexagramRecord
-    record = HexagramRecord.query.filter_by(record_id=record_id).first()
-    
-    if not record:
-        return jsonify({'error': '记录不存在'}), 404
-    
-    # 检查用户权限
-    from flask_login import current_user
-    if record.user_id and (not current_user.is_authenticated or record.user_id != current_user.id):
-        return jsonify({'error': '您没有权限查看此记录'}), 403
-    
-    # 合并内置模型和自定义模型
-    all_models = config.SUPPORTED_MODELS.copy()
-    from models import CustomModel
-    if current_user.is_authenticated:
-        custom_models = CustomModel.query.filter_by(user_id=current_user.id).all()
-        for model in custom_models:
-            all_models.append(model.name)
-    
-    # 构建返回数据
-    import json
-    result_data = {
-        'id': record.record_id,
-        'timestamp': record.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-        'question': record.question,
-        'hexagram_info': record.hexagram_info,
-        'model': record.model,
-        'yongshen': json.loads(record.yongshen),
-        'yongshen_guli': json.loads(record.yongshen_guli),
-        'dongyao_guli': json.loads(record.dongyao_guli),
-        'shuzi_lianghua': json.loads(record.shuzi_lianghua),
-        'zonghe_jiedu': record.zonghe_jiedu
-    }
-    
-    return render_template('result.html', record=result_data, models=all_models)
-
-# 历史记录页面
-@app.route('/history')
-def history():
-    """历史记录页面"""
-    # 检查用户是否已登录
-    from flask_login import current_user
-    if not current_user.is_authenticated:
-        return redirect(url_for('auth.login'))
-    
-    from models import HexagramRecord
-    
-    # 查询当前用户的历史记录
-    records = HexagramRecord.query.filter_by(user_id=current_user.id).order_by(HexagramRecord.timestamp.desc()).all()
-    
-    # 转换为字典列表
-    record_list = []
-    for record in records:
-        import json
-        record_list.append({
-            'id': record.record_id,
-            'timestamp': record.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            'question': record.question,
-            'model': record.model,
-            'yongshen': json.loads(record.yongshen)['text']
-        })
-    
-    return render_template('history.html', records=record_list, user=current_user)
-
-# 聊天页面（已移除，只保留解卦结果中的聊天咨询功能）
-# @app.route('/chat')
-# def chat():
-#     """聊天页面"""
-#     # 合并内置模型和自定义模型
-#     all_models = config.SUPPORTED_MODELS.copy()
-#     from models import CustomModel
-#     if hasattr(request, 'user') and request.user.is_authenticated:
-#         custom_models = CustomModel.query.filter_by(user_id=request.user.id).all()
-#         for model in custom_models:
-#             all_models.append(model.name)
-#     return render_template('chat.html', models=all_models)
-
-# API: 六爻分析（重定向到hexagram_bp的analyze路由）
-@app.route('/api/analyze', methods=['POST'])
-def api_analyze():
-    """六爻分析API（重定向）"""
-    # 重定向到hexagram_bp的analyze路由
-    return hexagram_bp.view_functions['api_analyze'](request)
-
-# API: 聊天功能
-@app.route('/api/chat', methods=['POST'])
-def api_chat():
-    """聊天功能API"""
-    try:
-        from api import AI_chat
+    # 首页路由
+    @app.route('/')
+    def index():
+        """首页"""
+        # 检查用户是否已登录
+        from flask_login import current_user
+        if not current_user.is_authenticated:
+            return redirect(url_for('auth.login'))
+    
+        # 合并内置模型和自定义模型
+        from model_registry import model_names
+        all_models = model_names()
+    
+        return render_template('index.html', models=all_models, user=current_user)
+
+    # 分析结果页面
+    @app.route('/result/<record_id>')
+    def result(record_id):
+        """分析结果页面"""
+        from flask import make_response
+        from flask_login import current_user
+        from hexagram import result_page_cache
+        from utils.http_cache import make_etag, not_modified, set_cache_headers
+    
+        # 记录生成后不再修改，页面只随用户的自定义模型列表和渲染版本变化：
+        # ETag一致时直接返回304，不查询记录。模型版本号从数据库读取（按主键查询一个整数），
+        # 用户快照中的版本号在其他进程修改自定义模型后最多过期 USER_CACHE_TTL 秒
+        from model_registry import model_registry, models_version as current_models_version
+        user_id = current_user.id if current_user.is_authenticated else None
+        models_version = current_models_version(user_id) if user_id else 0
+        etag = make_etag(record_id, user_id, models_version, config.RESULT_RENDER_VERSION)
+        response = not_modified(etag, config.RESULT_CACHE_MAX_AGE)
+        if response is not None:
+            return response
+    
+        # 渲染页面缓存按进程保存，记录可能已在其他进程中删除：命中时先确认记录仍然存在且属于该用户
+        from analysis import load_payload, record_owner
+        cache_key = (record_id, user_id, etag)
+        page = result_page_cache.get(cache_key)
+        if page is not None:
+            exists, owner_id = record_owner(record_id)
+            if exists and (not owner_id or owner_id == user_id):
+                return set_cache_headers(make_response(page), etag, config.RESULT_CACHE_MAX_AGE)
+            result_page_cache.invalidate(record_id)
+    
+        # 读取写入时生成的完整记录JSON
+        from utils import jsoncodec
+        payload, owner_id = load_payload(record_id)
+    
+        if payload is None:
+            return jsonify({'error': '记录不存在'}), 404
+    
+        # 检查用户权限
+        if owner_id and (not current_user.is_authenticated or owner_id != current_user.id):
+            return jsonify({'error': '您没有权限查看此记录'}), 403
+    
+        # 合并内置模型和自定义模型（与ETag使用同一版本号）
+        all_models = list(model_registry.get(user_id, version=models_version).names) if user_id else list(config.SUPPORTED_MODELS)
+    
+        # 构建返回数据（页面中的记录ID使用record_id）
+        result_data = jsoncodec.loads(payload)
+        result_data['id'] = result_data['record_id']
+    
+        page = render_template('result.html', record=result_data, models=all_models).encode('utf-8')
+        result_page_cache.set(cache_key, page)
+        return set_cache_headers(make_response(page), etag, config.RESULT_CACHE_MAX_AGE)
+
+    # 实时分析结果页面
+    @app.route('/result/live')
+    def result_live():
+        """实时分析结果页面
+    
+        页面通过 /api/analyze/stream 发起分析，各阶段结果完成后立即显示，综合解读逐字显示。
+        """
+        from flask_login import current_user
+    
+        # 合并内置模型和自定义模型
+        from model_registry import model_names
+        all_models = model_names()
+    
+        return render_template('result.html', record=None, live=True, models=all_models)
+
+    # 历史记录页面
+    @app.route('/history')
+    def history():
+        """历史记录页面"""
+        # 检查用户是否已登录
+        from flask_login import current_user
+        if not current_user.is_authenticated:
+            return redirect(url_for('auth.login'))
+    
+        from models import HexagramRecord
+        from hexagram import history_page
+    
+        # 首屏只渲染第一页，后续页面由前端滚动时通过 /api/history 加载
+        record_list, next_cursor = history_page(current_user.id)
+        total = HexagramRecord.query.filter_by(user_id=current_user.id).count()
+    
+        return render_template('history.html', records=record_list, next_cursor=next_cursor,
+                               total=total, user=current_user)
+
+    # 聊天页面（已移除，只保留解卦结果中的聊天咨询功能）
+    # @app.route('/chat')
+    # def chat():
+    #     """聊天页面"""
+    #     # 合并内置模型和自定义模型
+    #     all_models = config.SUPPORTED_MODELS.copy()
+    #     from models import CustomModel
+    #     if hasattr(request, 'user') and request.user.is_authenticated:
+    #         custom_models = CustomModel.query.filter_by(user_id=request.user.id).all()
+    #         for model in custom_models:
+    #             all_models.append(model.name)
+    #     return render_template('chat.html', models=all_models)
+
+    # API: 六爻分析（重定向到hexagram_bp的analyze路由）
+    @app.route('/api/analyze', methods=['POST'])
+    def api_analyze():
+        """六爻分析API（重定向）"""
+        # 重定向到hexagram_bp的analyze路由（保留?async=1等查询参数）
+        return app.view_functions['hexagram.api_analyze']()
+
+    # API: 六爻分析流式输出（重定向到hexagram_bp的analyze/stream路由）
+    @app.route('/api/analyze/stream', methods=['POST'])
+    def api_analyze_stream():
+        """六爻分析流式输出API（重定向）"""
+        return app.view_functions['hexagram.api_analyze_stream']()
+
+    # API: 查询异步解卦任务状态（重定向到hexagram_bp的get_job路由）
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def api_get_job(job_id):
+        """查询异步解卦任务状态API（重定向）"""
+        return app.view_functions['hexagram.get_job'](job_id)
+
+    # API: 查询解卦运行状态（重定向到hexagram_bp的get_run_status路由）
+    @app.route('/api/runs/<run_id>', methods=['GET'])
+    def api_get_run(run_id):
+        """查询解卦运行状态API（重定向）"""
+        return app.view_functions['hexagram.get_run_status'](run_id)
+
+    # API: 继续执行失败的解卦运行（重定向到hexagram_bp的resume_run路由）
+    @app.route('/api/runs/<run_id>/resume', methods=['POST'])
+    def api_resume_run(run_id):
+        """继续执行解卦运行API（重定向）"""
+        return app.view_functions['hexagram.resume_run'](run_id)
+
+    # API: 聊天功能
+    @app.route('/api/chat', methods=['POST'])
+    def api_chat():
+        """聊天功能API"""
+        try:
+            from flask_login import current_user
+            from llm_client import resolve_endpoint, complete_chat
+            data = request.get_json()
+            messages = data.get('messages', [])
+            model = data.get('model', 'gpt-4')
+        
+            if not messages:
+                return jsonify({'error': '消息不能为空'}), 400
+        
+            # 调用AI聊天接口
+            from metrics import llm_call
+            user_id = current_user.id if current_user.is_authenticated else None
+            endpoint = resolve_endpoint(model, user_id)
+            with llm_call('chat', model):
+                response = complete_chat(messages, model, endpoint=endpoint)
+        
+            return jsonify({'success': True, 'response': response})
+        
+        except UpstreamBusyError as e:
+            return busy_response(e)
+        except Exception as e:
+            app.logger.error(f'聊天失败: {str(e)}')
+            return jsonify({'error': f'聊天失败: {str(e)}'}), 500
+
+    # API: 聊天功能（流式输出）
+    @app.route('/api/chat/stream', methods=['POST'])
+    def api_chat_stream():
+        """聊天功能API（Server-Sent Events流式输出）
+    
+        事件类型：delta（增量文本）、done（回复结束）、error（上游出错）。
+        客户端断开时响应生成器被关闭，随即关闭上游连接，不再继续生成。
+        """
+        from flask_login import current_user
+        from llm_client import resolve_endpoint, stream_chat
+        from metrics import llm_call
+        from utils.sse import format_sse, sse_response
+    
         data = request.get_json()
         messages = data.get('messages', [])
         model = data.get('model', 'gpt-4')
-        
+    
         if not messages:
             return jsonify({'error': '消息不能为空'}), 400
+    
+        user_id = current_user.id if current_user.is_authenticated else None
+        endpoint = resolve_endpoint(model, user_id)
+    
+        def generate():
+            chunks = stream_chat(messages, model, endpoint=endpoint)
+            try:
+                with llm_call('chat', model):
+                    for text in chunks:
+                        yield format_sse('delta', {'text': text})
+                yield format_sse('done', {})
+            except UpstreamBusyError as e:
+                yield format_sse('error', {'error': str(e), 'retry_after': e.retry_after})
+            except Exception as e:
+                app.logger.error(f'聊天失败: {str(e)}')
+                yield format_sse('error', {'error': f'聊天失败: {str(e)}'})
+            finally:
+                # 正常结束、上游出错或客户端断开时都关闭上游连接
+                chunks.close()
+    
+        return sse_response(generate())
+
+    # API: 运行统计（AI响应缓存命中率等）
+    @app.route('/api/stats', methods=['GET'])
+    def api_stats():
+        """运行统计API"""
+        from flask_login import current_user
+        if not current_user.is_authenticated:
+            return jsonify({'error': '请先登录'}), 401
+        from utils.stats import collect_stats
+        return jsonify(collect_stats())
+
+    # Prometheus 监控指标
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """监控指标（Prometheus 文本格式，多进程部署时汇总所有工作进程）
         
-        # 调用AI聊天接口
-        response = AI_chat({
-            'model': model,
-            'messages': messages
-        })
-        
-        return jsonify({'success': True, 'response': response})
-        
-    except Exception as e:
-        app.logger.error(f'聊天失败: {str(e)}')
-        return jsonify({'error': f'聊天失败: {str(e)}'}), 500
-
-# API: 获取历史记录（重定向到hexagram_bp的get_history路由）
-@app.route('/api/history', methods=['GET'])
-def api_get_history():
-    """获取历史记录API（重定向）"""
-    # 重定向到hexagram_bp的get_history路由
-    return hexagram_bp.view_functions['get_history'](request)
-
-# API: 删除历史记录（重定向到hexagram_bp的delete_record路由）
-@app.route('/api/history/<record_id>', methods=['DELETE'])
-def api_delete_history(record_id):
-    """删除历史记录API（重定向）"""
-    # 重定向到hexagram_bp的delete_record路由
-    from models import HexagramRecord
-    record = HexagramRecord.query.filter_by(record_id=record_id).first()
-    if not record:
-        return jsonify({'error': '记录不存在'}), 404
-    
-    return hexagram_bp.view_functions['delete_record'](request, record.id)
-
-# 设置页面路由
-@app.route('/settings')
-def settings():
-    """设置页面"""
-    # 检查用户是否已登录
-    from flask_login import current_user
-    if not current_user.is_authenticated:
-        return redirect(url_for('auth.login'))
-    
-    from models import CustomModel
-    
-    # 获取该用户的自定义模型
-    custom_models = CustomModel.query.filter_by(user_id=current_user.id).all()
-    
-    return render_template('settings.html', custom_models=custom_models, user=current_user)
-
-# API: 从自定义API获取模型列表
-@app.route('/api/settings/fetch-models', methods=['POST'])
-def api_fetch_models():
-    """从自定义API获取模型列表"""
-    try:
-        import requests
-        data = request.get_json()
-        api_url = data.get('apiUrl')
-        api_key = data.get('apiKey')
+        设置了 METRICS_TOKEN 时需要携带请求头 Authorization: Bearer <METRICS_TOKEN>。
+        """
+        from flask import abort
+        from metrics import render_metrics
+        if not config.METRICS_ENABLED:
+            abort(404)
+        if config.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {config.METRICS_TOKEN}':
+            return jsonify({'error': '未授权'}), 401
+        return app.response_class(render_metrics(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+    # API: 获取历史记录（重定向到hexagram_bp的get_history路由）
+    @app.route('/api/history', methods=['GET'])
+    def api_get_history():
+        """获取历史记录API（重定向）"""
+        # 重定向到hexagram_bp的get_history路由（保留cursor、limit查询参数）
+        return app.view_functions['hexagram.get_history']()
+
+    # API: 搜索历史记录（重定向到hexagram_bp的search_history路由）
+    @app.route('/api/history/search', methods=['GET'])
+    def api_search_history():
+        """搜索历史记录API（重定向）"""
+        return app.view_functions['hexagram.search_history']()
+
+    # API: 导出历史记录（重定向到hexagram_bp的export_history路由）
+    @app.route('/api/history/export', methods=['GET'])
+    def api_export_history():
+        """导出历史记录API（重定向）"""
+        return app.view_functions['hexagram.export_history']()
+    
+    # API: 删除历史记录（重定向到hexagram_bp的delete_record路由）
+    @app.route('/api/history/<record_id>', methods=['DELETE'])
+    def api_delete_history(record_id):
+        """删除历史记录API（重定向）"""
+        # 重定向到hexagram_bp的delete_record路由
+        from models import HexagramRecord
+        record = HexagramRecord.query.filter_by(record_id=record_id).first()
+        if not record:
+            return jsonify({'error': '记录不存在'}), 404
+    
+        return app.view_functions['hexagram.delete_record'](record.id)
+
+    # 设置页面路由
+    @app.route('/settings')
+    def settings():
+        """设置页面"""
+        # 检查用户是否已登录
+        from flask_login import current_user
+        if not current_user.is_authenticated:
+            return redirect(url_for('auth.login'))
+    
+        from model_registry import user_models
+    
+        # 获取该用户的自定义模型
+        custom_models = user_models().custom_models
+    
+        return render_template('settings.html', custom_models=custom_models, user=current_user)
+
+    # API: 从自定义API获取模型列表
+    @app.route('/api/settings/fetch-models', methods=['POST'])
+    @login_required
+    def api_fetch_models():
+        """从自定义API获取模型列表"""
+        try:
+            data = request.get_json()
+            api_url = data.get('apiUrl')
+            api_key = data.get('apiKey')
         
-        if not api_url or not api_key:
-            return jsonify({'success': False, 'error': 'API URL和API Key不能为空'}), 400
+            if not api_url or not api_key:
+                return jsonify({'success': False, 'error': 'API URL和API Key不能为空'}), 400
         
-        # 尝试获取模型列表（支持OpenAI兼容的API）
-        # 首先尝试OpenAI格式的模型列表端点
-        models_endpoint = api_url.rsplit('/', 2)[0] + '/models'
+            # 尝试获取模型列表（支持OpenAI兼容的API）
+            # 首先尝试OpenAI格式的模型列表端点
+            models_endpoint = api_url.rsplit('/', 2)[0] + '/models'
         
-        headers = {
-            'Authorization': f'Bearer {api_key}',
-            'Content-Type': 'application/json'
-        }
+            headers = {
+                'Authorization': f'Bearer {api_key}',
+                'Content-Type': 'application/json'
+            }
         
-        response = requests.get(models_endpoint, headers=headers)
+            # 地址由用户输入，可能只使用一次，不进入上游连接池
+            response = requests.get(models_endpoint, headers=headers,
+                                    timeout=(config.AI_CONNECT_TIMEOUT, config.FETCH_MODELS_TIMEOUT))
         
-        if response.status_code != 200:
-            # 如果失败，返回空列表或错误信息
-            return jsonify({'success': True, 'models': []})
+            if response.status_code != 200:
+                # 如果失败，返回空列表或错误信息
+                return jsonify({'success': True, 'models': []})
         
-        models_data = response.json()
-        model_list = [model['id'] for model in models_data.get('data', [])]
+            models_data = response.json()
+            model_list = [model['id'] for model in models_data.get('data', [])]
         
-        return jsonify({'success': True, 'models': model_list})
+            return jsonify({'success': True, 'models': model_list})
         
-    except Exception as e:
-        app.logger.error(f'获取模型列表失败: {str(e)}')
-        return jsonify({'success': False, 'error': f'获取模型列表失败: {str(e)}'}), 500
-
-# API: 添加自定义模型（重定向到models_bp的add_custom_model路由）
-@app.route('/api/settings/models', methods=['POST'])
-def api_add_model():
-    """添加自定义模型API（重定向）"""
-    # 重定向到models_bp的add_custom_model路由
-    return models_bp.view_functions['add_custom_model'](request)
-
-# API: 获取所有自定义模型（重定向到models_bp的get_custom_models路由）
-@app.route('/api/settings/models', methods=['GET'])
-def api_get_models():
-    """获取所有自定义模型API（重定向）"""
-    # 重定向到models_bp的get_custom_models路由
-    return models_bp.view_functions['get_custom_models'](request)
-
-# API: 删除自定义模型（重定向到models_bp的delete_custom_model路由）
-@app.route('/api/settings/models/<model_id>', methods=['DELETE'])
-def api_delete_model(model_id):
-    """删除自定义模型API（重定向）"""
-    # 重定向到models_bp的delete_custom_model路由
-    return models_bp.view_functions['delete_custom_model'](request, int(model_id))
-
-# 初始化数据库
-with app.app_context():
-    """初始化数据库"""
-    # 创建数据库表
+        except Exception as e:
+            app.logger.error(f'获取模型列表失败: {str(e)}')
+            return jsonify({'success': False, 'error': f'获取模型列表失败: {str(e)}'}), 500
+
+    # API: 添加自定义模型（重定向到models_bp的add_custom_model路由）
+    @app.route('/api/settings/models', methods=['POST'])
+    def api_add_model():
+        """添加自定义模型API（重定向）"""
+        # 重定向到models_bp的add_custom_model路由
+        return app.view_functions['models.add_custom_model']()
+
+    # API: 获取所有自定义模型（重定向到models_bp的get_custom_models路由）
+    @app.route('/api/settings/models', methods=['GET'])
+    def api_get_models():
+        """获取所有自定义模型API（重定向）"""
+        # 重定向到models_bp的get_custom_models路由
+        return app.view_functions['models.get_custom_models']()
+
+    # API: 删除自定义模型（重定向到models_bp的delete_custom_model路由）
+    @app.route('/api/settings/models/<model_id>', methods=['DELETE'])
+    def api_delete_model(model_id):
+        """删除自定义模型API（重定向）"""
+        # 重定向到models_bp的delete_custom_model路由
+        return app.view_functions['models.delete_custom_model'](int(model_id))
+def init_db():
+    """创建数据库表并补齐结构变更（需要在应用上下文中调用）
+    
+    只在部署或升级时执行一次，Web工作进程启动时不再执行。
+    """
+    # 创建数据库表，并补齐已有表中新增的列和索引
     db.create_all()
+    from utils.schema import ensure_schema
+    ensure_schema(db)
+    
+    # MySQL 中已有的 TEXT 列改为 MEDIUMBLOB，之后才能写入压缩数据
+    from record_compression import prepare_columns
+    prepare_columns()
+    
+    # 为旧记录补齐历史列表的冗余字段
+    from analysis import backfill_history_summary
+    backfill_history_summary()
+    
+    # 创建历史记录全文索引
+    from search import init_search
+    init_search()
     
     # 确保历史记录目录存在（暂时保留，用于迁移旧数据）
     if not os.path.exists(config.HISTORY_DIR):
         os.makedirs(config.HISTORY_DIR)
 
+def register_commands(app):
+    """注册命令行
+    
+    Args:
+        app (Flask): Flask应用
+    """
+    # 命令行：创建和升级数据库结构
+    @app.cli.command('init-db')
+    def init_db_command():
+        """创建数据库表并补齐新增的列和索引：flask --app app init-db"""
+        init_db()
+        print('数据库初始化完成')
+    
+    # 命令行：导入旧版历史记录文件
+    @app.cli.command('import-history')
+    @click.argument('directory', required=False)
+    @click.option('--user', 'username', required=True, help='导入记录所属的用户名')
+    @click.option('--workers', type=int, default=None, help='解析进程数，默认为CPU核数')
+    @click.option('--batch-size', type=int, default=500, help='每个事务写入的记录数')
+    def import_history_command(directory, username, workers, batch_size):
+        """导入旧版 history/*.json 文件：flask --app app import-history [目录] --user 用户名"""
+        from models import User
+        from history_import import import_history
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.ClickException(f'用户 {username} 不存在')
+        stats = import_history(directory or config.HISTORY_DIR, user.id, workers, batch_size)
+        print(f"处理{stats['files']}个文件，导入{stats['imported']}条，跳过{stats['skipped']}条（已导入），"
+              f"无效{stats['invalid']}个，耗时{stats['seconds']}秒")
+    
+    # 命令行：导出历史记录
+    @app.cli.command('export-history')
+    @click.option('--user', 'username', default=None, help='只导出该用户的记录，默认导出全部用户')
+    @click.option('--format', 'format', type=click.Choice(['ndjson', 'csv']), default='ndjson', help='导出格式')
+    @click.option('--gzip', is_flag=True, help='gzip 压缩')
+    @click.option('--output', '-o', default='-', help='输出文件，默认输出到标准输出')
+    def export_history_command(username, format, gzip, output):
+        """流式导出解卦记录：flask --app app export-history --user 用户名 --format csv -o history.csv"""
+        from models import User
+        from export import export_records
+        user_id = None
+        if username:
+            user = User.query.filter_by(username=username).first()
+            if user is None:
+                raise click.ClickException(f'用户 {username} 不存在')
+            user_id = user.id
+        with click.open_file(output, 'wb') as f:
+            for chunk in export_records(format, user_id, gzip):
+                f.write(chunk if gzip else chunk.encode('utf-8'))
+    
+    # 命令行：为旧记录生成完整记录JSON
+    @app.cli.command('backfill-payloads')
+    def backfill_payloads_command():
+        """为尚未生成完整记录JSON的旧记录生成payload列：flask --app app backfill-payloads"""
+        from analysis import backfill_payloads
+        count = backfill_payloads()
+        print(f'已处理{count}条解卦记录')
+
+    # 命令行：旧记录关联卦象表
+    @app.cli.command('link-hexagrams')
+    @click.option('--batch-size', type=int, default=200, help='每个事务处理的记录数')
+    def link_hexagrams_command(batch_size):
+        """将保存卦象信息副本的旧记录改为引用去重后的卦象表：flask --app app link-hexagrams"""
+        from hexagram_store import link_existing_records
+        stats = link_existing_records(batch_size)
+        print(f"已将{stats['records']}条解卦记录关联到{stats['hexagrams']}个卦象")
+    
+    # 命令行：训练压缩字典
+    @app.cli.command('train-compression-dict')
+    @click.option('--samples', type=int, default=2000, help='样本记录数')
+    @click.option('--size', type=int, default=None, help='字典大小（字节）')
+    def train_compression_dict_command(samples, size):
+        """用最近的记录训练压缩字典，之后写入的数据使用该字典：flask --app app train-compression-dict"""
+        from record_compression import train_dictionary
+        dictionary = train_dictionary(samples, size)
+        if dictionary is None:
+            raise click.ClickException('没有可用于训练的解卦记录')
+        print(f'已保存压缩字典 {dictionary.id}（{dictionary.codec}，{len(dictionary.data)}字节）')
+    
+    # 命令行：压缩已有记录
+    @app.cli.command('compress-records')
+    @click.option('--batch-size', type=int, default=200, help='每个事务处理的记录数')
+    @click.option('--pause', type=float, default=0.0, help='每批之间暂停的秒数')
+    @click.option('--recompress', is_flag=True, help='重新压缩已压缩的数据（更换算法或字典后使用）')
+    def compress_records_command(batch_size, pause, recompress):
+        """分批压缩已有解卦记录的卦象和分析结果列：flask --app app compress-records"""
+        from record_compression import compress_records
+        stats = compress_records(batch_size, pause, recompress)
+        print(f"检查{stats['records']}条记录，压缩{stats['updated']}条，"
+              f"{stats['raw_bytes']}字节 -> {stats['stored_bytes']}字节（{stats['ratio']}倍），耗时{stats['seconds']}秒")
+    
+    # 命令行：压缩存储统计
+    @app.cli.command('compression-stats')
+    @click.option('--sample', type=int, default=1000, help='估算压缩率时解压的记录数')
+    def compression_stats_command(sample):
+        """显示压缩列的存储大小和压缩率：flask --app app compression-stats"""
+        from record_compression import compression_stats
+        stats = compression_stats(sample)
+        print(f"记录数: {stats['records']}")
+        for name, size in stats['stored_bytes'].items():
+            print(f'  {name}: {size}字节')
+        print(f"最近{sample}条记录: {stats['sample_raw_bytes']}字节 -> {stats['sample_stored_bytes']}字节（{stats['ratio']}倍）")
+
 if __name__ == '__main__':
+    # 开发服务器：启动前初始化数据库
+    app = create_app()
+    with app.app_context():
+        init_db()
     app.run(debug=config.DEBUG, host='0.0.0.0', port=5000)
-
@@ -1,16 +1,28 @@
 # 用户认证功能模块
 # 该文件实现了用户的注册、登录、登出等功能
 
-from flask import Blueprint, render_template, redirect, url_for, request, jsonify
+from flask import Blueprint, render_template, redirect, url_for, request, jsonify, make_response
 from flask_login import login_user, logout_user, login_required, current_user
 from models import db, User
 from captcha import Captcha
+from password_hasher import PasswordHasherBusyError
+from user_cache import user_cache
+from utils.stats import register_stats
 
 # 创建认证蓝图
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 # 创建验证码生成器实例
 captcha_generator = Captcha()
+register_stats('captcha_pool', captcha_generator.pool.stats)
+
+@auth_bp.errorhandler(PasswordHasherBusyError)
+def hasher_busy(error):
+    """密码计算线程池繁忙时返回503，页面提示稍后再试"""
+    template = 'auth/register.html' if request.endpoint == 'auth.register' else 'auth/login.html'
+    response = make_response(render_template(template, error=str(error)), 503)
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
 def register():
@@ -97,6 +109,10 @@ def login():
         if not user or not user.check_password(password):
             return render_template('auth/login.html', error='用户名或密码错误')
         
+        # 哈希成本与当前配置不同时重新计算
+        if user.rehash_password_if_needed(password):
+            db.session.commit()
+        
         # 登录用户
         login_user(user)
         
@@ -110,6 +126,7 @@ def login():
 @login_required
 def logout():
     """用户登出"""
+    user_cache.invalidate(current_user.id)
     logout_user()
     return redirect(url_for('auth.login'))
 
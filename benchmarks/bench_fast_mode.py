@@ -0,0 +1,163 @@
+# 快速模式性能测试
+# 对比分阶段流水线（每个阶段单独请求，卦象信息重复发送）与快速模式（一次组合请求，未通过校验的阶段单独重新请求）
+# 的单次解卦延迟、输入输出 token 数、请求次数和解析失败率。
+# 默认使用模拟上游：延迟 = 往返时间 + 输入token/预填充速度 + 输出token/生成速度，并按给定概率返回格式错误的阶段；
+# 使用 --live 时调用实际配置的接口（AI_API_URL 或 api.py）。token 数按字符数估算（中文约1字1 token）。
+# 运行方式：python benchmarks/bench_fast_mode.py [--runs 20] [--failure-rate 0.05] [--scale 0.02] [--live]
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault('DATABASE_URI', 'sqlite://')
+os.environ.setdefault('JOB_WORKERS', '0')
+
+import llm_client
+from app import create_app
+from config import config
+from models import db
+from pipeline import StageError
+
+# 样例卦象
+SAMPLE_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'history',
+                           '5c5f6f22-e337-4034-b157-99317e9fd3e9.json')
+
+# 模拟上游的参数
+RTT = 0.6  # 往返和排队时间（秒）
+PREFILL_RATE = 2000.0  # 输入 token/秒
+DECODE_RATE = 40.0  # 输出 token/秒
+
+# 模拟的各阶段响应（长度接近实际响应）
+SECTIONS = {
+    'yongshen': {'text': '二爻妻财', 'yiju': '问财以妻财为用神，' * 12},
+    'yongshen_guli': {name: '用神得月建生扶，' * 7 for name in ('月建关系', '日辰关系', '动爻关系', '特殊状态',
+                                                          '回头生克', '原神忌神', '旺衰评估')},
+    'dongyao_guli': {'有动爻': True, '动爻列表': [{name: '动爻化进，' * 8 for name in (
+        '爻位', '月建关系', '日辰关系', '动爻关系', '特殊状态', '回头生克', '变爻关系', '旺衰评估')}]},
+    'shuzi_lianghua': {'月建': '亥', '日辰': '酉', '用神': '卯', '动爻列表': ['申']},
+    'zonghe_jiedu': '近期财运平稳，求财可得（妻财持世得月建生）。' * 20
+}
+
+# 格式错误的阶段响应
+BROKEN = {
+    'yongshen': {'text': ''},
+    'yongshen_guli': {'月建关系': '缺少其他字段'},
+    'dongyao_guli': {'有动爻': '是'},
+    'shuzi_lianghua': {'月建': '亥月', '日辰': '酉', '用神': '卯', '动爻列表': []},
+    'zonghe_jiedu': ''
+}
+
+
+class Meter:
+    """统计请求次数和 token 数"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def add(self, text, agent, result):
+        with self.lock:
+            self.requests += 1
+            self.input_tokens += len(text) + len(agent)
+            self.output_tokens += len(result)
+
+
+def simulated_ai(failure_rate, scale):
+    """返回模拟上游的 complete_ai"""
+    from prompt import (yongshen_prompt, yongshen_guli_prompt, dongyao_guli_prompt,
+                        shuzi_lianghua_prompt, fast_analysis_prompt)
+    stage_of = {yongshen_prompt: 'yongshen', yongshen_guli_prompt: 'yongshen_guli',
+                dongyao_guli_prompt: 'dongyao_guli', shuzi_lianghua_prompt: 'shuzi_lianghua'}
+
+    def section(name):
+        return BROKEN[name] if random.random() < failure_rate else SECTIONS[name]
+
+    def complete_ai(text, model, agent, endpoint=None):
+        if agent is fast_analysis_prompt:
+            result = json.dumps({name: section(name) for name in SECTIONS}, ensure_ascii=False)
+        elif agent in stage_of:
+            # 分阶段请求返回无法解析的JSON时使用纠正提示重新请求，仍失败时整个解卦失败
+            result = json.dumps(SECTIONS[stage_of[agent]], ensure_ascii=False)
+            if random.random() < failure_rate:
+                result = result[:-1]
+        else:
+            result = SECTIONS['zonghe_jiedu'] if random.random() >= failure_rate else ''
+        time.sleep((RTT + (len(text) + len(agent)) / PREFILL_RATE + len(result) / DECODE_RATE) * scale)
+        return result
+
+    return complete_ai
+
+
+def run_mode(app, mode, runs, info, meter):
+    """按指定模式执行 runs 次解卦，返回统计结果"""
+    from analysis import build_pipeline
+    latencies = []
+    failures = 0
+    meter.reset()
+    with app.app_context():
+        for index in range(runs):
+            pipeline = build_pipeline(f'最近的财运如何？（{index}）', info, 'gpt-4', mode=mode)
+            start = time.perf_counter()
+            try:
+                pipeline.run()
+            except StageError:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+    return {
+        'latency': statistics.median(latencies),
+        'requests': meter.requests / runs,
+        'input_tokens': meter.input_tokens / runs,
+        'output_tokens': meter.output_tokens / runs,
+        'failure_rate': failures / runs
+    }
+
+
+def main():
+    """输出两种模式的对比结果"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=20, help='每种模式的解卦次数')
+    parser.add_argument('--failure-rate', type=float, default=0.05, help='模拟上游每个阶段返回格式错误的概率')
+    parser.add_argument('--scale', type=float, default=0.02, help='模拟延迟的缩放比例（报告中已换算回实际时间）')
+    parser.add_argument('--live', action='store_true', help='调用实际配置的接口')
+    args = parser.parse_args()
+
+    # 每次都调用上游，不读写AI响应缓存
+    config.LLM_CACHE_ENABLED = False
+    scale = 1.0 if args.live else args.scale
+    upstream = llm_client.complete_ai if args.live else simulated_ai(args.failure_rate, scale)
+    meter = Meter()
+
+    def metered(text, model, agent, endpoint=None):
+        result = upstream(text, model, agent, endpoint=endpoint)
+        meter.add(text, agent, result)
+        return result
+
+    llm_client.complete_ai = metered
+
+    app = create_app(start_workers=False)
+    with app.app_context():
+        db.create_all()
+    with open(SAMPLE_FILE, encoding='utf-8') as f:
+        info = json.load(f)['hexagram_info']
+
+    print(f"{'模式':<8}{'延迟中位数(秒)':>14}{'请求数':>8}{'输入token':>11}{'输出token':>11}{'失败率':>8}")
+    for mode in ('staged', 'fast'):
+        result = run_mode(app, mode, args.runs, info, meter)
+        print(f"{mode:<8}{result['latency'] / scale:>14.2f}{result['requests']:>8.2f}{result['input_tokens']:>11.0f}"
+              f"{result['output_tokens']:>11.0f}{result['failure_rate']:>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+# 登录吞吐量测试
+# 按不同的 bcrypt 成本因子，在密码计算线程池上并发校验密码，输出每秒可处理的登录数和单次延迟，
+# 用于为部署环境选择 BCRYPT_ROUNDS（通常让单次校验在 50-250 毫秒之间）
+# 运行方式：python benchmarks/bench_login.py [成本因子 ...]
+
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import config
+from password_hasher import PasswordHasher
+
+
+def measure(rounds, logins):
+    """并发完成 logins 次密码校验，返回 (每秒登录数, 延迟中位数毫秒, 延迟P95毫秒)"""
+    hasher = PasswordHasher(config.BCRYPT_WORKERS, logins)
+    password_hash = hasher.hash('password123', rounds)
+
+    def login(_):
+        start = time.perf_counter()
+        assert hasher.verify('password123', password_hash)
+        return time.perf_counter() - start
+
+    # 请求线程数为计算线程数的两倍，模拟登录高峰时的排队
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=config.BCRYPT_WORKERS * 2) as clients:
+        latencies = sorted(clients.map(login, range(logins)))
+    elapsed = time.perf_counter() - start
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    return logins / elapsed, statistics.median(latencies) * 1000, p95 * 1000
+
+
+def main():
+    """输出各成本因子下的登录吞吐量"""
+    rounds_list = [int(arg) for arg in sys.argv[1:]] or [8, 10, 11, 12]
+    print(f'密码计算线程数: {config.BCRYPT_WORKERS}（CPU核数 {os.cpu_count()}）')
+    for rounds in rounds_list:
+        # 每个成本因子测试约2秒
+        single = PasswordHasher(1, 1)
+        start = time.perf_counter()
+        single.hash('password123', rounds)
+        logins = max(int(2 / (time.perf_counter() - start) * config.BCRYPT_WORKERS), config.BCRYPT_WORKERS * 2)
+        rate, median, p95 = measure(rounds, logins)
+        marker = '（当前配置）' if rounds == config.BCRYPT_ROUNDS else ''
+        print(f'成本因子 {rounds}{marker}: {rate:.1f} 次登录/秒，延迟中位数 {median:.0f} 毫秒，P95 {p95:.0f} 毫秒')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# 解卦记录读取性能测试
+# 对比逐列解析JSON重建记录（旧实现）与直接返回写入时生成的完整记录JSON（新实现）的耗时和内存分配
+# 运行方式：python benchmarks/bench_record_read.py
+
+import json
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 使用临时数据库，不启动任务工作线程
+os.environ['DATABASE_URI'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ['JOB_WORKERS'] = '0'
+
+from app import create_app, init_db
+from models import db, User, HexagramRecord
+from analysis import save_record, load_payload
+from utils import jsoncodec
+
+
+def legacy_read(record_id):
+    """旧实现：读取整行，逐列 json.loads 后重建字典并编码"""
+    record = HexagramRecord.query.filter_by(record_id=record_id).first()
+    result = {
+        'id': record.id,
+        'record_id': record.record_id,
+        'question': record.question,
+        'hexagram_info': record.hexagram_info,
+        'model': record.model,
+        'yongshen': json.loads(record.yongshen),
+        'yongshen_guli': json.loads(record.yongshen_guli),
+        'dongyao_guli': json.loads(record.dongyao_guli),
+        'shuzi_lianghua': json.loads(record.shuzi_lianghua),
+        'zonghe_jiedu': record.zonghe_jiedu,
+        'timestamp': record.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+    }
+    return json.dumps({'record': result}, ensure_ascii=False)
+
+
+def payload_read(record_id):
+    """新实现：只读取 payload 列，直接拼接响应"""
+    payload, user_id = load_payload(record_id)
+    return '{"record":' + payload + '}'
+
+
+def payload_page_read(record_id):
+    """新实现（结果页面）：读取 payload 后解析为模板使用的字典"""
+    payload, user_id = load_payload(record_id)
+    return jsoncodec.loads(payload)
+
+
+def measure(name, func, record_id, number=2000):
+    """输出单次耗时和单次内存分配峰值"""
+    # 每次调用前清空会话，避免身份映射缓存影响对比
+    def run():
+        db.session.expunge_all()
+        func(record_id)
+
+    seconds = min(timeit.repeat(run, number=number, repeat=3)) / number
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{name}: {seconds * 1e6:.1f} 微秒/次，分配峰值 {peak / 1024:.1f} KB/次')
+
+
+def main():
+    """准备一条典型记录并对比读取方式"""
+    app = create_app(start_workers=False)
+    with app.app_context():
+        init_db()
+        user = User(username='bench')
+        user.set_password('bench1')
+        db.session.add(user)
+        db.session.commit()
+
+        results = {
+            'yongshen': {'text': '二爻妻财', 'yiju': '问财以妻财为用神。' * 10},
+            'yongshen_guli': {key: '分析内容。' * 40 for key in ['月建关系', '日辰关系', '动爻关系', '特殊状态', '回头生克', '原神忌神', '旺衰评估']},
+            'dongyao_guli': {'有动爻': True, '动爻列表': [{'爻位': f'{i}爻', '分析': '动爻分析。' * 40} for i in range(3)]},
+            'shuzi_lianghua': {'月建': '子', '日辰': '卯', '用神': '午', '动爻列表': ['寅', '戌'],
+                               '用神指数': {'月建数': -2.0, '日辰数': 1.0, '总指数': -1.0},
+                               '动爻指数': [{'地支': '寅', '月建数': 1.0, '日辰数': 1.0, '总指数': 2.0}]},
+            'zonghe_jiedu': '综合解读内容。' * 300
+        }
+        record_id = save_record(user.id, '测试问题', '卦象信息。' * 100, 'gpt-4', results)
+
+        measure('旧实现（整行 + 逐列解析 + 编码）', legacy_read, record_id)
+        measure('新实现（payload列直接返回）', payload_read, record_id)
+        measure('新实现（结果页面解析payload）', payload_page_read, record_id)
+        print(f"JSON编解码: {'orjson' if jsoncodec.orjson is not None else 'json'}")
+
+
+if __name__ == '__main__':
+    main()
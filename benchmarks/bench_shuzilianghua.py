@@ -0,0 +1,45 @@
+# 数字量化性能测试
+# 对比每次调用都重建映射表的旧实现与导入时编译为数组的新实现
+# 运行方式：python benchmarks/bench_shuzilianghua.py
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shuzilianghua import (shuzilianghua, shuzilianghua_batch, strength_cube,
+                           DIZHI_LIST, YUEJIAN_MAPPING, RICHEN_MAPPING)
+
+
+def legacy_shuzilianghua(yuejian, richen, dizhi):
+    """旧实现：每次调用重建地支列表和两张12×12嵌套字典后查表"""
+    dizhi_list = list(DIZHI_LIST)
+    yuejian_mapping = {row: dict(cols) for row, cols in YUEJIAN_MAPPING.items()}
+    richen_mapping = {row: dict(cols) for row, cols in RICHEN_MAPPING.items()}
+    if yuejian not in dizhi_list or richen not in dizhi_list or dizhi not in dizhi_list:
+        raise ValueError('无效的地支')
+    return yuejian_mapping[yuejian][dizhi], richen_mapping[richen][dizhi]
+
+
+def main():
+    """输出各实现的单次耗时"""
+    number = 20000
+    # 一次解卦：用神 + 两个动爻
+    dizhis = ['午', '寅', '戌']
+
+    cases = [
+        ('旧实现（逐个调用）', lambda: [legacy_shuzilianghua('子', '卯', d) for d in dizhis]),
+        ('新实现（逐个调用）', lambda: [shuzilianghua('子', '卯', d) for d in dizhis]),
+        ('新实现（批量调用）', lambda: shuzilianghua_batch('子', '卯', dizhis)),
+    ]
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=number, repeat=5)) / number
+        print(f'{name}: {seconds * 1e6:.2f} 微秒/次解卦')
+
+    seconds = min(timeit.repeat(strength_cube, number=200, repeat=5)) / 200
+    print(f'完整强弱立方体（12×12×12）: {seconds * 1e6:.2f} 微秒/次')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# Web工作进程冷启动耗时测试
+# 在新的Python进程中分别测量：导入 app 模块、create_app() 创建应用、首次请求首页（登录页），
+# 以及单独执行 init-db 的耗时；工作进程启动只包含前两项
+# 运行方式：python benchmarks/bench_startup.py [重复次数]
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER_SCRIPT = '''
+import time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+application = app.create_app(start_workers=False)
+created = time.perf_counter()
+application.test_client().get('/auth/login')
+served = time.perf_counter()
+loaded = sorted(name for name in ('pymysql', 'PIL', 'bcrypt') if name in __import__('sys').modules)
+print(imported - start, created - imported, served - created, ','.join(loaded) or '-')
+'''
+
+INIT_DB_SCRIPT = '''
+import time
+import app
+application = app.create_app(start_workers=False)
+start = time.perf_counter()
+with application.app_context():
+    app.init_db()
+print(time.perf_counter() - start)
+'''
+
+
+def run(script, env):
+    """在新进程中运行脚本，返回输出的各字段"""
+    output = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return output.strip().splitlines()[-1].split()
+
+
+def main():
+    """输出各阶段耗时的中位数"""
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    env = dict(os.environ, JOB_WORKERS='0',
+               DATABASE_URI='sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    init_db = [float(run(INIT_DB_SCRIPT, env)[0]) for _ in range(repeat)]
+    samples = [run(WORKER_SCRIPT, env) for _ in range(repeat)]
+
+    def median_ms(index):
+        return statistics.median(float(sample[index]) for sample in samples) * 1000
+
+    print(f'导入 app 模块: {median_ms(0):.0f} 毫秒')
+    print(f'create_app(): {median_ms(1):.0f} 毫秒')
+    print(f'工作进程启动合计: {median_ms(0) + median_ms(1):.0f} 毫秒')
+    print(f'首次请求登录页: {median_ms(2):.0f} 毫秒（已导入: {samples[-1][3]}）')
+    print(f'init-db（已初始化的数据库）: {statistics.median(init_db) * 1000:.0f} 毫秒')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,101 @@
 # 图形验证码功能模块
 # 该文件实现了图形验证码的生成和验证功能
+# 字体和各字符的字形只在进程内加载、渲染一次，生成时按随机偏移粘贴字形；
+# 图像使用随机调色板，噪点由一次性生成的随机字节整体合成到图像上，不再逐点绘制；
+# 后台线程预先生成一批验证码放入池中，请求直接取用
+# Pillow 在首次生成验证码时才导入，不增加Web进程的启动时间
 
-from PIL import Image, ImageDraw, ImageFont
+from collections import deque
+import functools
 import random
 import string
 import io
+import os
+import threading
+import time
 from flask import session
 from config import config
+from utils.logger import setup_logger
+
+# 设置日志
+logger = setup_logger(__name__)
 
 # 验证码字符集（去除了容易混淆的字符，如0、O、1、I、l等）
 CAPTCHA_CHARS = string.ascii_uppercase + string.digits.replace('0', '').replace('O', '').replace('1', '').replace('I', '').replace('L', '')
 
+# 每个字符预先渲染的旋转角度
+GLYPH_ANGLES = (-20, -10, 0, 10, 20)
+
+# 调色板分区：0为白色背景，其余索引依次为文字、干扰线和噪点颜色
+TEXT_COLORS = (1, 64)  # 各通道0-100
+LINE_COLORS = (64, 128)  # 各通道0-150
+NOISE_COLORS = (128, 256)  # 各通道0-200
+
+# 随机字节到颜色通道值和噪点颜色索引的映射表（用于 bytes.translate）
+_SCALE_100 = bytes(v * 101 // 256 for v in range(256))
+_SCALE_150 = bytes(v * 151 // 256 for v in range(256))
+_SCALE_200 = bytes(v * 201 // 256 for v in range(256))
+_NOISE_INDEX = bytes(NOISE_COLORS[0] + v * (NOISE_COLORS[1] - NOISE_COLORS[0]) // 256 for v in range(256))
+
+# PNG压缩级别（验证码图片很小，低压缩级别编码更快）
+PNG_COMPRESS_LEVEL = 1
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(font_size):
+    """加载验证码字体（每个进程每种字号只加载一次）
+
+    Args:
+        font_size (int): 字体大小
+
+    Returns:
+        FreeTypeFont: 字体，系统中没有配置的字体时使用Pillow内置字体
+    """
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype(config.CAPTCHA_FONT, font_size)
+    except IOError:
+        logger.info(f'未找到字体 {config.CAPTCHA_FONT}，验证码使用默认字体')
+        return ImageFont.load_default(font_size)
+
+
+@functools.lru_cache(maxsize=None)
+def load_glyphs(font_size):
+    """预先渲染所有字符在各个旋转角度下的字形蒙版
+
+    Args:
+        font_size (int): 字体大小
+
+    Returns:
+        dict: 字符 -> 字形蒙版（L模式图像）列表
+    """
+    from PIL import Image, ImageDraw
+    font = load_font(font_size)
+    glyphs = {}
+    for char in CAPTCHA_CHARS:
+        left, top, right, bottom = font.getbbox(char)
+        mask = Image.new('L', (right - left + 2, bottom - top + 2), 0)
+        ImageDraw.Draw(mask).text((1 - left, 1 - top), char, font=font, fill=255)
+        glyphs[char] = [mask.rotate(angle, resample=Image.BILINEAR, expand=True) for angle in GLYPH_ANGLES]
+    return glyphs
+
+
+def _random_palette():
+    """生成一张验证码使用的随机调色板
+
+    Returns:
+        bytes: 256种颜色的RGB值
+    """
+    data = os.urandom(768)
+    return (b'\xff\xff\xff'
+            + data[3:LINE_COLORS[0] * 3].translate(_SCALE_100)
+            + data[LINE_COLORS[0] * 3:NOISE_COLORS[0] * 3].translate(_SCALE_150)
+            + data[NOISE_COLORS[0] * 3:].translate(_SCALE_200))
+
+
 class Captcha:
     """图形验证码生成类"""
-    
+
     def __init__(self):
         """初始化验证码生成器"""
         self.length = config.CAPTCHA_LENGTH  # 验证码长度
@@ -22,89 +104,170 @@ class Captcha:
         self.font_size = config.CAPTCHA_FONT_SIZE  # 验证码字体大小
         self.noise_level = config.CAPTCHA_NOISE_LEVEL  # 验证码噪声级别
         self.expiration = config.CAPTCHA_EXPIRATION  # 验证码有效期（秒）
-    
-    def generate_captcha(self):
-        """生成图形验证码
-        
+        # 随机字节到噪点蒙版的映射（小于阈值的像素成为噪点）
+        threshold = int(256 * self.noise_level)
+        self._mask_table = bytes(255 if v < threshold else 0 for v in range(256))
+        self.pool = CaptchaPool(self, config.CAPTCHA_POOL_SIZE)
+
+    def render(self):
+        """渲染一张验证码图片
+
         Returns:
-            tuple: (验证码图像字节流, 验证码文本)
+            tuple: (PNG图像字节, 验证码文本)
         """
+        from PIL import Image, ImageDraw
+
         # 生成随机验证码文本
         captcha_text = ''.join(random.sample(CAPTCHA_CHARS, self.length))
-        
-        # 创建验证码图像
-        image = Image.new('RGB', (self.width, self.height), (255, 255, 255))
-        
-        # 获取绘图对象
-        draw = ImageDraw.Draw(image)
-        
-        # 加载字体（使用默认字体）
-        try:
-            # 尝试使用系统字体
-            font = ImageFont.truetype('arial.ttf', self.font_size)
-        except IOError:
-            # 如果系统没有arial字体，使用默认字体
-            font = ImageFont.load_default()
-        
-        # 绘制验证码文本
+
+        # 创建调色板模式的验证码图像（每个像素1字节，合成和PNG编码都比RGB快）
+        image = Image.new('P', (self.width, self.height), 0)
+        image.putpalette(_random_palette())
+        glyphs = load_glyphs(self.font_size)
+
+        # 粘贴预先渲染的字形（随机旋转角度、位置和颜色）
         for i, char in enumerate(captcha_text):
-            # 随机字符位置
-            x = 10 + i * (self.width - 20) // self.length
-            y = random.randint(5, self.height - self.font_size - 5)
-            # 随机字符颜色
-            color = (random.randint(0, 100), random.randint(0, 100), random.randint(0, 100))
-            # 绘制字符
-            draw.text((x, y), char, font=font, fill=color)
-        
+            mask = random.choice(glyphs[char])
+            x = 10 + i * (self.width - 20) // self.length + random.randint(-2, 2)
+            y = random.randint(0, max(self.height - mask.height, 0))
+            image.paste(random.randrange(*TEXT_COLORS), (x, y), mask)
+
         # 添加干扰线
+        draw = ImageDraw.Draw(image)
         for _ in range(5):
-            # 随机干扰线颜色
-            line_color = (random.randint(0, 150), random.randint(0, 150), random.randint(0, 150))
             # 随机干扰线位置
             x1 = random.randint(0, self.width)
             y1 = random.randint(0, self.height)
             x2 = random.randint(0, self.width)
             y2 = random.randint(0, self.height)
             # 绘制干扰线
-            draw.line([(x1, y1), (x2, y2)], fill=line_color, width=2)
-        
-        # 添加噪点
-        for _ in range(int(self.width * self.height * self.noise_level)):
-            # 随机噪点位置
-            x = random.randint(0, self.width - 1)
-            y = random.randint(0, self.height - 1)
-            # 随机噪点颜色
-            noise_color = (random.randint(0, 200), random.randint(0, 200), random.randint(0, 200))
-            # 绘制噪点
-            draw.point((x, y), fill=noise_color)
-        
-        # 将图像转换为字节流
+            draw.line([(x1, y1), (x2, y2)], fill=random.randrange(*LINE_COLORS), width=2)
+
+        # 添加噪点：由随机字节生成的噪点颜色层按随机蒙版一次性合成
+        size = (self.width, self.height)
+        pixels = self.width * self.height
+        noise = Image.frombytes('P', size, os.urandom(pixels).translate(_NOISE_INDEX))
+        mask = Image.frombytes('L', size, os.urandom(pixels).translate(self._mask_table))
+        image.paste(noise, (0, 0), mask)
+
+        # 将图像编码为PNG
         img_io = io.BytesIO()
-        image.save(img_io, format='PNG')
-        img_io.seek(0)
-        
-        # 保存验证码到session中，用于后续验证
+        image.save(img_io, format='PNG', compress_level=PNG_COMPRESS_LEVEL)
+        return img_io.getvalue(), captcha_text
+
+    def generate_captcha(self):
+        """生成图形验证码（优先从预生成池中取用）
+
+        Returns:
+            tuple: (验证码图像字节流, 验证码文本)
+        """
+        png, captcha_text = self.pool.pop()
+
+        # 保存验证码及其过期时间到session中，用于后续验证
         session['captcha'] = captcha_text
+        session['captcha_expires'] = time.time() + self.expiration
         session.permanent = False  # 不使用永久会话
-        
-        return img_io, captcha_text
-    
+
+        return io.BytesIO(png), captcha_text
+
     @staticmethod
     def verify_captcha(user_input):
         """验证验证码
-        
+
         Args:
             user_input (str): 用户输入的验证码
-            
+
         Returns:
-            bool: 验证码是否正确
+            bool: 验证码是否正确且未过期
         """
-        # 获取session中保存的验证码
-        captcha = session.get('captcha', '')
-        
-        # 清除session中的验证码，防止重复使用
-        if 'captcha' in session:
-            del session['captcha']
-        
+        # 获取并清除session中保存的验证码，防止重复使用
+        captcha = session.pop('captcha', '')
+        expires = session.pop('captcha_expires', 0)
+
+        # 未获取过验证码或验证码已过期
+        if not captcha or time.time() > expires:
+            return False
+
         # 验证验证码（不区分大小写）
         return user_input.upper() == captcha.upper()
+
+
+class CaptchaPool:
+    """预生成验证码池
+
+    池中的验证码由后台线程补充，每张只会被取用一次；池为空时在请求中直接渲染。
+    后台线程在首次取用时启动（多进程部署时在各个工作进程中分别启动）。
+    """
+
+    def __init__(self, generator, size):
+        """初始化验证码池
+
+        Args:
+            generator (Captcha): 验证码生成器
+            size (int): 池容量，为0时不预生成
+        """
+        self.generator = generator
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._items = deque()
+        self._cond = threading.Condition()
+        self._pid = None
+
+    def pop(self):
+        """取出一张验证码
+
+        Returns:
+            tuple: (PNG图像字节, 验证码文本)
+        """
+        if self.size <= 0:
+            return self.generator.render()
+        self._ensure_worker()
+        with self._cond:
+            if self._items:
+                self.hits += 1
+                item = self._items.popleft()
+                self._cond.notify()
+                return item
+            self.misses += 1
+            self._cond.notify()
+        return self.generator.render()
+
+    def _ensure_worker(self):
+        """在当前进程中启动补充线程（fork 后子进程需要重新启动）"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._cond:
+            if self._pid == pid:
+                return
+            self._pid = pid
+            self._items.clear()
+        threading.Thread(target=self._refill, name='captcha-pool', daemon=True).start()
+
+    def _refill(self):
+        """后台补充验证码，池满时等待取用"""
+        while True:
+            with self._cond:
+                while len(self._items) >= self.size:
+                    self._cond.wait()
+            try:
+                item = self.generator.render()
+            except Exception as e:
+                logger.error(f'预生成验证码失败: {str(e)}')
+                time.sleep(1)
+                continue
+            with self._cond:
+                self._items.append(item)
+
+    def stats(self):
+        """返回验证码池统计信息"""
+        with self._cond:
+            lookups = self.hits + self.misses
+            return {
+                'ready': len(self._items),
+                'size': self.size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -20,6 +20,19 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URI') or 'sqlite:///ai_liuyao.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False  # 禁用跟踪修改，提高性能
     
+    # 登录用户缓存配置
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))  # 用户快照缓存时间（秒）；未配置 AUTH_SIGNAL_DIR 时也是修改密码后其他进程中旧会话的最长有效时间
+    AUTH_SIGNAL_DIR = os.environ.get('AUTH_SIGNAL_DIR', '')  # 修改密码时通知其他进程的信号文件目录（所有进程共享，gunicorn.conf.py 默认设置），为空时只在本进程内失效
+    USER_CACHE_SIZE = 4096  # 每个进程最多缓存的用户数
+    MODEL_REGISTRY_SIZE = 4096  # 每个进程最多缓存模型注册表的用户数
+    
+    # 密码哈希配置
+    BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))  # bcrypt成本因子，每加1计算时间翻倍；登录时成本不同的旧哈希会重新计算
+    BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', os.cpu_count() or 2))  # 每个进程同时进行的密码计算数
+    BCRYPT_MAX_QUEUE = int(os.environ.get('BCRYPT_MAX_QUEUE', 64))  # 最多排队等待的密码计算数，超出时登录和注册返回503
+    BCRYPT_WAIT_TIMEOUT = 10  # 等待密码计算完成的最长时间（秒），超时返回503
+    BCRYPT_RETRY_AFTER = 5  # 返回503时建议客户端等待的时间（秒）
+    
     # 图形验证码配置
     CAPTCHA_LENGTH = 4  # 验证码长度
     CAPTCHA_WIDTH = 120  # 验证码宽度
@@ -27,6 +40,8 @@ class Config:
     CAPTCHA_FONT_SIZE = 20  # 验证码字体大小
     CAPTCHA_NOISE_LEVEL = 0.3  # 验证码噪声级别
     CAPTCHA_EXPIRATION = 300  # 验证码有效期（秒）
+    CAPTCHA_FONT = os.environ.get('CAPTCHA_FONT', 'arial.ttf')  # 验证码字体文件，找不到时使用Pillow内置字体
+    CAPTCHA_POOL_SIZE = int(os.environ.get('CAPTCHA_POOL_SIZE', 64))  # 每个进程预生成的验证码数量，为0时在请求中生成
     
     # 支持的AI模型
     SUPPORTED_MODELS = [
@@ -35,7 +50,74 @@ class Config:
         "gpt-4o"
     ]
     
-    # 历史记录存储目录（暂时保留，用于迁移旧数据）
+    # AI接口配置（OpenAI兼容接口，用于流式输出；未配置时使用 api.py 的非流式调用）
+    AI_API_URL = os.environ.get('AI_API_URL', '')  # 聊天补全接口地址，如 https://api.openai.com/v1/chat/completions
+    AI_API_KEY = os.environ.get('AI_API_KEY', '')  # 接口密钥
+    AI_CONNECT_TIMEOUT = 10  # 连接超时（秒）
+    AI_READ_TIMEOUT = 60  # 读取超时（秒）
+    FETCH_MODELS_TIMEOUT = 15  # 获取自定义接口模型列表的读取超时（秒）
+    HTTP_POOL_MAXSIZE = int(os.environ.get('HTTP_POOL_MAXSIZE', 32))  # 每个上游地址保持的最大连接数
+    HTTP_POOL_MAX_UPSTREAMS = int(os.environ.get('HTTP_POOL_MAX_UPSTREAMS', 64))  # 最多保持连接池的上游地址数，超出时关闭最久未使用的
+    HTTP_POOL_BLOCK = True  # 连接数达到上限时等待空闲连接，而不是临时新建连接
+    
+    # AI调用准入控制配置（按 模型+接口地址 分别限制，按进程生效）
+    ADMISSION_MAX_CONCURRENCY = int(os.environ.get('ADMISSION_MAX_CONCURRENCY', 8))  # 最大并发请求数
+    ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', 5))  # 每秒请求数（令牌桶补充速率）
+    ADMISSION_BURST = int(os.environ.get('ADMISSION_BURST', 10))  # 允许的突发请求数（令牌桶容量）
+    ADMISSION_MAX_QUEUE = int(os.environ.get('ADMISSION_MAX_QUEUE', 32))  # 最多排队等待的请求数，超出时立即返回503
+    ADMISSION_WAIT_TIMEOUT = 30  # 最长排队时间（秒），超时返回503
+    ADMISSION_RETRY_AFTER = 10  # 返回503时建议客户端等待的时间（秒）
+    AI_MAX_RETRIES = 3  # 限流、上游错误或网络异常时的最大重试次数
+    AI_BACKOFF_BASE = 1.0  # 指数退避基数（秒）
+    AI_BACKOFF_MAX = 20.0  # 单次退避等待上限（秒），同时限制 Retry-After
+    
+    # 解卦流水线配置
+    PIPELINE_MAX_WORKERS = int(os.environ.get('PIPELINE_MAX_WORKERS', 16))  # 阶段执行线程池大小（所有请求共享）
+    ANALYSIS_MODE = os.environ.get('ANALYSIS_MODE', 'staged')  # 默认分析模式：staged（各阶段分别请求）或 fast（一次请求完成全部分析），请求中的 mode 参数优先
+    FAST_MODE_MODELS = [name.strip() for name in os.environ.get('FAST_MODE_MODELS', '').split(',') if name.strip()]  # 默认使用快速模式的模型，逗号分隔
+    STAGE_REPAIR_ATTEMPTS = int(os.environ.get('STAGE_REPAIR_ATTEMPTS', 1))  # 阶段响应无法解析或缺少字段时，使用纠正提示单独重新请求该阶段的次数
+    PIPELINE_RUN_STALE_SECONDS = 900  # 解卦运行处于running状态超过该时长视为已中断，可以继续执行（秒）
+    
+    # 异步解卦任务配置
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))  # 每个进程的任务工作线程数，0表示不在Web进程中执行任务
+    JOB_POLL_INTERVAL = 2  # 队列为空时的轮询间隔（秒）
+    JOB_HEARTBEAT_INTERVAL = 10  # 工作线程池更新执行中任务心跳、检查中断任务的间隔（秒）
+    JOB_HEARTBEAT_TIMEOUT = 60  # running状态的任务超过该时长没有心跳视为已中断，重新入队（秒）
+    JOB_MAX_RETRIES = int(os.environ.get('JOB_MAX_RETRIES', 5))  # 上游繁忙时任务最多重新入队的次数，超出后任务失败
+    JOB_RETRY_DELAY = 15  # 上游繁忙重新入队后再次执行前的等待时间（秒），每次翻倍
+    
+    # AI响应缓存配置
+    LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', '1') not in ('0', 'false', 'False')  # 是否启用缓存
+    LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 7 * 24 * 3600))  # 缓存有效期（秒）
+    LLM_CACHE_MEMORY_ITEMS = 256  # 进程内LRU缓存条目数
+    LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 10000))  # 数据库缓存条目上限，超出时淘汰最久未使用的条目
+    LLM_CACHE_PRUNE_EVERY = 100  # 每写入多少条缓存执行一次淘汰
+    LLM_CACHE_TOUCH_INTERVAL = 3600  # 数据库缓存命中时最多每隔多少秒写回一次最近使用时间和命中次数
+    
+    # 解卦结果HTTP缓存配置
+    RESULT_RENDER_VERSION = '1'  # 结果页面渲染版本，修改 result.html 或记录数据格式后需递增，使旧的ETag失效
+    RESULT_CACHE_MAX_AGE = 7 * 24 * 3600  # 浏览器缓存时间（秒）
+    RESULT_PAGE_CACHE_BYTES = int(os.environ.get('RESULT_PAGE_CACHE_BYTES', 32 * 1024 * 1024))  # 进程内渲染页面缓存大小上限（字节），0表示不缓存
+    
+    # 历史记录分页配置
+    HISTORY_PAGE_SIZE = 20  # 每页记录数
+    HISTORY_PAGE_MAX = 100  # 每页记录数上限
+    
+    # 卦象表配置（同一卦象只保存和解析一次，见 hexagram_store.py）
+    HEXAGRAM_CACHE_SIZE = 1024  # 每个进程缓存的卦象（含解析结果）数量
+    
+    # 解卦记录压缩存储配置（卦象信息、各阶段结果和完整记录JSON，见 utils/compression.py）
+    TEXT_COMPRESSION = os.environ.get('TEXT_COMPRESSION', 'zstd')  # 写入时的压缩算法：zstd（未安装 zstandard 时使用 zlib）、zlib 或 none；已有数据按数据头解压，修改后仍可读取
+    TEXT_COMPRESSION_LEVEL = int(os.environ.get('TEXT_COMPRESSION_LEVEL', 0)) or None  # 压缩级别，默认 zstd 为3、zlib 为6
+    TEXT_COMPRESSION_MIN_BYTES = 64  # 小于该长度（字节）的文本不压缩
+    
+    # 监控指标配置（/metrics，Prometheus 文本格式，见 metrics.py）
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') not in ('0', 'false', 'False')  # 是否启用请求计时、数据库查询统计和 /metrics
+    METRICS_DIR = os.environ.get('METRICS_DIR', '')  # 多进程部署时各进程写入指标快照的目录（gunicorn.conf.py 默认设置），为空时只输出本进程的指标
+    METRICS_FLUSH_INTERVAL = 5  # 指标快照的写入间隔（秒）
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # 访问 /metrics 需要的令牌，为空时不校验
+    
+    # 旧版历史记录文件目录（flask --app app import-history 的默认导入目录）
     HISTORY_DIR = 'history'
 
 # 创建配置实例
@@ -0,0 +1,70 @@
+# 测试公共夹具：使用临时数据库的应用和模拟的上游AI
+import json
+import pytest
+import llm_client
+import prompt
+from app import create_app, init_db
+from config import Config, config
+from hexagram_store import hexagram_store
+from model_registry import model_registry
+from models import db
+from user_cache import user_cache
+
+# 各阶段默认的模拟响应
+RESPONSES = {
+    'yongshen': {'text': '二爻妻财', 'yiju': '问财以妻财为用神。'},
+    'yongshen_guli': {name: '得月建生扶' for name in ('月建关系', '日辰关系', '动爻关系', '特殊状态',
+                                                   '回头生克', '原神忌神', '旺衰评估')},
+    'dongyao_guli': {'有动爻': True, '动爻列表': [{'爻位': '五爻'}]},
+    'shuzi_lianghua': {'月建': '亥', '日辰': '酉', '用神': '卯', '动爻列表': ['申']},
+    'zonghe_jiedu': '财运平稳。'
+}
+
+
+class FakeAI:
+    """模拟的 complete_ai：按提示词确定阶段，返回 responses 中该阶段的响应并记录调用顺序
+
+    responses 的值可以是字典（转换为JSON）、字符串或以请求文本为参数的函数。
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.responses = dict(RESPONSES)
+        self.stages = {getattr(prompt, f'{name}_prompt'): name for name in RESPONSES}
+        self.stages[prompt.fast_analysis_prompt] = 'fast'
+
+    def __call__(self, text, model, agent, endpoint=None):
+        stage = self.stages.get(agent, 'chat')
+        self.calls.append(stage)
+        response = self.responses.get(stage, '')
+        if callable(response):
+            response = response(text)
+        return response if isinstance(response, str) else json.dumps(response, ensure_ascii=False)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """使用临时SQLite数据库、不读写AI响应缓存的应用（测试期间处于应用上下文中）
+
+    每个测试的数据库都是新的，用户ID会重复，测试结束时清空按ID缓存的用户快照、模型注册表和卦象。
+    """
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+
+    monkeypatch.setattr(config, 'LLM_CACHE_ENABLED', False)
+    app = create_app(TestConfig, start_workers=False)
+    with app.app_context():
+        init_db()
+        yield app
+        db.session.remove()
+    model_registry.clear()
+    user_cache.clear()
+    hexagram_store.clear()
+
+
+@pytest.fixture
+def fake_ai(monkeypatch):
+    """替换上游AI调用"""
+    fake = FakeAI()
+    monkeypatch.setattr(llm_client, 'complete_ai', fake)
+    return fake
@@ -0,0 +1,141 @@
+# 历史记录导出模块
+# 该文件以生成器的形式逐行输出解卦记录（NDJSON 或 CSV），可选实时 gzip 压缩：
+# 记录通过服务端游标（yield_per）分批读取，每批输出后即释放，内存占用与记录总数无关。
+# 导出接口和命令行（flask --app app export-history）共用这里的生成器。
+
+import csv
+import io
+import zlib
+from models import db, Hexagram, HexagramRecord
+from utils import jsoncodec
+
+# 支持的导出格式 -> (MIME类型, 文件扩展名)
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv')
+}
+
+# CSV 列（分析结果列为原样保存的JSON文本）
+CSV_COLUMNS = ['record_id', 'user_id', 'timestamp', 'model', 'question', 'hexagram_info',
+               'yongshen_text', 'yongshen_zhishu', 'yongshen', 'yongshen_guli', 'dongyao_guli',
+               'shuzi_lianghua', 'zonghe_jiedu']
+
+# 每批从数据库读取的记录数，也是每次输出的记录数
+BATCH_SIZE = 200
+
+
+def _ordered_query(query, user_id):
+    """关联卦象表，限定用户并按时间排序，使用服务端游标分批读取"""
+    query = query.outerjoin(Hexagram, HexagramRecord.hexagram_id == Hexagram.id)
+    if user_id is not None:
+        query = query.filter(HexagramRecord.user_id == user_id)
+    return query.order_by(HexagramRecord.timestamp, HexagramRecord.id).yield_per(BATCH_SIZE)
+
+
+def iter_ndjson(user_id=None):
+    """逐批生成 NDJSON 文本，每行为一条完整记录（与记录详情接口格式一致）
+
+    Args:
+        user_id (int): 用户ID，为None时导出全部用户的记录（每行附带 user_id）
+
+    Yields:
+        str: 若干行 NDJSON 文本
+    """
+    from analysis import record_payload, fill_payload_hexagram
+    query = _ordered_query(db.session.query(HexagramRecord.id, HexagramRecord.user_id, HexagramRecord.payload,
+                                            Hexagram.content), user_id)
+    lines = []
+    for row in query:
+        payload = row.payload
+        if payload is None:
+            # 尚未生成完整记录JSON的旧记录（见 backfill-payloads）
+            payload = jsoncodec.dumps(record_payload(db.session.get(HexagramRecord, row.id)))
+        else:
+            payload = fill_payload_hexagram(payload, row.content)
+        if user_id is None:
+            payload = '{"user_id":%d,' % row.user_id + payload[1:]
+        lines.append(payload)
+        if len(lines) >= BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+def iter_csv(user_id=None):
+    """逐批生成 CSV 文本（UTF-8 带BOM，Excel 可直接打开）
+
+    Args:
+        user_id (int): 用户ID，为None时导出全部用户的记录
+
+    Yields:
+        str: 表头或若干行 CSV 文本
+    """
+    # 卦象信息取引用的卦象，旧记录取本行保存的副本
+    hexagram_index = CSV_COLUMNS.index('hexagram_info')
+    columns = [getattr(HexagramRecord, name) for name in CSV_COLUMNS] + [Hexagram.content]
+    query = _ordered_query(db.session.query(*columns), user_id)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    yield '\ufeff' + buffer.getvalue()
+
+    count = 0
+    buffer.seek(0)
+    buffer.truncate()
+    for row in query:
+        values = list(row[:-1])
+        values[2] = row.timestamp.strftime('%Y-%m-%d %H:%M:%S')
+        if row.content is not None:
+            values[hexagram_index] = row.content
+        writer.writerow(values)
+        count += 1
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def gzip_stream(chunks, level=6):
+    """将文本块实时压缩为 gzip 数据流
+
+    Args:
+        chunks: 生成文本块的可迭代对象
+        level (int): 压缩级别
+
+    Yields:
+        bytes: gzip 数据
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_records(format, user_id=None, gzip=False):
+    """生成导出数据流
+
+    Args:
+        format (str): 导出格式（ndjson 或 csv）
+        user_id (int): 用户ID，为None时导出全部用户的记录
+        gzip (bool): 是否实时 gzip 压缩
+
+    Returns:
+        iterator: 文本块（gzip 时为字节块）
+
+    Raises:
+        ValueError: 不支持的导出格式
+    """
+    if format not in FORMATS:
+        raise ValueError(f'不支持的导出格式: {format}')
+    chunks = iter_ndjson(user_id) if format == 'ndjson' else iter_csv(user_id)
+    return gzip_stream(chunks) if gzip else chunks
+
+
+def export_filename(format, gzip=False):
+    """导出文件名，如 history.ndjson.gz"""
+    return f'history.{FORMATS[format][1]}' + ('.gz' if gzip else '')
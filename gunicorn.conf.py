@@ -0,0 +1,61 @@
+# gunicorn 生产环境配置
+# 使用方式：gunicorn -c gunicorn.conf.py wsgi:app
+# 主进程预加载应用（导入模块、创建应用）后 fork 出工作进程，工作进程共享已加载的代码，启动时不再重复导入；
+# 每个工作进程使用多线程处理请求：解卦和聊天的流式输出（SSE）会长时间占用一个线程，但主要在等待上游AI接口。
+
+import multiprocessing
+import os
+import tempfile
+
+# 监听地址
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+
+# 同一主机运行多个实例时，各实例的共享目录按监听地址区分
+_instance = ''.join(c if c.isalnum() else '_' for c in bind)
+
+# 各进程的监控指标快照目录，/metrics 汇总所有工作进程
+os.environ.setdefault('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'liuyao-metrics-' + _instance))
+
+# 修改密码时通知其他工作进程的信号文件目录（各进程缓存的旧会话立即失效）
+os.environ.setdefault('AUTH_SIGNAL_DIR', os.path.join(tempfile.gettempdir(), 'liuyao-auth-' + _instance))
+
+# 工作进程数（默认CPU核数+1；进程内缓存按进程生效，进程数不宜过多）
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() + 1))
+
+# 每个工作进程的线程数
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+
+# 预加载应用，工作进程 fork 后直接使用
+preload_app = True
+
+# 工作进程心跳超时（gthread 模式下不限制单个请求时长，流式输出不受影响）
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# 日志输出到标准输出
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    """工作进程 fork 之后：丢弃从主进程继承的数据库连接，并启动异步解卦任务工作线程"""
+    from wsgi import app
+    from models import db
+    from jobs import start_job_workers
+    with app.app_context():
+        db.engine.dispose(close=False)
+    start_job_workers(app)
+
+
+def on_starting(server):
+    """主进程启动时删除上次运行留下的指标快照"""
+    from utils.metrics import clear_directory
+    clear_directory(os.environ['METRICS_DIR'])
+
+
+def child_exit(server, worker):
+    """工作进程退出后，汇总指标时不再统计其仪表盘（计数器和直方图保留）"""
+    from utils.metrics import mark_process_dead
+    mark_process_dead(worker.pid, os.environ['METRICS_DIR'])
@@ -1,21 +1,77 @@
 # 解卦功能模块
 # 该文件实现了解卦相关的功能，包括解卦API、解卦记录管理等
 
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request, jsonify, stream_with_context, current_app
 from flask_login import login_required, current_user
-from models import db, HexagramRecord
+from models import db, HexagramRecord, AnalysisJob
 from config import config
-import uuid
-import time
-import json
+from analysis import load_payload, MODES
+from hexagram_store import hexagram_store
+from pipeline import StageError
+from admission import UpstreamBusyError
+from jobs import enqueue_job, job_to_dict
+from pipeline_runs import (start_run, get_run, run_results, run_to_dict, claim_run, execute_run,
+                           build_run_pipeline, save_stage, fail_run, finish_run)
+from metrics import analyses_in_flight
+from search import search_records
+from export import FORMATS, export_records, export_filename
+from utils.sse import format_sse, format_keepalive, sse_response, KEEPALIVE_INTERVAL
+from utils.http_cache import PageCache, make_etag, not_modified, set_cache_headers
+from utils.stats import register_stats
+from datetime import datetime
+import queue
+import threading
 
 # 创建解卦蓝图
 hexagram_bp = Blueprint('hexagram', __name__, url_prefix='/hexagram')
 
+# 渲染后的结果页面缓存，键为 (record_id, 用户ID, ETag)
+result_page_cache = PageCache(config.RESULT_PAGE_CACHE_BYTES)
+register_stats('result_pages', result_page_cache.stats)
+
+def busy_response(error, run_id=None):
+    """上游繁忙时的503响应
+
+    Args:
+        error (UpstreamBusyError): 上游繁忙异常
+        run_id (str): 解卦运行ID，给出时客户端可在稍后继续执行
+
+    Returns:
+        tuple: (JSON响应, 503)，带 Retry-After 响应头
+    """
+    body = {'error': str(error), 'retry_after': error.retry_after}
+    if run_id:
+        body['run_id'] = run_id
+    response = jsonify(body)
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
+def stage_error_response(error, run_id):
+    """阶段失败时的响应，包含可用于继续执行的运行ID和已完成的阶段
+
+    Args:
+        error (StageError): 阶段失败异常
+        run_id (str): 解卦运行ID
+
+    Returns:
+        tuple: (JSON响应, 状态码)
+    """
+    if isinstance(error.error, UpstreamBusyError):
+        return busy_response(error.error, run_id)
+    return jsonify({
+        'error': f'分析失败: {str(error.error)}',
+        'run_id': run_id,
+        'failed_stage': error.stage,
+        'stages_done': list(error.results)
+    }), 500
+
 @hexagram_bp.route('/analyze', methods=['POST'])
 def api_analyze():
     """六爻分析API
     
+    查询参数 async=1 时创建异步任务并立即返回任务ID，
+    之后通过 /hexagram/jobs/<job_id> 查询进度和结果。
+    
     Returns:
         JSON: 分析结果
     """
@@ -25,127 +81,225 @@ def api_analyze():
         hexagram_info = data.get('hexagram_info', '')
         model = data.get('model', 'gpt-4')
         user_yongshen = data.get('user_yongshen', '').strip()
+        force_refresh = bool(data.get('force_refresh', False))
+        mode = data.get('mode') or None
         
         if not question or not hexagram_info:
             return jsonify({'error': '问题和卦象信息不能为空'}), 400
+        if mode is not None and mode not in MODES:
+            return jsonify({'error': f'不支持的分析模式: {mode}'}), 400
         
-        # 生成记录ID
-        record_id = str(uuid.uuid4())
-        timestamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime())
-        
-        # 1. 用神判断（优先使用用户指定用神）
-        if user_yongshen:
-            # 使用用户指定的用神
-            yongshen_data = {
-                'text': user_yongshen,
-                'yiju': f'用户指定用神为：{user_yongshen}'
-            }
-        else:
-            # AI判断用神
-            from api import AI
-            from prompt import yongshen_prompt
-            yongshen_result = AI(f"问题：{question}\n卦象信息：{hexagram_info}", model=model, agent=yongshen_prompt)
-            try:
-                yongshen_data = json.loads(yongshen_result)
-            except json.JSONDecodeError as e:
-                return jsonify({'error': f'分析失败: 无法解析AI响应 - {str(e)}'}), 500
-        
-        # 2. 用神卦理分析
-        from api import AI
-        from prompt import yongshen_guli_prompt
-        yongshen_guli_result = AI(
-            f"问题：{question}\n卦象信息：{hexagram_info}\n已确定用神：{yongshen_data['text']}",
-            model=model,
-            agent=yongshen_guli_prompt
-        )
+        # 获取当前用户ID（如果用户未登录，user_id为None）
+        user_id = current_user.id if current_user.is_authenticated else None
+        
+        # 保存卦象（相同的卦象只保存和解析一次），之后的分析和记录使用规范化后的卦象信息
+        hexagram_info = hexagram_store.get(hexagram_info).content
+        
+        # 异步模式：加入任务队列后立即返回
+        if request.args.get('async') in ('1', 'true'):
+            job_id = enqueue_job(user_id, question, hexagram_info, model, user_yongshen, force_refresh, mode)
+            return jsonify({'success': True, 'job_id': job_id}), 202
+        
+        # 按依赖关系并发执行各分析阶段，每个阶段完成后保存检查点，全部完成后保存历史记录
+        # 失败时返回运行ID，通过 /hexagram/runs/<run_id>/resume 从已完成的阶段继续
+        run = start_run(user_id, question, hexagram_info, model, user_yongshen, force_refresh, mode)
         try:
-            yongshen_guli_data = json.loads(yongshen_guli_result)
-        except json.JSONDecodeError as e:
-            return jsonify({'error': f'分析失败: 无法解析AI响应 - {str(e)}'}), 500
-        
-        # 3. 动爻卦理分析
-        from prompt import dongyao_guli_prompt
-        dongyao_guli_result = AI(
-            f"卦象信息：{hexagram_info}",
-            model=model,
-            agent=dongyao_guli_prompt
-        )
+            record_id, pipeline = execute_run(run)
+        except StageError as e:
+            return stage_error_response(e, run.run_id)
+        
+        return jsonify({'success': True, 'record_id': record_id, 'run_id': run.run_id,
+                        'timings': pipeline.timing_report()})
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'分析失败: {str(e)}'}), 500
+
+@hexagram_bp.route('/analyze/stream', methods=['POST'])
+def api_analyze_stream():
+    """六爻分析API（Server-Sent Events流式输出）
+    
+    事件类型：
+        stage: 某个阶段完成，data为 {'stage': 阶段名称, 'result': 阶段结果}
+        delta: 综合解读的增量文本，data为 {'text': 文本}
+        done: 记录已保存，data为 {'record_id': 记录ID, 'record': 完整记录, 'timings': 耗时}
+        error: 分析失败，data为 {'error': 错误信息, 'run_id': 运行ID}，可通过 /hexagram/runs/<run_id>/resume 继续
+    
+    Returns:
+        Response: text/event-stream 响应
+    """
+    data = request.get_json()
+    question = data.get('question', '')
+    hexagram_info = data.get('hexagram_info', '')
+    model = data.get('model', 'gpt-4')
+    user_yongshen = data.get('user_yongshen', '').strip()
+    force_refresh = bool(data.get('force_refresh', False))
+    mode = data.get('mode') or None
+    
+    if not question or not hexagram_info:
+        return jsonify({'error': '问题和卦象信息不能为空'}), 400
+    if mode is not None and mode not in MODES:
+        return jsonify({'error': f'不支持的分析模式: {mode}'}), 400
+    
+    user_id = current_user.id if current_user.is_authenticated else None
+    hexagram_info = hexagram_store.get(hexagram_info).content
+    
+    # 流水线在后台线程中运行，通过队列把阶段结果和增量文本交给响应生成器，
+    # 阶段结果由响应生成器（请求上下文中）保存为检查点
+    events = queue.Queue()
+    cancel = threading.Event()
+    run = start_run(user_id, question, hexagram_info, model, user_yongshen, force_refresh, mode)
+    run_id = run.run_id
+    pipeline = build_run_pipeline(
+        run,
+        on_delta=lambda text: events.put(('delta', {'text': text})),
+        cancel=cancel
+    )
+    
+    def run_pipeline():
         try:
-            dongyao_guli_data = json.loads(dongyao_guli_result)
-        except json.JSONDecodeError as e:
-            return jsonify({'error': f'分析失败: 无法解析AI响应 - {str(e)}'}), 500
-        
-        # 4. 数字量化分析
-        from prompt import shuzi_lianghua_prompt
-        shuzi_lianghua_result = AI(
-            f"卦象信息：{hexagram_info}\n已确定用神：{yongshen_data['text']}",
-            model=model,
-            agent=shuzi_lianghua_prompt
-        )
+            results = pipeline.run(on_stage_done=lambda name, result: events.put(('stage', {'stage': name, 'result': result})))
+            events.put(('results', results))
+        except StageError as e:
+            events.put(('failed', e))
+        except Exception as e:
+            events.put(('failed', StageError(None, e)))
+    
+    def generate():
+        threading.Thread(target=run_pipeline, name='analyze-stream', daemon=True).start()
+        analyses_in_flight.inc(source='stream')
+        finished = False
         try:
-            shuzi_lianghua_data = json.loads(shuzi_lianghua_result)
-        except json.JSONDecodeError as e:
-            return jsonify({'error': f'分析失败: 无法解析AI响应 - {str(e)}'}), 500
-        
-        # 计算用神强弱指数
-        yuejian = shuzi_lianghua_data['月建']
-        richen = shuzi_lianghua_data['日辰']
-        yongshen_dizhi = shuzi_lianghua_data['用神']
-        
-        from shuzilianghua import shuzilianghua
-        yuejianshu, richenshu = shuzilianghua(yuejian, richen, yongshen_dizhi)
-        
-        # 计算动爻强弱指数
-        dongyao_strengths = []
-        for dizhi in shuzi_lianghua_data['动爻列表']:
-            dy_yuejianshu, dy_richenshu = shuzilianghua(yuejian, richen, dizhi)
-            dongyao_strengths.append({
-                '地支': dizhi,
-                '月建数': dy_yuejianshu,
-                '日辰数': dy_richenshu,
-                '总指数': dy_yuejianshu + dy_richenshu
-            })
-        
-        # 5. 综合解读
-        from prompt import zonghe_jiedu_prompt
-        zonghe_jiedu = AI(
-            f"问题：{question}\n卦象信息：{hexagram_info}\n用神判断：{yongshen_data['text']}\n用神卦理：{json.dumps(yongshen_guli_data, ensure_ascii=False)}\n动爻卦理：{json.dumps(dongyao_guli_data, ensure_ascii=False)}\n数字量化：月建={yuejian}，日辰={richen}，用神地支={yongshen_dizhi}，用神指数={yuejianshu + richenshu}",
-            model=model,
-            agent=zonghe_jiedu_prompt
-        )
-        
-        # 构建数字量化分析结果
-        shuzi_lianghua_data['用神指数'] = {
-            '月建数': yuejianshu,
-            '日辰数': richenshu,
-            '总指数': yuejianshu + richenshu
-        }
-        shuzi_lianghua_data['动爻指数'] = dongyao_strengths
-        
-        # 保存历史记录到数据库
-        # 获取当前用户ID（如果用户未登录，user_id为None）
-        user_id = current_user.id if current_user.is_authenticated else None
+            while True:
+                try:
+                    event, payload = events.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield format_keepalive()
+                    continue
+                
+                if event == 'stage':
+                    save_stage(run, payload['stage'], payload['result'])
+                
+                if event == 'failed':
+                    finished = True
+                    fail_run(run, pipeline, payload.stage, payload.error)
+                    if isinstance(payload.error, UpstreamBusyError):
+                        error = {'error': str(payload.error), 'retry_after': payload.error.retry_after}
+                    else:
+                        error = {'error': f'分析失败: {str(payload.error)}'}
+                    yield format_sse('error', {**error, 'run_id': run_id})
+                    return
+                
+                if event == 'results':
+                    finished = True
+                    try:
+                        record_id = finish_run(run, pipeline, payload)
+                    except Exception as e:
+                        db.session.rollback()
+                        yield format_sse('error', {'error': f'分析失败: {str(e)}', 'run_id': run_id})
+                        return
+                    record = {
+                        'id': record_id,
+                        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                        'question': question,
+                        'hexagram_info': hexagram_info,
+                        'model': model,
+                        **payload
+                    }
+                    yield format_sse('done', {'record_id': record_id, 'record': record, 'timings': pipeline.timing_report()})
+                    return
+                
+                yield format_sse(event, payload)
+        finally:
+            # 客户端断开或分析结束时取消尚未完成的流式调用；中途断开时已保存的阶段结果保留，可以继续执行
+            cancel.set()
+            analyses_in_flight.dec(source='stream')
+            if not finished:
+                try:
+                    fail_run(run, pipeline, None, '客户端断开连接')
+                except Exception:
+                    db.session.rollback()
+    
+    return sse_response(stream_with_context(generate()))
+
+@hexagram_bp.route('/jobs/<job_id>')
+def get_job(job_id):
+    """查询异步解卦任务状态
+    
+    Args:
+        job_id (str): 任务ID
         
-        # 创建解卦记录
-        hexagram_record = HexagramRecord(
-            user_id=user_id,
-            record_id=record_id,
-            question=question,
-            hexagram_info=hexagram_info,
-            model=model,
-            yongshen=json.dumps(yongshen_data, ensure_ascii=False),
-            yongshen_guli=json.dumps(yongshen_guli_data, ensure_ascii=False),
-            dongyao_guli=json.dumps(dongyao_guli_data, ensure_ascii=False),
-            shuzi_lianghua=json.dumps(shuzi_lianghua_data, ensure_ascii=False),
-            zonghe_jiedu=zonghe_jiedu,
-            timestamp=timestamp
-        )
-        
-        # 保存到数据库
-        db.session.add(hexagram_record)
-        db.session.commit()
+    Returns:
+        JSON: 任务状态，包括已完成的阶段和生成的记录ID
+    """
+    job = AnalysisJob.query.filter_by(job_id=job_id).first()
+    
+    if not job:
+        return jsonify({'error': '任务不存在'}), 404
+    
+    # 检查用户权限
+    if job.user_id and (not current_user.is_authenticated or job.user_id != current_user.id):
+        return jsonify({'error': '您没有权限查看此任务'}), 403
+    
+    return jsonify({'job': job_to_dict(job)})
+
+@hexagram_bp.route('/runs/<run_id>')
+def get_run_status(run_id):
+    """查询解卦运行状态
+    
+    Args:
+        run_id (str): 运行ID
         
-        return jsonify({'success': True, 'record_id': record_id})
+    Returns:
+        JSON: 运行状态，包括已完成的阶段、失败原因和上游调用次数
+    """
+    run = get_run(run_id)
+    
+    if not run:
+        return jsonify({'error': '解卦运行不存在'}), 404
+    
+    # 检查用户权限
+    if run.user_id and (not current_user.is_authenticated or run.user_id != current_user.id):
+        return jsonify({'error': '您没有权限查看此解卦运行'}), 403
+    
+    return jsonify({'run': run_to_dict(run)})
+
+@hexagram_bp.route('/runs/<run_id>/resume', methods=['POST'])
+def resume_run(run_id):
+    """从最后完成的阶段继续执行失败或中断的解卦运行
+    
+    已保存结果的阶段不再调用AI，只执行缺少的阶段。运行已完成时直接返回记录ID。
+    
+    Args:
+        run_id (str): 运行ID
+        
+    Returns:
+        JSON: 分析结果，reused_stages 为直接使用已保存结果的阶段
+    """
+    try:
+        run = get_run(run_id)
+        
+        if not run:
+            return jsonify({'error': '解卦运行不存在'}), 404
+        
+        # 检查用户权限
+        if run.user_id and (not current_user.is_authenticated or run.user_id != current_user.id):
+            return jsonify({'error': '您没有权限继续此解卦运行'}), 403
+        
+        if run.status == 'done':
+            return jsonify({'success': True, 'record_id': run.record_id, 'run_id': run.run_id, 'reused_stages': []})
+        
+        if not claim_run(run):
+            return jsonify({'error': '该解卦正在进行中'}), 409
+        
+        reused_stages = list(run_results(run))
+        try:
+            record_id, pipeline = execute_run(run, source='resume')
+        except StageError as e:
+            return stage_error_response(e, run.run_id)
+        
+        return jsonify({'success': True, 'record_id': record_id, 'run_id': run.run_id,
+                        'reused_stages': reused_stages, 'timings': pipeline.timing_report()})
         
     except Exception as e:
         db.session.rollback()
@@ -161,57 +315,156 @@ def get_record(record_id):
     Returns:
         JSON: 解卦记录
     """
-    # 查询解卦记录
-    record = HexagramRecord.query.filter_by(record_id=record_id).first()
+    # 记录生成后不再修改，ETag一致时直接返回304，不查询记录
+    user_id = current_user.id if current_user.is_authenticated else None
+    etag = make_etag(record_id, user_id, 'record', config.RESULT_RENDER_VERSION)
+    response = not_modified(etag, config.RESULT_CACHE_MAX_AGE)
+    if response is not None:
+        return response
+    
+    # 读取写入时生成的完整记录JSON
+    payload, owner_id = load_payload(record_id)
     
-    if not record:
+    if payload is None:
         return jsonify({'error': '记录不存在'}), 404
     
     # 检查用户权限
-    if record.user_id and (not current_user.is_authenticated or record.user_id != current_user.id):
+    if owner_id and (not current_user.is_authenticated or owner_id != current_user.id):
         return jsonify({'error': '您没有权限查看此记录'}), 403
     
-    # 构建返回数据
-    result = {
-        'id': record.id,
-        'record_id': record.record_id,
-        'question': record.question,
-        'hexagram_info': record.hexagram_info,
-        'model': record.model,
-        'yongshen': json.loads(record.yongshen),
-        'yongshen_guli': json.loads(record.yongshen_guli),
-        'dongyao_guli': json.loads(record.dongyao_guli),
-        'shuzi_lianghua': json.loads(record.shuzi_lianghua),
-        'zonghe_jiedu': record.zonghe_jiedu,
-        'timestamp': record.timestamp.strftime('%Y-%m-%d %H:%M:%S')
-    }
-    
-    return jsonify({'record': result})
+    # 直接拼接已序列化的记录，无需解析再编码
+    response = current_app.response_class('{"record":' + payload + '}', mimetype='application/json')
+    return set_cache_headers(response, etag, config.RESULT_CACHE_MAX_AGE)
 
-@hexagram_bp.route('/history')
-@login_required
-def get_history():
-    """获取历史记录
+def _encode_cursor(timestamp, id):
+    """将分页位置编码为游标字符串"""
+    return f"{timestamp.strftime('%Y-%m-%dT%H:%M:%S.%f')}_{id}"
+
+def _decode_cursor(cursor):
+    """解析游标字符串
+    
+    Returns:
+        tuple: (timestamp, id)
+        
+    Raises:
+        ValueError: 游标格式无效
+    """
+    timestamp, id = cursor.rsplit('_', 1)
+    return datetime.strptime(timestamp, '%Y-%m-%dT%H:%M:%S.%f'), int(id)
+
+def history_page(user_id, cursor=None, limit=None):
+    """按 (timestamp, id) 游标分页查询历史记录，只读取列表展示需要的列
     
+    Args:
+        user_id (int): 用户ID
+        cursor (str): 上一页返回的 next_cursor，为空时从最新记录开始
+        limit (int): 每页记录数
+        
     Returns:
-        JSON: 历史记录列表
+        tuple: (记录字典列表, 下一页游标)，没有更多记录时游标为None
+        
+    Raises:
+        ValueError: 游标格式无效
     """
-    # 查询当前用户的历史记录
-    records = HexagramRecord.query.filter_by(user_id=current_user.id).order_by(HexagramRecord.timestamp.desc()).all()
+    limit = min(max(int(limit or config.HISTORY_PAGE_SIZE), 1), config.HISTORY_PAGE_MAX)
+    
+    query = (db.session.query(HexagramRecord.id, HexagramRecord.record_id, HexagramRecord.question,
+                              HexagramRecord.model, HexagramRecord.timestamp,
+                              HexagramRecord.yongshen_text, HexagramRecord.yongshen_zhishu)
+             .filter(HexagramRecord.user_id == user_id))
+    if cursor:
+        timestamp, last_id = _decode_cursor(cursor)
+        query = query.filter(db.or_(
+            HexagramRecord.timestamp < timestamp,
+            db.and_(HexagramRecord.timestamp == timestamp, HexagramRecord.id < last_id)
+        ))
+    rows = query.order_by(HexagramRecord.timestamp.desc(), HexagramRecord.id.desc()).limit(limit + 1).all()
+    
+    # 多查一条用于判断是否还有下一页
+    next_cursor = _encode_cursor(rows[limit - 1].timestamp, rows[limit - 1].id) if len(rows) > limit else None
     
-    # 转换为字典列表
     record_list = []
-    for record in records:
+    for row in rows[:limit]:
         record_list.append({
-            'id': record.id,
-            'record_id': record.record_id,
-            'question': record.question,
-            'model': record.model,
-            'timestamp': record.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            'yongshen': json.loads(record.yongshen)
+            'id': row.id,
+            'record_id': row.record_id,
+            'question': row.question,
+            'model': row.model,
+            'timestamp': row.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            'yongshen': {'text': row.yongshen_text or ''},
+            'yongshen_zhishu': row.yongshen_zhishu
         })
+    return record_list, next_cursor
+
+@hexagram_bp.route('/history')
+@login_required
+def get_history():
+    """获取历史记录（游标分页）
+    
+    查询参数：
+        cursor: 上一页返回的 next_cursor
+        limit: 每页记录数
+    
+    Returns:
+        JSON: 历史记录列表和下一页游标
+    """
+    try:
+        record_list, next_cursor = history_page(current_user.id, request.args.get('cursor'),
+                                                request.args.get('limit'))
+    except ValueError:
+        return jsonify({'error': '无效的分页参数'}), 400
+    
+    return jsonify({'records': record_list, 'next_cursor': next_cursor})
+
+@hexagram_bp.route('/search')
+@login_required
+def search_history():
+    """全文搜索历史记录（按相关度排序）
+    
+    查询参数：
+        q: 搜索关键词，多个关键词以空格分隔
+        page: 页码，从1开始
+        limit: 每页记录数
+    
+    Returns:
+        JSON: 匹配的记录列表和是否还有下一页
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': '搜索关键词不能为空'}), 400
+    
+    try:
+        record_list, has_more = search_records(current_user.id, query,
+                                               request.args.get('page'), request.args.get('limit'))
+    except ValueError:
+        return jsonify({'error': '无效的分页参数'}), 400
+    
+    return jsonify({'records': record_list, 'has_more': has_more})
+
+@hexagram_bp.route('/export')
+@login_required
+def export_history():
+    """流式导出当前用户的全部解卦记录（含各阶段分析内容）
+    
+    查询参数：
+        format: ndjson（默认）或 csv
+        gzip: 为1时实时压缩为 .gz 文件
+    
+    Returns:
+        Response: 逐批输出的附件下载响应
+    """
+    format = request.args.get('format', 'ndjson')
+    gzip = request.args.get('gzip') in ('1', 'true')
+    if format not in FORMATS:
+        return jsonify({'error': '不支持的导出格式'}), 400
     
-    return jsonify({'records': record_list})
+    chunks = export_records(format, current_user.id, gzip)
+    mimetype = 'application/gzip' if gzip else FORMATS[format][0]
+    response = current_app.response_class(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={export_filename(format, gzip)}'
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @hexagram_bp.route('/delete/<int:record_id>', methods=['DELETE'])
 @login_required
@@ -234,6 +487,7 @@ def delete_record(record_id):
         # 删除记录
         db.session.delete(record)
         db.session.commit()
+        result_page_cache.invalidate(record.record_id)
         
         return jsonify({'success': True, 'message': '记录删除成功'})
     except Exception as e:
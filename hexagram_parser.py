@@ -0,0 +1,338 @@
+# 卦象信息解析模块
+# 该文件使用预编译的正则表达式将排盘文本（hexagram_info）解析为结构化数据，
+# 用于在本地提取月建、日辰、用神地支和动爻地支，无需调用AI
+
+import re
+from dataclasses import dataclass, field, asdict
+from typing import List, Optional
+
+# 地支、天干、六亲、六神
+DIZHI = '子丑寅卯辰巳午未申酉戌亥'
+TIANGAN = '甲乙丙丁戊己庚辛壬癸'
+LIUQIN = ('父母', '官鬼', '兄弟', '妻财', '子孙')
+LIUSHEN = ('青龙', '朱雀', '勾陈', '螣蛇', '白虎', '玄武')
+
+# 爻位名称与序号的对应关系（末爻即上爻）
+POSITIONS = {'初': 1, '二': 2, '三': 3, '四': 4, '五': 5, '末': 6, '上': 6}
+
+_LIUQIN_RE = '|'.join(LIUQIN)
+
+# 四柱：当前四柱：乙巳  丁亥  己酉  甲子
+_PILLARS_RE = re.compile(rf'^(当前|起卦)四柱：\s*((?:[{TIANGAN}][{DIZHI}]\s*){{4}})', re.M)
+_PILLAR_RE = re.compile(rf'([{TIANGAN}])([{DIZHI}])')
+# 旬空：戌亥
+_XUNKONG_RE = re.compile(rf'^旬空：\s*([{DIZHI}]+)', re.M)
+# 卦名：归妹卦变兑卦 / 归妹卦
+_NAME_RE = re.compile(r'^(\S+?卦)(?:变(\S+?卦))?\s*$', re.M)
+# 变爻：5爻动 / 变爻：2,5爻动
+_MOVING_RE = re.compile(r'^变爻：\s*([1-6１-６,，、\s]*)', re.M)
+# 分段标记：------------本卦------------
+_SECTION_RE = re.compile(r'^-+\s*(\S+?)\s*-+\s*$', re.M)
+# 爻行：五爻：兄弟庚申金 老阴 - -X    休  伏神=兄弟酉  朱雀 贵人
+_LINE_RE = re.compile(
+    rf'^(?P<pos>[初二三四五末上])爻：\s*'
+    rf'(?P<liuqin>{_LIUQIN_RE})(?P<gan>[{TIANGAN}])(?P<zhi>[{DIZHI}])(?P<wuxing>[金木水火土])\s+'
+    r'(?P<yinyang>[少老][阴阳])\s+'
+    r'(?P<symbol>---|- -)\s*(?P<mark>[XxO×○]?)\s*'
+    r'(?P<shiying>[世应])?\s*'
+    r'(?P<wangshuai>[旺相休囚死])?\s*'
+    rf'(?:伏神=(?P<fu_liuqin>{_LIUQIN_RE})(?P<fu_zhi>[{DIZHI}]))?'
+    r'(?P<rest>.*)$',
+    re.M
+)
+# 世应位置：本卦世爻位置：3爻
+_SHIYING_RE = re.compile(r'^(本卦|变卦)(世|应)爻位置：\s*([1-6])爻', re.M)
+# 用神文本中的爻位，如“二爻妻财”“初爻伏神官鬼”
+_YONGSHEN_POS_RE = re.compile(r'([初二三四五六末上])爻')
+
+# 用神文本中的数字爻位（“六爻”指上爻）
+_YONGSHEN_POS = dict(POSITIONS, 六=6)
+
+
+class HexagramParseError(ValueError):
+    """卦象信息解析失败异常"""
+    pass
+
+
+@dataclass
+class Pillar:
+    """干支柱"""
+    gan: str  # 天干
+    zhi: str  # 地支
+
+
+@dataclass
+class FuShen:
+    """伏神"""
+    liuqin: str  # 六亲
+    zhi: str  # 地支
+
+
+@dataclass
+class Line:
+    """爻"""
+    position: int  # 爻位（1-6）
+    liuqin: str  # 六亲
+    gan: str  # 天干
+    zhi: str  # 地支
+    wuxing: str  # 五行
+    yinyang: str  # 少阳、少阴、老阳、老阴
+    moving: bool  # 是否为动爻
+    shiying: str = ''  # 世、应或空
+    wangshuai: str = ''  # 旺相休囚死
+    fushen: Optional[FuShen] = None  # 伏神
+    liushen: str = ''  # 六神（仅本卦）
+    shensha: List[str] = field(default_factory=list)  # 神煞
+
+
+@dataclass
+class Gua:
+    """本卦或变卦"""
+    name: str = ''  # 卦名
+    lines: List[Line] = field(default_factory=list)  # 自初爻至上爻
+    shi: Optional[int] = None  # 世爻位置
+    ying: Optional[int] = None  # 应爻位置
+
+    def line(self, position):
+        """按爻位获取爻
+
+        Args:
+            position (int): 爻位（1-6）
+
+        Returns:
+            Line: 对应的爻，不存在时返回None
+        """
+        for line in self.lines:
+            if line.position == position:
+                return line
+        return None
+
+
+@dataclass
+class HexagramInfo:
+    """解析后的卦象信息"""
+    pillars: List[Pillar]  # 当前四柱（年、月、日、时）
+    cast_pillars: List[Pillar]  # 起卦四柱
+    xunkong: List[str]  # 旬空
+    ben: Gua  # 本卦
+    bian: Gua  # 变卦
+    moving_lines: List[int]  # 动爻爻位
+
+    @property
+    def yuejian(self):
+        """月建地支"""
+        return self.pillars[1].zhi
+
+    @property
+    def richen(self):
+        """日辰地支"""
+        return self.pillars[2].zhi
+
+    @property
+    def moving_dizhi(self):
+        """本卦动爻地支列表（自下而上）"""
+        return [line.zhi for line in self.ben.lines if line.position in self.moving_lines]
+
+    def yongshen_dizhi(self, yongshen_text):
+        """根据用神文本确定用神地支
+
+        支持“二爻妻财”“初爻伏神官鬼”“世爻”“应爻”以及仅给出六亲（取本卦中唯一的该六亲爻）等写法。
+
+        Args:
+            yongshen_text (str): 用神文本
+
+        Returns:
+            str: 用神地支
+
+        Raises:
+            HexagramParseError: 无法唯一确定用神时抛出
+        """
+        text = (yongshen_text or '').strip()
+        line = None
+
+        match = _YONGSHEN_POS_RE.search(text)
+        if match:
+            line = self.ben.line(_YONGSHEN_POS[match.group(1)])
+        elif '世' in text and self.ben.shi:
+            line = self.ben.line(self.ben.shi)
+        elif '应' in text and self.ben.ying:
+            line = self.ben.line(self.ben.ying)
+        else:
+            candidates = [l for l in self.ben.lines if l.liuqin in text]
+            if len(candidates) == 1:
+                line = candidates[0]
+
+        if line is None:
+            raise HexagramParseError(f'无法从用神文本确定爻位: {text}')
+
+        if '伏神' in text:
+            if line.fushen is None:
+                raise HexagramParseError(f'{line.position}爻没有伏神: {text}')
+            return line.fushen.zhi
+        return line.zhi
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典"""
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        """由 to_dict() 的结果还原（用于读取卦象表中保存的解析结果）
+
+        Args:
+            data (dict): to_dict() 的结果
+
+        Returns:
+            HexagramInfo: 解析结果
+        """
+        def gua(item):
+            lines = [Line(**dict(line, fushen=FuShen(**line['fushen']) if line['fushen'] else None))
+                     for line in item['lines']]
+            return Gua(name=item['name'], lines=lines, shi=item['shi'], ying=item['ying'])
+
+        return cls(
+            pillars=[Pillar(**pillar) for pillar in data['pillars']],
+            cast_pillars=[Pillar(**pillar) for pillar in data['cast_pillars']],
+            xunkong=list(data['xunkong']),
+            ben=gua(data['ben']),
+            bian=gua(data['bian']),
+            moving_lines=list(data['moving_lines'])
+        )
+
+
+def _parse_pillars(text):
+    """解析四柱"""
+    pillars = {}
+    for match in _PILLARS_RE.finditer(text):
+        pillars[match.group(1)] = [Pillar(gan, zhi) for gan, zhi in _PILLAR_RE.findall(match.group(2))]
+    if '当前' not in pillars:
+        raise HexagramParseError('缺少当前四柱')
+    return pillars['当前'], pillars.get('起卦', pillars['当前'])
+
+
+def _parse_line(match, with_liushen):
+    """解析一行爻信息"""
+    rest = match.group('rest').split()
+    liushen = ''
+    if with_liushen and rest and rest[0] in LIUSHEN:
+        liushen = rest.pop(0)
+    fushen = None
+    if match.group('fu_zhi'):
+        fushen = FuShen(match.group('fu_liuqin'), match.group('fu_zhi'))
+    yinyang = match.group('yinyang')
+    return Line(
+        position=POSITIONS[match.group('pos')],
+        liuqin=match.group('liuqin'),
+        gan=match.group('gan'),
+        zhi=match.group('zhi'),
+        wuxing=match.group('wuxing'),
+        yinyang=yinyang,
+        moving=bool(match.group('mark')) or yinyang.startswith('老'),
+        shiying=match.group('shiying') or '',
+        wangshuai=match.group('wangshuai') or '',
+        fushen=fushen,
+        liushen=liushen,
+        shensha=rest
+    )
+
+
+def _split_sections(text):
+    """按“------本卦------”等标记切分文本
+
+    Returns:
+        dict: 段名 -> 段落文本，段名为空字符串表示第一个标记之前的内容
+    """
+    sections = {}
+    name, start = '', 0
+    for match in _SECTION_RE.finditer(text):
+        sections[name] = text[start:match.start()]
+        name, start = match.group(1), match.end()
+    sections[name] = text[start:]
+    return sections
+
+
+def parse_hexagram_info(text):
+    """解析卦象信息
+
+    Args:
+        text (str): 排盘文本
+
+    Returns:
+        HexagramInfo: 解析结果
+
+    Raises:
+        HexagramParseError: 文本格式无法识别时抛出
+    """
+    if not text:
+        raise HexagramParseError('卦象信息为空')
+    text = text.replace('\r\n', '\n')
+
+    pillars, cast_pillars = _parse_pillars(text)
+    if len(pillars) != 4:
+        raise HexagramParseError('当前四柱格式不正确')
+
+    sections = _split_sections(text)
+    header = sections.get('', '')
+
+    match = _XUNKONG_RE.search(header)
+    xunkong = list(match.group(1)) if match else []
+
+    ben, bian = Gua(), Gua()
+    match = _NAME_RE.search(header)
+    if match:
+        ben.name = match.group(1)
+        bian.name = match.group(2) or ''
+
+    for gua, key, with_liushen in ((ben, '本卦', True), (bian, '变卦', False)):
+        body = sections.get(key, '')
+        gua.lines = sorted((_parse_line(m, with_liushen) for m in _LINE_RE.finditer(body)),
+                           key=lambda line: line.position)
+        for m in _SHIYING_RE.finditer(body):
+            setattr(gua, 'shi' if m.group(2) == '世' else 'ying', int(m.group(3)))
+        if gua.shi is None:
+            gua.shi = next((line.position for line in gua.lines if line.shiying == '世'), None)
+        if gua.ying is None:
+            gua.ying = next((line.position for line in gua.lines if line.shiying == '应'), None)
+
+    if [line.position for line in ben.lines] != [1, 2, 3, 4, 5, 6]:
+        raise HexagramParseError('本卦爻信息不完整')
+
+    # 动爻以“变爻：”行为准，缺失时取本卦中带动爻标记的爻
+    match = _MOVING_RE.search(header)
+    if match and re.search(r'[1-6１-６]', match.group(1)):
+        digits = re.findall(r'[1-6１-６]', match.group(1))
+        moving_lines = sorted({int(d.translate(str.maketrans('１２３４５６', '123456'))) for d in digits})
+    else:
+        moving_lines = [line.position for line in ben.lines if line.moving]
+
+    return HexagramInfo(
+        pillars=pillars,
+        cast_pillars=cast_pillars,
+        xunkong=xunkong,
+        ben=ben,
+        bian=bian,
+        moving_lines=moving_lines
+    )
+
+
+def extract_shuzi_inputs(info, yongshen_text):
+    """提取数字量化所需的月建、日辰、用神地支和动爻地支
+
+    返回格式与数字量化提示词要求AI返回的JSON一致。
+
+    Args:
+        info (HexagramInfo): 解析后的卦象信息
+        yongshen_text (str): 用神文本
+
+    Returns:
+        dict: {'月建', '日辰', '用神', '动爻列表'}
+
+    Raises:
+        HexagramParseError: 无法确定用神地支时抛出
+    """
+    return {
+        '月建': info.yuejian,
+        '日辰': info.richen,
+        '用神': info.yongshen_dizhi(yongshen_text),
+        '动爻列表': info.moving_dizhi
+    }
@@ -0,0 +1,247 @@
+# 卦象存储模块
+# 同一时辰起出相同卦的用户提交的卦象信息完全相同，该文件将卦象信息规范化后按SHA-256去重保存到 hexagrams 表，
+# 同时保存解析结果：每个不同的卦象只解析一次，之后的请求（包括其他工作进程）直接读取解析结果，
+# 解卦记录通过 hexagram_id 引用卦象，不再各自保存副本。进程内按摘要缓存最近使用的卦象。
+# 已有记录可通过 flask --app app link-hexagrams 迁移。
+
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+import hashlib
+import threading
+from sqlalchemy import insert, update, bindparam
+from sqlalchemy.exc import IntegrityError
+from config import config
+from models import db, Hexagram, HexagramRecord
+from hexagram_parser import parse_hexagram_info, HexagramInfo, HexagramParseError
+from utils import jsoncodec
+from utils.logger import setup_logger
+from utils.stats import register_stats
+
+# 设置日志
+logger = setup_logger(__name__)
+
+
+def normalize_hexagram_info(text):
+    """规范化卦象信息：统一换行符，去掉行尾和首尾空白
+
+    Args:
+        text (str): 卦象信息
+
+    Returns:
+        str: 规范化后的卦象信息
+    """
+    text = (text or '').replace('\r\n', '\n').replace('\r', '\n')
+    return '\n'.join(line.rstrip() for line in text.strip().split('\n'))
+
+
+def hexagram_digest(content):
+    """计算规范化卦象信息的摘要
+
+    Args:
+        content (str): 规范化后的卦象信息
+
+    Returns:
+        str: SHA-256十六进制摘要
+    """
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+@dataclass
+class StoredHexagram:
+    """已保存的卦象（只读，多个请求共享）"""
+    id: int  # hexagrams 表主键
+    digest: str  # 规范化卦象信息的摘要
+    content: str  # 规范化后的卦象信息
+    parsed: Optional[HexagramInfo]  # 解析结果，无法本地解析时为None
+    parse_error: Optional[str]  # 无法本地解析的原因
+
+
+def _parse(content):
+    """解析卦象信息，返回 (解析结果, 错误信息)"""
+    try:
+        return parse_hexagram_info(content), None
+    except HexagramParseError as e:
+        return None, str(e)[:255]
+
+
+def _stored(row):
+    """由数据库行生成 StoredHexagram"""
+    parsed = HexagramInfo.from_dict(jsoncodec.loads(row.parsed)) if row.parsed else None
+    return StoredHexagram(row.id, row.digest, row.content, parsed, row.parse_error)
+
+
+class HexagramStore:
+    """卦象存储（数据库 + 进程内LRU缓存）"""
+
+    def __init__(self):
+        """初始化缓存"""
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.creates = 0
+
+    def get(self, hexagram_info):
+        """获取卦象，不存在时解析并保存（需要在应用上下文中调用）
+
+        Args:
+            hexagram_info (str): 卦象信息（未规范化）
+
+        Returns:
+            StoredHexagram: 卦象
+        """
+        content = normalize_hexagram_info(hexagram_info)
+        digest = hexagram_digest(content)
+        with self._lock:
+            entry = self._items.get(digest)
+            if entry is not None:
+                self._items.move_to_end(digest)
+                self.hits += 1
+                return entry
+
+        entry = self._load(digest)
+        if entry is None:
+            entry = self._create(digest, content)
+        with self._lock:
+            self._items[digest] = entry
+            self._items.move_to_end(digest)
+            while len(self._items) > config.HEXAGRAM_CACHE_SIZE:
+                self._items.popitem(last=False)
+        return entry
+
+    def _load(self, digest):
+        """从数据库读取卦象"""
+        row = Hexagram.query.filter_by(digest=digest).first()
+        if row is None:
+            return None
+        with self._lock:
+            self.loads += 1
+        return _stored(row)
+
+    def _create(self, digest, content):
+        """解析并保存卦象（其他进程同时保存同一卦象时读取已保存的行）"""
+        parsed, error = _parse(content)
+        if error:
+            logger.warning(f'卦象信息无法本地解析，数字量化将使用AI提取: {error}')
+        row = Hexagram(digest=digest, content=content,
+                       parsed=jsoncodec.dumps(parsed.to_dict()) if parsed else None, parse_error=error)
+        db.session.add(row)
+        try:
+            db.session.flush()
+            hexagram_id = row.id
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            return self._load(digest)
+        with self._lock:
+            self.creates += 1
+        return StoredHexagram(hexagram_id, digest, content, parsed, error)
+
+    def clear(self):
+        """清空进程内缓存"""
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        """返回缓存统计信息（creates 为本进程解析并保存的卦象数）"""
+        with self._lock:
+            total = self.hits + self.loads + self.creates
+            return {
+                'size': len(self._items),
+                'capacity': config.HEXAGRAM_CACHE_SIZE,
+                'hits': self.hits,
+                'loads': self.loads,
+                'creates': self.creates,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+# 全局卦象存储
+hexagram_store = HexagramStore()
+register_stats('hexagram_store', hexagram_store.stats)
+
+
+def upsert_hexagrams(contents):
+    """批量保存规范化后的卦象（已存在的跳过），用于导入和迁移（需要在应用上下文中调用，不提交事务）
+
+    Args:
+        contents (dict): 摘要 -> (规范化后的卦象信息, 解析结果JSON, 解析错误)
+
+    Returns:
+        dict: 摘要 -> 卦象ID
+    """
+    ids = {}
+    digests = list(contents)
+    for start in range(0, len(digests), 500):
+        chunk = digests[start:start + 500]
+        ids.update(db.session.query(Hexagram.digest, Hexagram.id).filter(Hexagram.digest.in_(chunk)).all())
+    missing = [digest for digest in digests if digest not in ids]
+    if missing:
+        db.session.execute(insert(Hexagram.__table__), [
+            {'digest': digest, 'content': contents[digest][0], 'parsed': contents[digest][1], 'parse_error': contents[digest][2]}
+            for digest in missing
+        ])
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            ids.update(db.session.query(Hexagram.digest, Hexagram.id).filter(Hexagram.digest.in_(chunk)).all())
+    return ids
+
+
+def hexagram_columns(hexagram_info):
+    """规范化并解析卦象信息，返回批量写入卦象表所需的列值（可在进程池中执行）
+
+    Args:
+        hexagram_info (str): 卦象信息
+
+    Returns:
+        tuple: (摘要, (规范化后的卦象信息, 解析结果JSON, 解析错误))
+    """
+    content = normalize_hexagram_info(hexagram_info)
+    parsed, error = _parse(content)
+    return hexagram_digest(content), (content, jsoncodec.dumps(parsed.to_dict()) if parsed else None, error)
+
+
+def link_existing_records(batch_size=200):
+    """将保存了卦象信息副本的旧记录改为引用卦象表，并清空副本（需要在应用上下文中调用）
+
+    记录的完整记录JSON中的卦象信息同时改为null，读取时由 load_payload 补上。
+
+    Args:
+        batch_size (int): 每批（每个事务）处理的记录数
+
+    Returns:
+        dict: {'records': 迁移的记录数, 'hexagrams': 涉及的不同卦象数}
+    """
+    from analysis import strip_payload_hexagram
+    table = HexagramRecord.__table__
+    stats = {'records': 0, 'hexagrams': 0}
+    seen = set()
+    while True:
+        rows = (db.session.query(HexagramRecord.id, HexagramRecord.hexagram_info, HexagramRecord.payload)
+                .filter(HexagramRecord.hexagram_id.is_(None))
+                .order_by(HexagramRecord.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+        columns = {}
+        digests = []
+        for row in rows:
+            digest, values = hexagram_columns(row.hexagram_info)
+            columns.setdefault(digest, values)
+            digests.append(digest)
+        ids = upsert_hexagrams(columns)
+        db.session.execute(
+            update(table).where(table.c.id == bindparam('pk')).values(
+                hexagram_id=bindparam('new_hexagram_id'), hexagram_info='', payload=bindparam('new_payload')),
+            [{'pk': row.id, 'new_hexagram_id': ids[digest],
+              'new_payload': strip_payload_hexagram(row.payload) if row.payload is not None else None}
+             for row, digest in zip(rows, digests)]
+        )
+        db.session.commit()
+        stats['records'] += len(rows)
+        seen.update(digests)
+    stats['hexagrams'] = len(seen)
+    logger.info(f"已将{stats['records']}条解卦记录关联到{stats['hexagrams']}个卦象")
+    return stats
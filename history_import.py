@@ -0,0 +1,239 @@
+# 旧版历史记录导入模块
+# 该文件将旧版桌面程序保存的 history/*.json 文件批量导入 hexagram_records 表：
+# 逐个读取目录项（不一次性列出全部文件），在多个进程中并行解析和校验，
+# 主进程按批次使用 executemany 在事务中写入（卦象信息在工作进程中规范化和解析，按摘要写入卦象表）；按 record_id 去重，重复导入时跳过已有记录（不再解析文件）。
+# 命令行：flask --app app import-history [目录] --user 用户名
+
+from datetime import datetime
+from multiprocessing import Pool
+from types import SimpleNamespace
+import json
+import os
+import time
+import uuid
+from sqlalchemy import insert, update, bindparam
+from models import db, HexagramRecord
+from hexagram_store import hexagram_columns, upsert_hexagrams
+from utils import jsoncodec
+from utils.logger import setup_logger
+
+# 设置日志
+logger = setup_logger(__name__)
+
+# 各阶段结果的字段及类型
+RESULT_FIELDS = {
+    'yongshen': dict,
+    'yongshen_guli': dict,
+    'dongyao_guli': dict,
+    'shuzi_lianghua': dict,
+    'zonghe_jiedu': str
+}
+
+# 旧版文件的时间格式
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# 进度日志间隔（文件数）
+PROGRESS_EVERY = 5000
+
+
+class HistoryFileError(ValueError):
+    """历史记录文件格式错误"""
+    pass
+
+
+def parse_history_file(path):
+    """读取并校验一个旧版历史记录文件
+
+    Args:
+        path (str): 文件路径
+
+    Returns:
+        dict: 可直接写入 hexagram_records 的列值（不含 user_id 和 hexagram_id；payload 中的 id 为 null，写入后补上），
+              以及卦象表的列值 hexagram: (摘要, 列值)
+
+    Raises:
+        HistoryFileError: 文件无法解析或缺少必需字段
+    """
+    from analysis import history_summary, record_payload
+    try:
+        with open(path, 'rb') as f:
+            data = jsoncodec.loads(f.read())
+    except (OSError, ValueError) as e:
+        raise HistoryFileError(f'无法读取: {str(e)}')
+    if not isinstance(data, dict):
+        raise HistoryFileError('内容不是JSON对象')
+
+    try:
+        record_id = str(uuid.UUID(str(data.get('id'))))
+    except ValueError:
+        raise HistoryFileError('缺少有效的记录ID')
+    for field in ('question', 'hexagram_info', 'model'):
+        if not isinstance(data.get(field), str) or not data[field].strip():
+            raise HistoryFileError(f'缺少字段 {field}')
+    for field, field_type in RESULT_FIELDS.items():
+        if not isinstance(data.get(field), field_type):
+            raise HistoryFileError(f'字段 {field} 缺失或类型错误')
+    try:
+        timestamp = datetime.strptime(data.get('timestamp') or '', TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        # 没有有效时间的文件使用文件修改时间
+        timestamp = datetime.fromtimestamp(os.path.getmtime(path)).replace(microsecond=0)
+
+    results = {field: data[field] for field in RESULT_FIELDS}
+    row = {
+        'record_id': record_id,
+        'question': data['question'],
+        'hexagram_info': '',
+        'hexagram': hexagram_columns(data['hexagram_info']),
+        'model': data['model'][:50],
+        'yongshen': json.dumps(results['yongshen'], ensure_ascii=False),
+        'yongshen_guli': json.dumps(results['yongshen_guli'], ensure_ascii=False),
+        'dongyao_guli': json.dumps(results['dongyao_guli'], ensure_ascii=False),
+        'shuzi_lianghua': json.dumps(results['shuzi_lianghua'], ensure_ascii=False),
+        'zonghe_jiedu': results['zonghe_jiedu'],
+        'timestamp': timestamp,
+        **history_summary(results['yongshen'], results['shuzi_lianghua'])
+    }
+    record = SimpleNamespace(id=None, **{key: row[key] for key in ('record_id', 'question', 'model', 'timestamp')})
+    row['payload'] = jsoncodec.dumps(record_payload(record, results, with_hexagram=False))
+    return row
+
+
+def _parse_worker(path):
+    """进程池中解析文件，返回 (路径, 列值, 错误信息)"""
+    try:
+        return path, parse_history_file(path), None
+    except HistoryFileError as e:
+        return path, None, str(e)
+
+
+def iter_history_files(directory, skip_ids=frozenset()):
+    """逐个列出目录中的 .json 文件
+
+    Args:
+        directory (str): 目录
+        skip_ids (set): 已导入的记录ID，文件名（不含扩展名）在其中的文件直接跳过
+
+    Yields:
+        tuple: (文件路径, 是否因已导入而跳过)
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.json') or not entry.is_file():
+                continue
+            yield entry.path, entry.name[:-5] in skip_ids
+
+
+def _existing_record_ids():
+    """查询已导入的全部记录ID"""
+    return {record_id for (record_id,) in db.session.query(HexagramRecord.record_id)}
+
+
+def _write_batch(user_id, rows, existing):
+    """在一个事务中写入一批记录
+
+    Args:
+        user_id (int): 记录所属用户ID
+        rows (list): 列值列表
+        existing (set): 已存在的记录ID，写入后加入
+
+    Returns:
+        int: 写入的记录数
+    """
+    from search import index_records
+    rows = [row for row in rows if row['record_id'] not in existing]
+    if not rows:
+        return 0
+    # 其他进程可能刚刚写入了同一记录
+    record_ids = [row['record_id'] for row in rows]
+    existing.update(record_id for (record_id,) in db.session.query(HexagramRecord.record_id)
+                    .filter(HexagramRecord.record_id.in_(record_ids)))
+    rows = [dict(row, user_id=user_id) for row in rows if row['record_id'] not in existing]
+    if not rows:
+        return 0
+
+    # 写入卦象表（已存在的卦象跳过），记录引用卦象ID
+    hexagram_ids = upsert_hexagrams(dict(row['hexagram'] for row in rows))
+    for row in rows:
+        row['hexagram_id'] = hexagram_ids[row.pop('hexagram')[0]]
+
+    table = HexagramRecord.__table__
+    db.session.execute(insert(table), rows)
+
+    # 取回主键，补上完整记录JSON中的 id，并建立全文索引
+    inserted = (db.session.query(HexagramRecord.id, HexagramRecord.record_id, HexagramRecord.user_id,
+                                 HexagramRecord.question, HexagramRecord.yongshen_text, HexagramRecord.zonghe_jiedu)
+                .filter(HexagramRecord.record_id.in_([row['record_id'] for row in rows]))
+                .all())
+    payloads = {row['record_id']: row['payload'] for row in rows}
+    db.session.execute(
+        update(table).where(table.c.id == bindparam('pk')).values(payload=bindparam('new_payload')),
+        [{'pk': record.id, 'new_payload': payloads[record.record_id].replace('{"id":null', '{"id":%d' % record.id, 1)}
+         for record in inserted]
+    )
+    index_records(inserted)
+    db.session.commit()
+    existing.update(payloads)
+    return len(rows)
+
+
+def import_history(directory, user_id, workers=None, batch_size=500):
+    """导入目录中的旧版历史记录文件（需要在应用上下文中调用）
+
+    Args:
+        directory (str): 历史记录目录
+        user_id (int): 导入记录所属的用户ID
+        workers (int): 解析进程数，默认为CPU核数，为1时在当前进程中解析
+        batch_size (int): 每个事务写入的记录数
+
+    Returns:
+        dict: 统计信息 {'files', 'imported', 'skipped', 'invalid', 'seconds'}
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.monotonic()
+    stats = {'files': 0, 'imported': 0, 'skipped': 0, 'invalid': 0}
+    existing = _existing_record_ids()
+
+    def pending_paths():
+        for path, imported in iter_history_files(directory, existing):
+            stats['files'] += 1
+            if imported:
+                stats['skipped'] += 1
+            else:
+                yield path
+            if stats['files'] % PROGRESS_EVERY == 0:
+                _log_progress(stats, start)
+
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap_unordered(_parse_worker, pending_paths(), chunksize=32) if pool else map(_parse_worker, pending_paths())
+        batch = []
+        for path, row, error in results:
+            if error:
+                stats['invalid'] += 1
+                logger.warning(f'跳过无效的历史记录文件 {path}: {error}')
+                continue
+            batch.append(row)
+            if len(batch) >= batch_size:
+                stats['imported'] += _write_batch(user_id, batch, existing)
+                batch = []
+        if batch:
+            stats['imported'] += _write_batch(user_id, batch, existing)
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    # 重复的记录ID（文件名与记录ID不一致时）在写入时被跳过
+    stats['skipped'] = stats['files'] - stats['invalid'] - stats['imported']
+    stats['seconds'] = round(time.monotonic() - start, 2)
+    _log_progress(stats, start, done=True)
+    return stats
+
+
+def _log_progress(stats, start, done=False):
+    """输出导入进度和吞吐量"""
+    elapsed = max(time.monotonic() - start, 1e-6)
+    prefix = '导入完成' if done else '导入进度'
+    logger.info(f"{prefix}: 已处理{stats['files']}个文件，导入{stats['imported']}条，跳过{stats['skipped']}条，"
+                f"无效{stats['invalid']}个，{stats['files'] / elapsed:.0f} 文件/秒")
@@ -0,0 +1,139 @@
+# HTTP连接池模块
+# 该文件为每个上游地址（内置网关和各自定义模型的 api_url）维护一个复用连接的 requests.Session，
+# 避免每次调用AI都重新建立TCP+TLS连接，并统一设置超时。
+# 会话数量有上限（HTTP_POOL_MAX_UPSTREAMS），超出时关闭最久未使用的会话
+
+from collections import OrderedDict
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from config import config
+from utils.logger import setup_logger
+from utils.stats import register_stats
+
+# 设置日志
+logger = setup_logger(__name__)
+
+
+def upstream_key(url):
+    """取URL的协议和主机部分作为上游标识
+
+    Args:
+        url (str): 请求地址
+
+    Returns:
+        str: 如 https://api.openai.com
+    """
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'
+
+
+class HTTPClientRegistry:
+    """按上游地址管理的连接池会话（按最近使用排序）"""
+
+    def __init__(self):
+        """初始化会话注册表"""
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def session(self, url):
+        """获取请求地址所属上游的会话，不存在时创建（会话数超过上限时关闭最久未使用的会话）
+
+        Args:
+            url (str): 请求地址
+
+        Returns:
+            requests.Session: 复用连接的会话
+        """
+        key = upstream_key(url)
+        evicted = []
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+            else:
+                session = requests.Session()
+                # 重试由调用方负责，连接池满时阻塞等待空闲连接而不是临时新建连接
+                adapter = HTTPAdapter(pool_connections=1,
+                                      pool_maxsize=config.HTTP_POOL_MAXSIZE,
+                                      max_retries=0,
+                                      pool_block=config.HTTP_POOL_BLOCK)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                session.headers['Connection'] = 'keep-alive'
+                self._sessions[key] = session
+                logger.info(f'已创建上游连接池: {key}')
+                while len(self._sessions) > config.HTTP_POOL_MAX_UPSTREAMS:
+                    evicted.append(self._sessions.popitem(last=False))
+        # 正在使用的连接在请求结束后释放，关闭会话只影响空闲连接
+        for old_key, old_session in evicted:
+            old_session.close()
+            logger.info(f'已关闭最久未使用的上游连接池: {old_key}')
+        return session
+
+    def request(self, method, url, timeout=None, **kwargs):
+        """发送请求
+
+        Args:
+            method (str): 请求方法
+            url (str): 请求地址
+            timeout (tuple): (连接超时, 读取超时)，默认使用 AI_CONNECT_TIMEOUT / AI_READ_TIMEOUT
+
+        Returns:
+            requests.Response: 响应
+        """
+        if timeout is None:
+            timeout = (config.AI_CONNECT_TIMEOUT, config.AI_READ_TIMEOUT)
+        return self.session(url).request(method, url, timeout=timeout, **kwargs)
+
+    def get(self, url, **kwargs):
+        """发送GET请求"""
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        """发送POST请求"""
+        return self.request('POST', url, **kwargs)
+
+    def close(self):
+        """关闭所有会话"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def stats(self):
+        """返回各上游连接池的统计信息
+
+        Returns:
+            dict: 上游 -> {requests, connections, reuse_rate, idle}
+        """
+        with self._lock:
+            sessions = dict(self._sessions)
+
+        result = {}
+        for key, session in sessions.items():
+            requests_count = connections = idle = 0
+            for adapter in {id(a): a for a in session.adapters.values()}.values():
+                pools = adapter.poolmanager.pools
+                for pool_key in list(pools.keys()):
+                    pool = pools.get(pool_key)
+                    if pool is None:
+                        continue
+                    requests_count += pool.num_requests
+                    connections += pool.num_connections
+                    if pool.pool is not None:
+                        idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+            result[key] = {
+                'requests': requests_count,
+                'connections': connections,
+                'reuse_rate': round(1 - connections / requests_count, 4) if requests_count else 0.0,
+                'idle': idle
+            }
+        return result
+
+
+# 全局会话注册表
+http_client = HTTPClientRegistry()
+register_stats('http_pools', http_client.stats)
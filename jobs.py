@@ -0,0 +1,326 @@
+# 异步解卦任务模块
+# 该文件实现了基于数据库的解卦任务队列和后台工作线程池，
+# 任务保存在 analysis_jobs 表中。工作线程池定期为执行中的任务更新心跳，
+# 进程退出或崩溃后长时间没有心跳的任务由其他（或重启后的）工作线程池重新放回队列；
+# 上游繁忙时任务延迟后重新入队，超过 JOB_MAX_RETRIES 次后失败
+
+from datetime import datetime, timedelta
+import json
+import os
+import socket
+import threading
+import uuid
+from sqlalchemy import update, or_, and_
+from models import db, AnalysisJob, PipelineRun
+from config import config
+from pipeline import StageError
+from pipeline_runs import start_run, get_run, run_results, claim_run, execute_run
+from admission import UpstreamBusyError
+from analysis import STAGES
+from utils.logger import setup_logger
+
+# 设置日志
+logger = setup_logger(__name__)
+
+# 有新任务时唤醒本进程的工作线程
+_new_job = threading.Event()
+
+# 本进程的工作线程池
+_pool = None
+
+
+def enqueue_job(user_id, question, hexagram_info, model, user_yongshen='', force_refresh=False, mode=None):
+    """创建异步解卦任务
+
+    Args:
+        user_id (int): 用户ID（未登录时为None）
+        question (str): 问题
+        hexagram_info (str): 卦象信息
+        model (str): 使用的模型
+        user_yongshen (str): 用户指定的用神
+        force_refresh (bool): 强制重新分析，不读取AI响应缓存
+        mode (str): 分析模式（staged 或 fast），为空时按模型配置确定
+
+    Returns:
+        str: 任务ID
+    """
+    job = AnalysisJob(
+        job_id=str(uuid.uuid4()),
+        user_id=user_id,
+        question=question,
+        hexagram_info=hexagram_info,
+        model=model,
+        user_yongshen=user_yongshen or None,
+        force_refresh=bool(force_refresh),
+        mode=mode or None,
+        status='pending',
+        stages_done='[]'
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    _new_job.set()
+    return job.job_id
+
+
+def job_to_dict(job):
+    """将任务转换为状态字典
+
+    Args:
+        job (AnalysisJob): 任务
+
+    Returns:
+        dict: 任务状态
+    """
+    return {
+        'job_id': job.job_id,
+        'status': job.status,
+        'stages': STAGES,
+        'stages_done': json.loads(job.stages_done or '[]'),
+        'record_id': job.record_id,
+        'run_id': job.run_id,
+        'error': job.error,
+        'created_at': job.created_at.strftime('%Y-%m-%d %H:%M:%S') if job.created_at else None,
+        'finished_at': job.finished_at.strftime('%Y-%m-%d %H:%M:%S') if job.finished_at else None
+    }
+
+
+def _claim_next_job(worker_name):
+    """领取下一个待执行的任务
+
+    通过带状态条件的UPDATE实现抢占，多个进程同时领取同一任务时只有一个会成功。
+
+    Returns:
+        AnalysisJob: 领取到的任务，没有待执行任务时返回None
+    """
+    now = datetime.utcnow()
+    candidates = (AnalysisJob.query
+                  .filter(AnalysisJob.status == 'pending',
+                          or_(AnalysisJob.not_before.is_(None), AnalysisJob.not_before <= now))
+                  .order_by(AnalysisJob.id)
+                  .limit(5)
+                  .all())
+    for job in candidates:
+        claimed = db.session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job.id, AnalysisJob.status == 'pending')
+            .values(status='running', worker=worker_name, started_at=now, heartbeat_at=now)
+        ).rowcount
+        db.session.commit()
+        if claimed == 1:
+            db.session.refresh(job)
+            return job
+    return None
+
+
+def _requeue(job, delay):
+    """将任务放回队列，delay 秒后才能再次领取"""
+    job.status = 'pending'
+    job.worker = None
+    job.not_before = datetime.utcnow() + timedelta(seconds=delay)
+    db.session.commit()
+
+
+def _run_job(job):
+    """执行单个任务，并将阶段进度和结果写回数据库
+
+    各阶段结果保存在任务的解卦运行中，任务重新执行时（上游繁忙重新入队、进程中断）从已完成的阶段继续。
+    运行可能已被用户通过 /hexagram/runs/<run_id>/resume 继续执行：已完成时直接使用其记录，
+    正在执行时任务延迟后重新入队，不与其同时执行。
+    """
+    try:
+        run = get_run(job.run_id) if job.run_id else None
+        if run is None:
+            run = start_run(job.user_id, job.question, job.hexagram_info, job.model, job.user_yongshen or '',
+                            bool(job.force_refresh), job.mode)
+            job.run_id = run.run_id
+        elif run.status == 'done':
+            job.record_id = run.record_id
+            job.stages_done = json.dumps(STAGES)
+            job.status = 'done'
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
+            logger.info(f'解卦任务 {job.job_id} 的运行已继续执行完成，使用已保存的记录')
+            return
+        elif not claim_run(run):
+            _requeue(job, config.JOB_RETRY_DELAY)
+            logger.info(f'解卦任务 {job.job_id} 的运行正在继续执行，稍后重新检查')
+            return
+        stages_done = list(run_results(run))
+        job.stages_done = json.dumps(stages_done)
+        db.session.commit()
+
+        def on_stage_done(name, result):
+            # 与阶段检查点在同一事务中提交
+            stages_done.append(name)
+            job.stages_done = json.dumps(stages_done)
+
+        job.record_id, _ = execute_run(run, on_stage_done=on_stage_done, source='job')
+        job.status = 'done'
+    except StageError as e:
+        db.session.rollback()
+        if isinstance(e.error, UpstreamBusyError) and job.retries < config.JOB_MAX_RETRIES:
+            # 上游繁忙时延迟后放回队列（已完成的阶段不再重复），等待时间每次翻倍
+            job.retries += 1
+            delay = max(e.error.retry_after or 0, config.JOB_RETRY_DELAY * 2 ** (job.retries - 1))
+            _requeue(job, delay)
+            logger.warning(f'解卦任务 {job.job_id} 因上游繁忙重新入队（第{job.retries}次），{delay}秒后重新执行')
+            return
+        job.status = 'failed'
+        job.error = f'分析失败: {str(e.error)}'
+    except Exception as e:
+        db.session.rollback()
+        job.status = 'failed'
+        job.error = f'分析失败: {str(e)}'
+        logger.exception(f'解卦任务 {job.job_id} 执行异常')
+
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    logger.info(f'解卦任务 {job.job_id} 结束，状态: {job.status}')
+
+
+def requeue_stale_jobs():
+    """将已中断（长时间没有心跳）的running状态任务重新放回队列
+
+    服务重启或进程崩溃时，正在执行的任务会停留在running状态，
+    超过 JOB_HEARTBEAT_TIMEOUT 没有心跳的任务视为已中断。任务的解卦运行同时标记为失败，
+    重新执行时从已完成的阶段继续。
+
+    Returns:
+        int: 重新入队的任务数量
+    """
+    deadline = datetime.utcnow() - timedelta(seconds=config.JOB_HEARTBEAT_TIMEOUT)
+    stale = and_(
+        AnalysisJob.status == 'running',
+        or_(AnalysisJob.heartbeat_at < deadline,
+            and_(AnalysisJob.heartbeat_at.is_(None), AnalysisJob.started_at < deadline))
+    )
+    jobs = db.session.query(AnalysisJob.id, AnalysisJob.run_id).filter(stale).all()
+    if not jobs:
+        return 0
+    count = db.session.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.id.in_([job.id for job in jobs]), stale)
+        .values(status='pending', worker=None, not_before=None)
+    ).rowcount
+    run_ids = [job.run_id for job in jobs if job.run_id]
+    if run_ids:
+        db.session.execute(
+            update(PipelineRun)
+            .where(PipelineRun.run_id.in_(run_ids), PipelineRun.status == 'running')
+            .values(status='failed', error='任务执行中断')
+        )
+    db.session.commit()
+    if count:
+        logger.warning(f'{count}个中断的解卦任务已重新入队')
+    return count
+
+
+def heartbeat_jobs(worker_prefix):
+    """更新本进程执行中任务的心跳时间
+
+    Args:
+        worker_prefix (str): 本进程工作线程标识的前缀（主机名:进程号）
+    """
+    db.session.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.status == 'running', AnalysisJob.worker.like(f'{worker_prefix}:%'))
+        .values(heartbeat_at=datetime.utcnow())
+    )
+    db.session.commit()
+
+
+class JobWorkerPool:
+    """解卦任务工作线程池"""
+
+    def __init__(self, app, size):
+        """初始化工作线程池
+
+        Args:
+            app (Flask): Flask应用，工作线程在其应用上下文中访问数据库
+            size (int): 工作线程数量
+        """
+        self.app = app
+        self.size = size
+        self.threads = []
+        self.prefix = f'{socket.gethostname()}:{os.getpid()}'
+        self._stopping = threading.Event()
+
+    def start(self):
+        """启动工作线程"""
+        with self.app.app_context():
+            requeue_stale_jobs()
+        for i in range(self.size):
+            thread = threading.Thread(target=self._loop, args=(f'{self.prefix}:{i}',),
+                                      name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat_loop, name='job-heartbeat', daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        logger.info(f'解卦任务工作线程已启动: {self.size}个')
+
+    def stop(self):
+        """通知工作线程退出"""
+        self._stopping.set()
+        _new_job.set()
+
+    def _heartbeat_loop(self):
+        """心跳线程：定期更新本进程执行中任务的心跳，并将其他进程中断的任务重新入队"""
+        while not self._stopping.wait(config.JOB_HEARTBEAT_INTERVAL):
+            try:
+                with self.app.app_context():
+                    heartbeat_jobs(self.prefix)
+                    requeue_stale_jobs()
+            except Exception as e:
+                logger.error(f'解卦任务心跳更新失败: {str(e)}')
+
+    def _loop(self, worker_name):
+        """工作线程主循环：领取任务并执行，队列为空时等待新任务或轮询超时"""
+        while not self._stopping.is_set():
+            try:
+                with self.app.app_context():
+                    job = _claim_next_job(worker_name)
+                    if job is not None:
+                        _run_job(job)
+                        # 任务因上游繁忙重新入队时先等待，避免立即再次领取
+                        if job.status != 'pending':
+                            continue
+            except Exception as e:
+                logger.error(f'解卦任务工作线程异常: {str(e)}')
+            _new_job.wait(config.JOB_POLL_INTERVAL)
+            _new_job.clear()
+
+
+def start_job_workers(app, size=None):
+    """在当前进程中启动解卦任务工作线程池
+
+    Args:
+        app (Flask): Flask应用
+        size (int): 工作线程数量，默认使用 JOB_WORKERS 配置
+
+    Returns:
+        JobWorkerPool: 工作线程池，数量为0时返回None
+    """
+    global _pool
+    size = config.JOB_WORKERS if size is None else size
+    if _pool is not None or size <= 0:
+        return _pool
+    _pool = JobWorkerPool(app, size)
+    _pool.start()
+    return _pool
+
+
+if __name__ == '__main__':
+    # 独立运行任务进程：python jobs.py
+    # Web进程可设置 JOB_WORKERS=0，仅由独立进程执行任务
+    import time
+    from app import create_app
+    import jobs
+    app = create_app(start_workers=False)
+    pool = jobs.start_job_workers(app, max(config.JOB_WORKERS, 1))
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        pool.stop()
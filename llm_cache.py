@@ -0,0 +1,278 @@
+# AI响应缓存模块
+# 该文件实现了按请求内容寻址的两级AI响应缓存：
+# 进程内LRU缓存 + 数据库缓存（llm_cache表，带TTL和容量淘汰，多个工作进程共享）。
+# 数据库缓存命中时只读取，最近使用时间和命中次数最多每隔 LLM_CACHE_TOUCH_INTERVAL 秒写回一次
+
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+import hashlib
+import json
+import threading
+from sqlalchemy import delete, select, update, func
+from config import config
+from utils.logger import setup_logger
+from utils.stats import register_stats
+
+# 设置日志
+logger = setup_logger(__name__)
+
+# api.AI 在请求失败时返回的提示文本前缀，这类结果不写入缓存
+AI_ERROR_PREFIXES = ('API请求失败', 'API响应解析失败', '处理失败，请稍后再试')
+
+
+def make_cache_key(model, agent, text, endpoint='', params=None):
+    """计算缓存键
+
+    Args:
+        model (str): 模型名称
+        agent (str): 系统提示词
+        text (str): 用户文本
+        endpoint (str): 接口地址（自定义模型与内置模型同名时用于区分）
+        params (dict): 采样参数
+
+    Returns:
+        str: SHA-256十六进制摘要
+    """
+    from llm_client import TEMPERATURE, TOP_P
+    params = params or {'temperature': TEMPERATURE, 'top_p': TOP_P}
+    material = json.dumps([model, endpoint, agent, text, params], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+def is_cacheable(response):
+    """判断AI响应是否可以缓存（排除 api.AI 返回的错误提示）"""
+    return bool(response) and not response.startswith(AI_ERROR_PREFIXES)
+
+
+class LLMCache:
+    """两级AI响应缓存"""
+
+    def __init__(self):
+        """初始化缓存"""
+        self.app = None
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: defaultdict(int))
+        self._writes = 0
+        self._pending_hits = defaultdict(int)  # 尚未写回数据库的命中次数
+
+    def init_app(self, app):
+        """绑定Flask应用，数据库层在该应用的上下文中读写
+
+        Args:
+            app (Flask): Flask应用
+        """
+        self.app = app
+        register_stats('llm_cache', self.stats)
+
+    def _count(self, stage, name):
+        """累加计数器"""
+        with self._lock:
+            self._stats[stage][name] += 1
+
+    def _remember(self, key, value):
+        """写入进程内LRU缓存"""
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > config.LLM_CACHE_MEMORY_ITEMS:
+                self._memory.popitem(last=False)
+
+    def get(self, key, stage):
+        """读取缓存
+
+        Args:
+            key (str): 缓存键
+            stage (str): 分析阶段（用于统计）
+
+        Returns:
+            str: 缓存的响应，未命中时返回None
+        """
+        if not config.LLM_CACHE_ENABLED:
+            return None
+
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self._stats[stage]['memory_hits'] += 1
+                return value
+
+        value = self._db_get(key)
+        if value is not None:
+            self._remember(key, value)
+            self._count(stage, 'db_hits')
+            return value
+
+        self._count(stage, 'misses')
+        return None
+
+    def set(self, key, value, stage, model):
+        """写入缓存
+
+        Args:
+            key (str): 缓存键
+            value (str): 响应文本
+            stage (str): 分析阶段
+            model (str): 模型名称
+        """
+        if not config.LLM_CACHE_ENABLED or not is_cacheable(value):
+            return
+        self._remember(key, value)
+        self._db_set(key, value, stage, model)
+        self._count(stage, 'stores')
+
+    def record_bypass(self, stage):
+        """记录一次跳过缓存的强制重新分析"""
+        self._count(stage, 'bypass')
+
+    def _db_get(self, key):
+        """从数据库读取未过期的缓存
+
+        命中次数先在进程内累计，条目的最近使用时间早于 LLM_CACHE_TOUCH_INTERVAL 时才与累计的命中次数一起写回，
+        避免只读的缓存命中每次都开启写事务（SQLite 上写事务会使读取排队）。
+        """
+        if self.app is None:
+            return None
+        from models import db, LLMCacheEntry
+        try:
+            with self.app.app_context():
+                entry = LLMCacheEntry.query.filter_by(cache_key=key).first()
+                if entry is None:
+                    return None
+                now = datetime.utcnow()
+                if entry.expires_at <= now:
+                    return None
+                response = entry.response
+                touch = (entry.last_used_at is None or
+                         now - entry.last_used_at >= timedelta(seconds=config.LLM_CACHE_TOUCH_INTERVAL))
+                with self._lock:
+                    self._pending_hits[key] += 1
+                    hits = self._pending_hits.pop(key) if touch else 0
+                    # 已被淘汰的条目的累计次数不再写回，数量过多时丢弃（命中次数只用于统计）
+                    if len(self._pending_hits) > config.LLM_CACHE_MAX_ENTRIES:
+                        self._pending_hits.clear()
+                if touch:
+                    db.session.execute(
+                        update(LLMCacheEntry)
+                        .where(LLMCacheEntry.id == entry.id)
+                        .values(hits=LLMCacheEntry.hits + hits, last_used_at=now)
+                    )
+                    db.session.commit()
+                return response
+        except Exception as e:
+            logger.warning(f'读取AI响应缓存失败: {str(e)}')
+            return None
+
+    def _db_set(self, key, value, stage, model):
+        """写入数据库缓存（已存在时刷新内容和过期时间）"""
+        if self.app is None:
+            return
+        from models import db, LLMCacheEntry
+        try:
+            with self.app.app_context():
+                now = datetime.utcnow()
+                entry = LLMCacheEntry.query.filter_by(cache_key=key).first()
+                if entry is None:
+                    entry = LLMCacheEntry(cache_key=key, stage=stage, model=model, hits=0)
+                    db.session.add(entry)
+                entry.response = value
+                entry.size = len(value)
+                entry.last_used_at = now
+                entry.expires_at = now + timedelta(seconds=config.LLM_CACHE_TTL)
+                db.session.commit()
+
+                with self._lock:
+                    self._writes += 1
+                    prune = self._writes % config.LLM_CACHE_PRUNE_EVERY == 0
+                if prune:
+                    self.prune()
+        except Exception as e:
+            # 并发写入同一缓存键时唯一约束冲突，忽略即可
+            logger.warning(f'写入AI响应缓存失败: {str(e)}')
+
+    def prune(self):
+        """淘汰过期缓存，并在条目数超过上限时淘汰最久未使用的条目
+
+        Returns:
+            int: 删除的条目数
+        """
+        from models import db, LLMCacheEntry
+        with self.app.app_context():
+            removed = db.session.execute(
+                delete(LLMCacheEntry).where(LLMCacheEntry.expires_at <= datetime.utcnow())
+            ).rowcount
+            total = db.session.scalar(select(func.count(LLMCacheEntry.id)))
+            overflow = total - config.LLM_CACHE_MAX_ENTRIES
+            if overflow > 0:
+                oldest = [row[0] for row in db.session.execute(
+                    select(LLMCacheEntry.id).order_by(LLMCacheEntry.last_used_at).limit(overflow)
+                )]
+                removed += db.session.execute(
+                    delete(LLMCacheEntry).where(LLMCacheEntry.id.in_(oldest))
+                ).rowcount
+            db.session.commit()
+        if removed:
+            logger.info(f'已淘汰{removed}条AI响应缓存')
+        return removed
+
+    def clear_memory(self):
+        """清空进程内缓存"""
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self):
+        """返回各阶段的命中统计
+
+        Returns:
+            dict: 阶段 -> {memory_hits, db_hits, misses, stores, bypass, hit_rate}
+        """
+        with self._lock:
+            result = {stage: dict(counters) for stage, counters in self._stats.items()}
+            memory_items = len(self._memory)
+        for counters in result.values():
+            hits = counters.get('memory_hits', 0) + counters.get('db_hits', 0)
+            lookups = hits + counters.get('misses', 0)
+            counters['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+        return {'memory_items': memory_items, 'stages': result}
+
+
+# 全局缓存实例
+llm_cache = LLMCache()
+
+
+def cached_ai(text, model, agent, stage, endpoint=None, bypass=False, validate=None, on_upstream=None):
+    """带缓存的AI调用
+
+    Args:
+        text (str): 用户文本
+        model (str): 模型名称
+        agent (str): 系统提示词
+        stage (str): 分析阶段
+        endpoint (tuple): (api_url, api_key)，为None时使用 api.AI；接口地址参与缓存键计算
+        bypass (bool): 为True时跳过缓存读取（强制重新分析），结果仍会写入缓存
+        validate (callable): 结果校验函数，返回False时不写入缓存
+        on_upstream (callable): 未命中缓存、实际调用上游后的回调（用于统计上游调用次数）
+
+    Returns:
+        str: AI响应
+    """
+    from llm_client import complete_ai
+    from metrics import llm_call, llm_failures
+    key = make_cache_key(model, agent, text, endpoint[0] if endpoint else '')
+    if bypass:
+        llm_cache.record_bypass(stage)
+    else:
+        cached = llm_cache.get(key, stage)
+        if cached is not None:
+            return cached
+
+    with llm_call(stage, model):
+        result = complete_ai(text, model, agent, endpoint=endpoint)
+    if result and result.startswith(AI_ERROR_PREFIXES):
+        llm_failures.inc(stage=stage, model=model, reason='error_response')
+    if on_upstream is not None:
+        on_upstream()
+    if validate is None or validate(result):
+        llm_cache.set(key, result, stage, model)
+    return result
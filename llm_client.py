@@ -0,0 +1,184 @@
+# AI调用模块
+# 该文件实现了OpenAI兼容接口的普通调用和流式调用（stream: true），请求经由 admission 的准入控制
+# 和 http_client 的连接池发送；
+# 未配置接口地址时回退到 api.py 中的调用，流式调用一次性返回完整结果
+
+import json
+from config import config
+from http_client import http_client
+from admission import get_limiter, send_with_retry
+from utils.logger import setup_logger
+
+# 设置日志
+logger = setup_logger(__name__)
+
+# 采样参数（与 api.AI 保持一致）
+TEMPERATURE = 0.3
+TOP_P = 0.3
+
+
+def resolve_endpoint(model, user_id=None):
+    """确定模型对应的接口地址和密钥
+
+    优先使用该用户同名的自定义模型，其次使用 AI_API_URL 配置的默认网关。
+    模型版本号从数据库读取，其他进程刚修改或删除的自定义模型不会使用过期的地址和密钥。
+    需要在应用上下文中调用。
+
+    Args:
+        model (str): 模型名称
+        user_id (int): 用户ID
+
+    Returns:
+        tuple: (api_url, api_key)，未配置时返回None（由 api.py 处理）
+    """
+    if user_id:
+        from model_registry import model_registry, models_version
+        endpoint = model_registry.get(user_id, version=models_version(user_id)).endpoints.get(model)
+        if endpoint:
+            return endpoint
+    if config.AI_API_URL:
+        return config.AI_API_URL, config.AI_API_KEY
+    return None
+
+
+def _build_request(messages, model, api_key, stream=False):
+    """构造OpenAI兼容接口的请求头和请求体"""
+    headers = {
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': 'application/json',
+        'Accept': 'text/event-stream' if stream else 'application/json'
+    }
+    data = {
+        'model': model,
+        'messages': messages,
+        'temperature': TEMPERATURE,
+        'top_p': TOP_P
+    }
+    if stream:
+        data['stream'] = True
+    return headers, data
+
+
+def complete_chat(messages, model, endpoint=None):
+    """调用聊天接口，返回完整回复
+
+    Args:
+        messages (list): 消息列表
+        model (str): 模型名称
+        endpoint (tuple): (api_url, api_key)，为None时回退到 api.AI_chat
+
+    Returns:
+        str: 回复文本
+    """
+    if endpoint is None:
+        from api import AI_chat
+        with get_limiter(model).slot():
+            return AI_chat({'model': model, 'messages': messages})
+
+    api_url, api_key = endpoint
+    headers, data = _build_request(messages, model, api_key)
+    limiter = get_limiter(model, api_url)
+    with limiter.slot():
+        response = send_with_retry(limiter, lambda: http_client.post(api_url, headers=headers, json=data))
+    return response.json()['choices'][0]['message']['content']
+
+
+def complete_ai(text, model, agent, endpoint=None):
+    """调用AI（与 api.AI 参数一致：系统提示词 + 用户文本），返回完整回复
+
+    Args:
+        text (str): 用户文本
+        model (str): 模型名称
+        agent (str): 系统提示词
+        endpoint (tuple): (api_url, api_key)，为None时回退到 api.AI
+
+    Returns:
+        str: 回复文本
+    """
+    if endpoint is None:
+        from api import AI
+        with get_limiter(model).slot():
+            return AI(text, model=model, agent=agent)
+
+    messages = [
+        {'role': 'system', 'content': agent},
+        {'role': 'user', 'content': text}
+    ]
+    return complete_chat(messages, model, endpoint=endpoint)
+
+
+def stream_chat(messages, model, endpoint=None, cancel=None):
+    """流式调用聊天接口
+
+    Args:
+        messages (list): 消息列表
+        model (str): 模型名称
+        endpoint (tuple): (api_url, api_key)，为None时回退到 api.AI_chat
+        cancel (threading.Event): 取消标志，置位后立即关闭上游连接
+
+    Yields:
+        str: 增量文本
+    """
+    if endpoint is None:
+        from api import AI_chat
+        with get_limiter(model).slot():
+            reply = AI_chat({'model': model, 'messages': messages})
+        yield reply
+        return
+
+    api_url, api_key = endpoint
+    headers, data = _build_request(messages, model, api_key, stream=True)
+
+    # 流式输出期间一直占用并发名额；仅在收到响应头之前重试
+    limiter = get_limiter(model, api_url)
+    with limiter.slot():
+        response = send_with_retry(limiter, lambda: http_client.post(api_url, headers=headers, json=data, stream=True))
+        try:
+            yield from _iter_deltas(response, cancel)
+        finally:
+            response.close()
+
+
+def _iter_deltas(response, cancel):
+    """逐行解析流式响应，返回增量文本"""
+    response.encoding = 'utf-8'
+    for line in response.iter_lines(decode_unicode=True):
+        if cancel is not None and cancel.is_set():
+            logger.info('流式请求已取消，关闭上游连接')
+            break
+        if not line or not line.startswith('data:'):
+            continue
+        payload = line[5:].strip()
+        if payload == '[DONE]':
+            break
+        chunk = json.loads(payload)
+        choices = chunk.get('choices') or []
+        if not choices:
+            continue
+        content = (choices[0].get('delta') or {}).get('content')
+        if content:
+            yield content
+
+
+def stream_ai(text, model, agent, endpoint=None, cancel=None):
+    """流式调用AI（与 api.AI 参数一致：系统提示词 + 用户文本）
+
+    Args:
+        text (str): 用户文本
+        model (str): 模型名称
+        agent (str): 系统提示词
+        endpoint (tuple): (api_url, api_key)，为None时回退到 api.AI
+        cancel (threading.Event): 取消标志
+
+    Yields:
+        str: 增量文本
+    """
+    if endpoint is None:
+        yield complete_ai(text, model, agent)
+        return
+
+    messages = [
+        {'role': 'system', 'content': agent},
+        {'role': 'user', 'content': text}
+    ]
+    yield from stream_chat(messages, model, endpoint=endpoint, cancel=cancel)
@@ -0,0 +1,146 @@
+# 监控指标模块
+# 该文件定义应用的 Prometheus 指标（/metrics 输出），并为HTTP请求和数据库查询挂接计时：
+# 各路由的请求耗时、各阶段和模型的上游AI调用耗时、重试和失败次数、响应无法解析的次数、
+# 每个请求的数据库查询次数和耗时，以及正在进行的解卦和阶段数。
+# 指标更新只在本进程内存中进行；gunicorn 多进程部署时各进程定期写入快照，/metrics 汇总所有进程（见 utils/metrics.py）。
+
+from contextlib import contextmanager
+import contextvars
+import time
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from config import config
+from utils.metrics import Counter, Gauge, Histogram, metrics_registry
+
+# 上游AI调用的耗时桶（秒）
+LLM_BUCKETS = (0.5, 1, 2, 5, 10, 20, 30, 45, 60, 90, 120, 180, 300)
+
+# HTTP请求的耗时桶（秒）
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+http_request_duration = Histogram(
+    'liuyao_http_request_duration_seconds', 'HTTP请求耗时（秒），流式响应为返回响应头之前的耗时',
+    ['route', 'method', 'status'], buckets=HTTP_BUCKETS)
+llm_request_duration = Histogram(
+    'liuyao_llm_request_duration_seconds', '上游AI调用耗时（秒，不含缓存命中，流式调用为完整输出的耗时）',
+    ['stage', 'model'], buckets=LLM_BUCKETS)
+llm_failures = Counter(
+    'liuyao_llm_failures_total', '上游AI调用失败次数（reason 为异常类型，error_response 为 api.AI 返回的错误提示）',
+    ['stage', 'model', 'reason'])
+llm_retries = Counter(
+    'liuyao_llm_retries_total', '上游请求的重试次数（reason 为状态码或网络异常类型）', ['model', 'reason'])
+llm_invalid_responses = Counter(
+    'liuyao_llm_invalid_responses_total', 'AI响应无法解析（json）或缺少字段（schema）的次数', ['stage', 'model', 'reason'])
+db_queries_per_request = Histogram(
+    'liuyao_db_queries_per_request', '每个HTTP请求执行的数据库查询数', ['route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200))
+db_seconds_per_request = Histogram(
+    'liuyao_db_query_seconds_per_request', '每个HTTP请求的数据库查询总耗时（秒）', ['route'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5))
+db_queries = Counter('liuyao_db_queries_total', '数据库查询次数（含后台线程）')
+db_query_seconds = Counter('liuyao_db_query_seconds_total', '数据库查询总耗时（秒，含后台线程）')
+stage_duration = Histogram(
+    'liuyao_stage_duration_seconds', '解卦阶段耗时（秒，含缓存命中和纠正重试）', ['stage'], buckets=LLM_BUCKETS)
+stages_in_flight = Gauge('liuyao_stages_in_flight', '正在执行的解卦阶段数', ['stage'])
+analyses_in_flight = Gauge('liuyao_analyses_in_flight', '正在进行的解卦数（source 为 api、stream、resume 或 job）', ['source'])
+analyses = Counter('liuyao_analyses_total', '结束的解卦运行次数（每次执行或继续执行计一次）', ['status'])
+analysis_upstream_calls = Counter('liuyao_analysis_upstream_calls_total', '解卦的上游AI调用次数（不含缓存命中）')
+analysis_wasted_calls = Counter('liuyao_analysis_wasted_calls_total', '解卦中结果被丢弃的上游AI调用次数')
+
+# 当前请求的数据库查询统计 [次数, 耗时]，请求之外（后台线程）为None
+_request_db = contextvars.ContextVar('request_db', default=None)
+
+
+@contextmanager
+def llm_call(stage, model):
+    """记录一次上游AI调用的耗时，抛出异常时计入失败次数
+
+    Args:
+        stage (str): 分析阶段（chat 为聊天）
+        model (str): 模型名称
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        # 流式调用被客户端断开（GeneratorExit）不算失败
+        if isinstance(e, Exception):
+            llm_failures.inc(stage=stage, model=model, reason=type(e).__name__)
+        raise
+    finally:
+        llm_request_duration.observe(time.perf_counter() - start, stage=stage, model=model)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """记录查询开始时间"""
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """累加查询次数和耗时"""
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    db_queries.inc()
+    db_query_seconds.inc(elapsed)
+    stats = _request_db.get()
+    if stats is not None:
+        stats[0] += 1
+        stats[1] += elapsed
+
+
+def _handle_error(context):
+    """查询出错时丢弃开始时间"""
+    starts = context.connection.info.get('metrics_query_start') if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+
+def _start_request():
+    """请求开始：记录开始时间，开始统计本请求的数据库查询"""
+    request.environ['metrics.start'] = time.perf_counter()
+    _request_db.set([0, 0.0])
+
+
+def _finish_request(response):
+    """请求结束：记录请求耗时和本请求的数据库查询次数、耗时"""
+    start = request.environ.pop('metrics.start', None)
+    if start is None:
+        return response
+    route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    http_request_duration.observe(time.perf_counter() - start, route=route, method=request.method,
+                                  status=str(response.status_code))
+    queries, seconds = _request_db.get() or (0, 0.0)
+    db_queries_per_request.observe(queries, route=route)
+    db_seconds_per_request.observe(seconds, route=route)
+    _request_db.set(None)
+    return response
+
+
+def init_app(app):
+    """为Flask应用挂接请求计时和数据库查询统计，并启用多进程快照（METRICS_DIR）
+
+    Args:
+        app (Flask): Flask应用
+    """
+    if not config.METRICS_ENABLED:
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+    if config.METRICS_DIR and metrics_registry.directory is None:
+        metrics_registry.configure(config.METRICS_DIR, config.METRICS_FLUSH_INTERVAL)
+
+
+def render_metrics():
+    """输出所有进程汇总后的指标（Prometheus 文本格式）
+
+    Returns:
+        str: 指标文本
+    """
+    return metrics_registry.render()
@@ -0,0 +1,170 @@
+# 模型注册表缓存模块
+# 该文件为每个用户缓存可用模型列表（内置模型 + 自定义模型）和模型名称到接口地址的映射，
+# 首页、结果页、设置页、模型列表接口和分析时的接口地址解析都从这里读取，稳定状态下不查询 custom_models 表。
+# 缓存以 (用户ID, 模型版本号) 校验：自定义模型增删改时 User.models_version 递增（见 models.py 中的ORM事件），
+# 本进程在事务提交后立即失效；页面和模型列表使用用户快照中的版本号，其他进程在用户快照缓存过期（USER_CACHE_TTL）后
+# 读到新版本号并重新加载；分析时的接口地址解析每次查询数据库中的版本号（按主键查询一个整数），不会使用过期的地址和密钥。
+
+from collections import OrderedDict
+import threading
+from config import config
+from utils.logger import setup_logger
+from utils.stats import register_stats
+
+# 设置日志
+logger = setup_logger(__name__)
+
+
+class UserModels:
+    """某个用户在某个模型版本下的模型注册表（只读）"""
+
+    def __init__(self, version, custom_models):
+        """初始化注册表
+
+        Args:
+            version (int): 模型版本号
+            custom_models (list): 自定义模型字典列表（按ID排序）
+        """
+        self.version = version
+        self.custom_models = custom_models
+        self.names = config.SUPPORTED_MODELS + [model['name'] for model in custom_models]
+        # 同名的自定义模型以最早添加的为准
+        self.endpoints = {}
+        for model in custom_models:
+            self.endpoints.setdefault(model['name'], (model['api_url'], model['api_key']))
+
+
+class ModelRegistry:
+    """按用户缓存模型注册表（LRU）"""
+
+    def __init__(self):
+        """初始化缓存"""
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, version=None):
+        """获取用户的模型注册表
+
+        Args:
+            user_id (int): 用户ID
+            version (int): 模型版本号，为None时取当前登录用户快照中的版本号，
+                           非当前用户（如后台任务）时查询数据库
+
+        Returns:
+            UserModels: 模型注册表
+        """
+        if version is None:
+            version = _current_version(user_id)
+        with self._lock:
+            entry = self._items.get(user_id)
+            if entry is not None and entry.version == version:
+                self._items.move_to_end(user_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = UserModels(version, _load_custom_models(user_id))
+        with self._lock:
+            self._items[user_id] = entry
+            self._items.move_to_end(user_id)
+            while len(self._items) > config.MODEL_REGISTRY_SIZE:
+                self._items.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id):
+        """删除某个用户的缓存
+
+        Args:
+            user_id (int): 用户ID
+        """
+        with self._lock:
+            self._items.pop(user_id, None)
+
+    def clear(self):
+        """删除全部缓存"""
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'users': len(self._items),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def _current_version(user_id):
+    """取用户的模型版本号：优先使用当前登录用户的快照，否则查询数据库"""
+    from flask import has_request_context
+    from flask_login import current_user
+    if has_request_context() and current_user.is_authenticated and current_user.id == user_id:
+        return current_user.models_version
+    return models_version(user_id)
+
+
+def models_version(user_id):
+    """查询数据库中用户当前的模型版本号（不使用用户快照）
+
+    Args:
+        user_id (int): 用户ID
+
+    Returns:
+        int: 模型版本号
+    """
+    from models import db, User
+    version = db.session.query(User.models_version).filter(User.id == user_id).scalar()
+    return version or 0
+
+
+def _load_custom_models(user_id):
+    """查询用户的自定义模型"""
+    from models import CustomModel
+    models = CustomModel.query.filter_by(user_id=user_id).order_by(CustomModel.id).all()
+    return [{
+        'id': model.id,
+        'name': model.name,
+        'api_url': model.api_url,
+        'api_key': model.api_key,
+        'description': model.description,
+        'created_at': model.created_at.strftime('%Y-%m-%d %H:%M:%S') if model.created_at else ''
+    } for model in models]
+
+
+def user_models(user_id=None):
+    """获取用户的模型注册表
+
+    Args:
+        user_id (int): 用户ID，为None时取当前登录用户，未登录时只包含内置模型
+
+    Returns:
+        UserModels: 模型注册表
+    """
+    if user_id is None:
+        from flask_login import current_user
+        if not current_user.is_authenticated:
+            return UserModels(0, [])
+        user_id = current_user.id
+    return model_registry.get(user_id)
+
+
+def model_names(user_id=None):
+    """获取所有可用模型名称（内置模型 + 自定义模型）
+
+    Args:
+        user_id (int): 用户ID，为None时取当前登录用户
+
+    Returns:
+        list: 模型名称列表
+    """
+    return list(user_models(user_id).names)
+
+
+# 全局模型注册表
+model_registry = ModelRegistry()
+register_stats('model_registry', model_registry.stats)
@@ -3,10 +3,13 @@
 
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
-from sqlalchemy.orm import relationship
-import bcrypt
+from sqlalchemy import event, inspect, update, select, Column, Integer, String, DateTime, ForeignKey, Text, Boolean, Float, Index, LargeBinary
+from sqlalchemy.orm import relationship, deferred, object_session, Session
 from flask_login import UserMixin
+from password_hasher import password_hasher, needs_rehash
+from config import config
+from utils.compression import CompressedText, text_codec
+from utils.stats import register_stats
 
 # 创建数据库对象
 # 注意：db对象将在app.py中初始化，这里只定义模型
@@ -21,6 +24,8 @@ class User(db.Model, UserMixin):
     username = Column(String(50), unique=True, nullable=False, index=True)  # 用户名，唯一，非空，添加索引
     password_hash = Column(String(128), nullable=False)  # 密码哈希，非空
     created_at = Column(DateTime, default=datetime.utcnow)  # 创建时间，默认当前时间
+    models_version = Column(Integer, nullable=False, default=0)  # 自定义模型版本号，模型增删改时加1，用于页面缓存校验
+    auth_version = Column(Integer, nullable=False, default=0)  # 认证版本号，修改密码时加1，使已登录的旧会话失效
     
     # 关联关系
     custom_models = relationship('CustomModel', backref='user', cascade='all, delete-orphan')  # 自定义模型，一对多关系
@@ -31,12 +36,29 @@ class User(db.Model, UserMixin):
         return f'<User {self.username}>'
     
     def set_password(self, password):
-        """设置密码，使用bcrypt算法加密"""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        """设置密码，使用bcrypt算法加密，并递增认证版本号"""
+        self.password_hash = password_hasher.hash(password)
+        self.auth_version = (self.auth_version or 0) + 1
+    
+    def get_id(self):
+        """返回保存在会话中的用户标识（用户ID.认证版本号）"""
+        from user_cache import session_user_id
+        return session_user_id(self.id, self.auth_version)
     
     def check_password(self, password):
         """验证密码"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return password_hasher.verify(password, self.password_hash)
+    
+    def rehash_password_if_needed(self, password):
+        """密码验证成功后，已保存哈希的成本因子与配置不同时按当前成本重新计算（不影响已登录的会话）
+        
+        Returns:
+            bool: 是否重新计算了哈希（需要提交）
+        """
+        if not needs_rehash(self.password_hash):
+            return False
+        self.password_hash = password_hasher.hash(password)
+        return True
 
 class CustomModel(db.Model):
     """自定义模型配置模型"""
@@ -54,6 +76,72 @@ class CustomModel(db.Model):
         """返回自定义模型对象的字符串表示"""
         return f'<CustomModel {self.name}>'
 
+@event.listens_for(CustomModel, 'after_insert')
+@event.listens_for(CustomModel, 'after_update')
+@event.listens_for(CustomModel, 'after_delete')
+def _bump_models_version(mapper, connection, target):
+    """自定义模型变化时递增所属用户的模型版本号（与模型变更在同一事务中）"""
+    connection.execute(
+        update(User.__table__)
+        .where(User.__table__.c.id == target.user_id)
+        .values(models_version=User.__table__.c.models_version + 1)
+    )
+    # 提交后再使本进程的缓存失效，提交前其他请求重新加载只会读到旧数据
+    _invalidate_after_commit(target, 'models_changed', target.user_id)
+
+@event.listens_for(User, 'after_update')
+def _auth_version_changed(mapper, connection, target):
+    """修改密码（认证版本号变化）时，提交后通知所有进程该用户的旧会话失效"""
+    if inspect(target).attrs.auth_version.history.has_changes():
+        _invalidate_after_commit(target, 'auth_changed', target.id)
+
+@event.listens_for(User, 'after_delete')
+def _user_deleted(mapper, connection, target):
+    """删除用户时，提交后通知所有进程该用户的会话失效"""
+    _invalidate_after_commit(target, 'auth_changed', target.id)
+
+def _invalidate_after_commit(target, kind, user_id):
+    """记录事务提交后需要使缓存失效的用户（保存在数据库会话的 info 中）"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(kind, set()).add(user_id)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_user_caches(session):
+    """事务提交后使缓存失效：模型变化时删除本进程的用户快照和模型注册表，认证信息变化时通知所有进程"""
+    models_changed = session.info.pop('models_changed', None)
+    auth_changed = session.info.pop('auth_changed', None)
+    if not models_changed and not auth_changed:
+        return
+    from user_cache import user_cache, publish_auth_change
+    from model_registry import model_registry
+    for user_id in models_changed or ():
+        user_cache.invalidate(user_id)
+        model_registry.invalidate(user_id)
+    for user_id in auth_changed or ():
+        publish_auth_change(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_cache_invalidations(session):
+    """事务回滚后数据没有变化，不需要使缓存失效"""
+    session.info.pop('models_changed', None)
+    session.info.pop('auth_changed', None)
+
+class Hexagram(db.Model):
+    """卦象模型（按规范化后的卦象信息去重，同一卦象的解卦记录共享，见 hexagram_store.py）"""
+    __tablename__ = 'hexagrams'  # 表名
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)  # 主键，自增
+    digest = Column(String(64), unique=True, nullable=False, index=True)  # 规范化卦象信息的SHA-256，唯一，非空，添加索引
+    content = Column(CompressedText, nullable=False)  # 规范化后的卦象信息，压缩存储，非空
+    parsed = Column(CompressedText, nullable=True)  # 解析结果（HexagramInfo.to_dict() 的JSON），无法本地解析时为空
+    parse_error = Column(String(255), nullable=True)  # 无法本地解析的原因
+    created_at = Column(DateTime, default=datetime.utcnow)  # 创建时间，默认当前时间
+    
+    def __repr__(self):
+        """返回卦象对象的字符串表示"""
+        return f'<Hexagram {self.digest[:12]}>'
+
 class HexagramRecord(db.Model):
     """解卦记录模型"""
     __tablename__ = 'hexagram_records'  # 表名
@@ -62,15 +150,143 @@ class HexagramRecord(db.Model):
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)  # 外键，关联users表的id字段
     record_id = Column(String(36), unique=True, nullable=False, index=True)  # 记录ID，UUID格式，唯一，非空，添加索引
     question = Column(Text, nullable=False)  # 问题，非空
-    hexagram_info = Column(Text, nullable=False)  # 卦象信息，非空
+    # 卦象和分析结果压缩存储（见 utils/compression.py），延迟加载：只在访问时读取，
+    # 访问其中任意一列时同组的列一起读取；列表、搜索、删除等不需要正文的操作不会读取和解压
+    hexagram_id = Column(Integer, ForeignKey('hexagrams.id'), nullable=True, index=True)  # 外键，关联hexagrams表的id字段（去重后的卦象）
+    hexagram_info = deferred(Column(CompressedText, nullable=False), group='body')  # 卦象信息副本，非空；引用卦象表的记录为空字符串
     model = Column(String(50), nullable=False)  # 使用的模型，非空
-    yongshen = Column(Text, nullable=False)  # 用神判断结果，JSON格式，非空
-    yongshen_guli = Column(Text, nullable=False)  # 用神卦理分析，JSON格式，非空
-    dongyao_guli = Column(Text, nullable=False)  # 动爻卦理分析，JSON格式，非空
-    shuzi_lianghua = Column(Text, nullable=False)  # 数字量化分析，JSON格式，非空
-    zonghe_jiedu = Column(Text, nullable=False)  # 综合解读，非空
+    yongshen = deferred(Column(CompressedText, nullable=False), group='body')  # 用神判断结果，JSON格式，非空
+    yongshen_guli = deferred(Column(CompressedText, nullable=False), group='body')  # 用神卦理分析，JSON格式，非空
+    dongyao_guli = deferred(Column(CompressedText, nullable=False), group='body')  # 动爻卦理分析，JSON格式，非空
+    shuzi_lianghua = deferred(Column(CompressedText, nullable=False), group='body')  # 数字量化分析，JSON格式，非空
+    zonghe_jiedu = deferred(Column(Text, nullable=False), group='body')  # 综合解读，非空（不压缩：全文索引和LIKE搜索需要原文）
     timestamp = Column(DateTime, default=datetime.utcnow)  # 解卦时间，默认当前时间
+    yongshen_text = Column(String(255), nullable=True)  # 用神（冗余字段，写入时从用神判断结果提取，用于历史列表）
+    yongshen_zhishu = Column(Float, nullable=True)  # 用神总指数（冗余字段，写入时从数字量化结果提取，用于历史列表）
+    payload = deferred(Column(CompressedText, nullable=True))  # 完整记录的JSON（写入时生成，读取时直接返回，无需逐列解析），压缩存储
+    
+    __table_args__ = (
+        Index('ix_hexagram_records_user_timestamp', 'user_id', 'timestamp'),  # 历史记录按用户、时间分页
+    )
+    
+    # 关联关系
+    hexagram = relationship('Hexagram')  # 卦象，多对一关系
+    
+    @property
+    def hexagram_text(self):
+        """卦象信息：引用卦象表的记录取共享的卦象，旧记录取本行保存的副本"""
+        return self.hexagram.content if self.hexagram_id is not None else self.hexagram_info
     
     def __repr__(self):
         """返回解卦记录对象的字符串表示"""
         return f'<HexagramRecord {self.record_id}>'
+
+class AnalysisJob(db.Model):
+    """异步解卦任务模型（数据库队列）"""
+    __tablename__ = 'analysis_jobs'  # 表名
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)  # 主键，自增
+    job_id = Column(String(36), unique=True, nullable=False, index=True)  # 任务ID，UUID格式，唯一，非空，添加索引
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)  # 外键，关联users表的id字段，未登录时为空
+    question = Column(Text, nullable=False)  # 问题，非空
+    hexagram_info = Column(Text, nullable=False)  # 卦象信息，非空
+    model = Column(String(50), nullable=False)  # 使用的模型，非空
+    user_yongshen = Column(String(100), nullable=True)  # 用户指定的用神，可为空
+    force_refresh = Column(Boolean, nullable=False, default=False)  # 是否强制重新分析（不读取AI响应缓存）
+    mode = Column(String(10), nullable=True)  # 分析模式：staged/fast，为空时按模型配置确定
+    status = Column(String(20), nullable=False, default='pending', index=True)  # 任务状态：pending/running/done/failed
+    stages_done = Column(Text, nullable=False, default='[]')  # 已完成的阶段，JSON格式
+    record_id = Column(String(36), nullable=True)  # 完成后生成的解卦记录ID
+    run_id = Column(String(36), nullable=True)  # 保存阶段结果的解卦运行ID，重新执行时从已完成的阶段继续
+    error = Column(Text, nullable=True)  # 失败原因
+    worker = Column(String(100), nullable=True)  # 执行该任务的工作线程标识
+    retries = Column(Integer, nullable=False, default=0)  # 因上游繁忙重新入队的次数
+    not_before = Column(DateTime, nullable=True)  # 重新入队后最早可以再次领取的时间
+    heartbeat_at = Column(DateTime, nullable=True)  # 执行中的任务最近一次心跳时间，长时间没有心跳视为已中断
+    created_at = Column(DateTime, default=datetime.utcnow)  # 创建时间，默认当前时间
+    started_at = Column(DateTime, nullable=True)  # 开始执行时间
+    finished_at = Column(DateTime, nullable=True)  # 结束时间
+    
+    def __repr__(self):
+        """返回异步解卦任务对象的字符串表示"""
+        return f'<AnalysisJob {self.job_id} {self.status}>'
+
+class PipelineRun(db.Model):
+    """解卦运行模型：保存一次解卦流水线中已完成阶段的结果，失败后可从最后完成的阶段继续"""
+    __tablename__ = 'pipeline_runs'  # 表名
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)  # 主键，自增
+    run_id = Column(String(36), unique=True, nullable=False, index=True)  # 运行ID，UUID格式，唯一，非空，添加索引
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=True)  # 外键，关联users表的id字段，未登录时为空
+    question = Column(Text, nullable=False)  # 问题，非空
+    hexagram_id = Column(Integer, ForeignKey('hexagrams.id'), nullable=False)  # 外键，关联hexagrams表的id字段
+    model = Column(String(50), nullable=False)  # 使用的模型，非空
+    user_yongshen = Column(String(100), nullable=True)  # 用户指定的用神，可为空
+    force_refresh = Column(Boolean, nullable=False, default=False)  # 是否强制重新分析（不读取AI响应缓存）
+    mode = Column(String(10), nullable=True)  # 分析模式：staged/fast，为空时按模型配置确定
+    status = Column(String(20), nullable=False, default='running', index=True)  # 运行状态：running/failed/done
+    results = Column(CompressedText, nullable=True)  # 已完成阶段的结果，JSON格式，阶段名称 -> 结果；完成后清空
+    failed_stage = Column(String(50), nullable=True)  # 最近一次失败的阶段
+    error = Column(Text, nullable=True)  # 最近一次失败的原因
+    attempts = Column(Integer, nullable=False, default=1)  # 执行次数（首次执行和每次继续执行）
+    upstream_calls = Column(Integer, nullable=False, default=0)  # 累计的上游AI调用次数（不含缓存命中）
+    wasted_calls = Column(Integer, nullable=False, default=0)  # 其中结果被丢弃的调用次数（无法解析、缺少字段）
+    record_id = Column(String(36), nullable=True)  # 完成后生成的解卦记录ID
+    created_at = Column(DateTime, default=datetime.utcnow)  # 创建时间，默认当前时间
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # 最近更新时间
+    
+    hexagram = relationship('Hexagram', lazy='joined')  # 关联的卦象
+    
+    def __repr__(self):
+        """返回解卦运行对象的字符串表示"""
+        return f'<PipelineRun {self.run_id} {self.status}>'
+
+class LLMCacheEntry(db.Model):
+    """AI响应缓存模型（按请求内容哈希寻址，多进程共享）"""
+    __tablename__ = 'llm_cache'  # 表名
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)  # 主键，自增
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)  # 缓存键，请求内容的SHA-256，唯一，非空，添加索引
+    stage = Column(String(50), nullable=False)  # 分析阶段，非空
+    model = Column(String(100), nullable=False)  # 使用的模型，非空
+    response = Column(Text, nullable=False)  # AI响应文本，非空
+    size = Column(Integer, nullable=False, default=0)  # 响应大小（字符数）
+    hits = Column(Integer, nullable=False, default=0)  # 命中次数
+    created_at = Column(DateTime, default=datetime.utcnow)  # 创建时间，默认当前时间
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)  # 最近使用时间，用于淘汰
+    expires_at = Column(DateTime, nullable=False, index=True)  # 过期时间，非空，添加索引
+    
+    def __repr__(self):
+        """返回AI响应缓存对象的字符串表示"""
+        return f'<LLMCacheEntry {self.stage} {self.cache_key[:12]}>'
+
+class CompressionDictionary(db.Model):
+    """文本压缩字典模型（由 flask --app app train-compression-dict 训练，最新的字典用于写入）"""
+    __tablename__ = 'compression_dicts'  # 表名
+    
+    id = Column(Integer, primary_key=True, autoincrement=False)  # 主键，字典内容的CRC32，写入压缩数据头
+    codec = Column(String(10), nullable=False)  # 训练时使用的算法：zstd/zlib
+    data = Column(LargeBinary(length=16 * 1024 * 1024), nullable=False)  # 字典内容
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # 创建时间，默认当前时间
+    
+    def __repr__(self):
+        """返回压缩字典对象的字符串表示"""
+        return f'<CompressionDictionary {self.id}>'
+
+def _load_compression_dictionary(dict_id):
+    """按ID读取压缩字典（使用独立连接，不影响当前会话的事务）"""
+    with db.engine.connect() as conn:
+        return conn.execute(select(CompressionDictionary.data).where(CompressionDictionary.id == dict_id)).scalar()
+
+def _load_active_compression_dictionary():
+    """读取最新的压缩字典，返回 (字典ID, 字典内容)，没有字典时返回None"""
+    with db.engine.connect() as conn:
+        row = conn.execute(select(CompressionDictionary.id, CompressionDictionary.data)
+                           .order_by(CompressionDictionary.created_at.desc(), CompressionDictionary.id.desc())
+                           .limit(1)).first()
+    return tuple(row) if row else None
+
+# 配置压缩存储
+text_codec.configure(config.TEXT_COMPRESSION, config.TEXT_COMPRESSION_LEVEL, config.TEXT_COMPRESSION_MIN_BYTES)
+text_codec.set_dictionary_source(_load_compression_dictionary, _load_active_compression_dictionary)
+register_stats('text_compression', text_codec.stats)
@@ -4,7 +4,7 @@
 from flask import Blueprint, render_template, request, jsonify
 from flask_login import login_required, current_user
 from models import db, CustomModel
-from config import config
+from model_registry import user_models, model_names
 
 # 创建自定义模型管理蓝图
 models_bp = Blueprint('models', __name__, url_prefix='/models')
@@ -16,24 +16,8 @@ def get_custom_models():
     Returns:
         JSON: 自定义模型列表
     """
-    if current_user.is_authenticated:
-        # 如果用户已登录，返回该用户的自定义模型
-        models = CustomModel.query.filter_by(user_id=current_user.id).all()
-    else:
-        # 如果用户未登录，返回空列表
-        models = []
-    
-    # 转换为字典列表
-    model_list = []
-    for model in models:
-        model_list.append({
-            'id': model.id,
-            'name': model.name,
-            'api_url': model.api_url,
-            'api_key': model.api_key,
-            'description': model.description,
-            'created_at': model.created_at.strftime('%Y-%m-%d %H:%M:%S')
-        })
+    # 已登录时返回该用户的自定义模型，未登录时返回空列表
+    model_list = user_models().custom_models
     
     return jsonify({'models': model_list})
 
@@ -47,10 +31,11 @@ def add_custom_model():
     """
     try:
         data = request.get_json()
-        name = data.get('name', '').strip()
-        api_url = data.get('api_url', '').strip()
-        api_key = data.get('api_key', '').strip()
-        description = data.get('description', '').strip()
+        # 设置页面（/api/settings/models）提交的字段名为 modelName、apiUrl、apiKey、modelDescription
+        name = (data.get('name') or data.get('modelName') or '').strip()
+        api_url = (data.get('api_url') or data.get('apiUrl') or '').strip()
+        api_key = (data.get('api_key') or data.get('apiKey') or '').strip()
+        description = (data.get('description') or data.get('modelDescription') or '').strip()
         
         # 验证数据
         if not name or not api_url or not api_key:
@@ -102,6 +87,7 @@ def delete_custom_model(model_id):
         return jsonify({'success': False, 'error': f'删除模型失败: {str(e)}'}), 500
 
 @models_bp.route('/update/<int:model_id>', methods=['PUT'])
+@login_required
 def update_custom_model(model_id):
     """更新自定义模型
     
@@ -150,13 +136,7 @@ def get_all_models():
     Returns:
         JSON: 所有可用模型列表
     """
-    # 内置模型
-    all_models = config.SUPPORTED_MODELS.copy()
-    
-    # 如果用户已登录，添加该用户的自定义模型
-    if current_user.is_authenticated:
-        custom_models = CustomModel.query.filter_by(user_id=current_user.id).all()
-        for model in custom_models:
-            all_models.append(model.name)
+    # 内置模型，用户已登录时再加上该用户的自定义模型
+    all_models = model_names()
     
     return jsonify({'models': all_models})
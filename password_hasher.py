@@ -0,0 +1,163 @@
+# 密码哈希模块
+# 该文件在独立的有界线程池中执行 bcrypt 哈希和校验（bcrypt 计算时释放GIL，多个线程可以并行使用多核），
+# 请求线程只等待结果，同时进行的计算数不超过 BCRYPT_WORKERS，排队已满或等待超时时立即失败
+# （PasswordHasherBusyError，登录和注册页面返回503），不会让所有工作线程都卡在密码计算上。
+# 哈希成本由 BCRYPT_ROUNDS 配置，登录成功时已保存哈希的成本与配置不同则重新计算。
+# bcrypt 在首次计算时才导入，不增加Web进程的启动时间。
+
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import threading
+import time
+from config import config
+from utils.logger import setup_logger
+from utils.stats import register_stats
+
+# 设置日志
+logger = setup_logger(__name__)
+
+
+class PasswordHasherBusyError(Exception):
+    """密码计算线程池繁忙异常（排队已满或等待超时）"""
+
+    def __init__(self, retry_after=None):
+        """初始化异常
+
+        Args:
+            retry_after (int): 建议客户端重试的等待秒数
+        """
+        super().__init__('服务器繁忙，请稍后再试')
+        self.retry_after = retry_after or config.BCRYPT_RETRY_AFTER
+
+
+class PasswordHasher:
+    """bcrypt 计算线程池"""
+
+    def __init__(self, workers, max_queue):
+        """初始化线程池
+
+        Args:
+            workers (int): 线程数（同时进行的计算数）
+            max_queue (int): 最多排队等待的计算数
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = None
+        self._lock = threading.Lock()
+        self.active = 0
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+
+    def _submit(self, func, *args):
+        """提交计算并等待结果
+
+        Raises:
+            PasswordHasherBusyError: 排队已满或等待超时
+        """
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                full = True
+            else:
+                full = False
+                self.pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+        if full:
+            logger.warning('密码计算线程池已满，拒绝请求')
+            raise PasswordHasherBusyError()
+
+        future = self._executor.submit(self._run, func, *args)
+        try:
+            return future.result(timeout=config.BCRYPT_WAIT_TIMEOUT)
+        except FutureTimeoutError:
+            # 未开始的计算直接取消；已开始的计算完成后由 _run 释放名额
+            if future.cancel():
+                with self._lock:
+                    self.pending -= 1
+            with self._lock:
+                self.rejected += 1
+            logger.warning('密码计算等待超时')
+            raise PasswordHasherBusyError()
+
+    def _run(self, func, *args):
+        """在线程池中执行计算并记录统计"""
+        with self._lock:
+            self.active += 1
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.active -= 1
+                self.pending -= 1
+                self.completed += 1
+                self.busy_seconds += elapsed
+
+    def hash(self, password, rounds=None):
+        """计算密码哈希
+
+        Args:
+            password (str): 明文密码
+            rounds (int): 成本因子，默认使用 BCRYPT_ROUNDS
+
+        Returns:
+            str: bcrypt 哈希
+        """
+        import bcrypt
+        salt = bcrypt.gensalt(rounds or config.BCRYPT_ROUNDS)
+        return self._submit(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+    def verify(self, password, password_hash):
+        """校验密码
+
+        Args:
+            password (str): 明文密码
+            password_hash (str): bcrypt 哈希
+
+        Returns:
+            bool: 密码是否正确
+        """
+        import bcrypt
+        return self._submit(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+
+    def stats(self):
+        """返回线程池统计信息（saturation 为正在计算和排队的数量与线程数之比，大于1表示有请求在排队）"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'active': self.active,
+                'waiting': self.pending - self.active,
+                'saturation': round(self.pending / self.workers, 4),
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'avg_ms': round(self.busy_seconds / self.completed * 1000, 2) if self.completed else 0.0
+            }
+
+
+def hash_rounds(password_hash):
+    """读取 bcrypt 哈希中的成本因子
+
+    Args:
+        password_hash (str): bcrypt 哈希，如 "$2b$12$..."
+
+    Returns:
+        int: 成本因子，无法解析时返回None
+    """
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash):
+    """判断已保存哈希的成本因子是否与当前配置不同"""
+    return hash_rounds(password_hash) != config.BCRYPT_ROUNDS
+
+
+# 全局密码计算线程池
+password_hasher = PasswordHasher(config.BCRYPT_WORKERS, config.BCRYPT_MAX_QUEUE)
+register_stats('password_hasher', password_hasher.stats)
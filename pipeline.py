@@ -0,0 +1,218 @@
+# 阶段流水线模块
+# 该文件实现了按依赖关系（DAG）并发执行的阶段调度器，用于并行执行互不依赖的AI调用
+
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import config
+from metrics import stage_duration, stages_in_flight
+from utils.logger import setup_logger
+
+# 设置日志
+logger = setup_logger(__name__)
+
+# 全局共享的有界线程池（所有请求共用，限制同时进行的阶段数量）
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """获取全局共享的阶段执行线程池
+
+    Returns:
+        ThreadPoolExecutor: 线程池
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=config.PIPELINE_MAX_WORKERS,
+                    thread_name_prefix='pipeline'
+                )
+    return _executor
+
+
+class StageError(Exception):
+    """阶段执行失败异常"""
+
+    def __init__(self, stage, error, results=None):
+        """初始化异常
+
+        Args:
+            stage (str): 失败的阶段名称
+            error (Exception): 原始异常
+            results (dict): 失败时已完成阶段的结果
+        """
+        super().__init__(str(error))
+        self.stage = stage
+        self.error = error
+        self.results = results or {}
+
+
+class Stage:
+    """流水线阶段"""
+
+    def __init__(self, name, func, deps=()):
+        """初始化阶段
+
+        Args:
+            name (str): 阶段名称
+            func (callable): 阶段函数，参数为已完成阶段的结果字典
+            deps (tuple): 依赖的阶段名称
+        """
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+
+
+class StagePipeline:
+    """阶段DAG流水线
+
+    每个阶段在其依赖全部完成后立即提交到线程池，互不依赖的阶段并发执行。
+    """
+
+    def __init__(self, stages, executor=None):
+        """初始化流水线
+
+        Args:
+            stages (list): 阶段列表
+            executor (Executor): 执行器，默认使用全局共享线程池
+        """
+        self.stages = {stage.name: stage for stage in stages}
+        self.executor = executor
+        self.timings = {}
+        self.elapsed = 0.0
+        self.counters = {}
+        self._counter_lock = threading.Lock()
+
+        # 校验依赖关系
+        for stage in stages:
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f'阶段 {stage.name} 依赖了不存在的阶段 {dep}')
+        self._check_acyclic()
+
+    def _check_acyclic(self):
+        """检查阶段之间不存在循环依赖"""
+        visiting, visited = set(), set()
+
+        def visit(name):
+            if name in visited:
+                return
+            if name in visiting:
+                raise ValueError(f'阶段依赖存在循环: {name}')
+            visiting.add(name)
+            for dep in self.stages[name].deps:
+                visit(dep)
+            visiting.discard(name)
+            visited.add(name)
+
+        for name in self.stages:
+            visit(name)
+
+    def count(self, name, amount=1):
+        """累加计数器（阶段函数中调用，如上游调用次数）
+
+        Args:
+            name (str): 计数器名称
+            amount (int): 增加的数量
+        """
+        with self._counter_lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def _timed(self, stage, results, started_at):
+        """执行单个阶段并记录耗时"""
+        start = time.time()
+        stages_in_flight.inc(stage=stage.name)
+        try:
+            return stage.func(results)
+        finally:
+            end = time.time()
+            stages_in_flight.dec(stage=stage.name)
+            stage_duration.observe(end - start, stage=stage.name)
+            self.timings[stage.name] = {
+                'start': round(start - started_at, 3),
+                'elapsed': round(end - start, 3)
+            }
+
+    def run(self, results=None, on_stage_done=None):
+        """运行流水线
+
+        Args:
+            results (dict): 预先已知的结果（这些阶段将被跳过）
+            on_stage_done (callable): 阶段完成回调，参数为(阶段名称, 结果)
+
+        Returns:
+            dict: 各阶段的结果
+
+        Raises:
+            StageError: 任一阶段失败时抛出，尚未开始的阶段会被取消；
+                已在执行的阶段执行完毕后再抛出，其结果同样回调 on_stage_done 并包含在异常的 results 中
+        """
+        executor = self.executor or get_executor()
+        results = dict(results or {})
+        pending = {name for name in self.stages if name not in results}
+        running = {}
+        started_at = time.time()
+
+        while pending or running:
+            # 提交所有依赖已满足的阶段
+            for name in sorted(pending):
+                stage = self.stages[name]
+                if all(dep in results for dep in stage.deps):
+                    # 传入结果快照，避免阶段函数读到并发写入
+                    future = executor.submit(self._timed, stage, dict(results), started_at)
+                    running[future] = name
+                    pending.discard(name)
+
+            if not running:
+                raise ValueError(f'无法调度的阶段: {", ".join(sorted(pending))}')
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f'阶段 {name} 执行失败: {str(e)}')
+                    self._drain(running, results, on_stage_done)
+                    self.elapsed = time.time() - started_at
+                    raise StageError(name, e, results) from e
+                if on_stage_done:
+                    on_stage_done(name, results[name])
+
+        self.elapsed = time.time() - started_at
+        self._log_timings()
+        return results
+
+    def _drain(self, running, results, on_stage_done):
+        """某个阶段失败后取消尚未开始的阶段，等待已在执行的阶段结束并保留其结果（这些调用已经发出）"""
+        started = [future for future in running if not future.cancel()]
+        for future in started:
+            name = running[future]
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error(f'阶段 {name} 执行失败: {str(e)}')
+                continue
+            if on_stage_done:
+                on_stage_done(name, results[name])
+
+    def _log_timings(self):
+        """记录各阶段耗时，便于对比并行前后的总时长"""
+        serial = sum(t['elapsed'] for t in self.timings.values())
+        detail = '，'.join(f"{name}={t['elapsed']:.2f}s" for name, t in self.timings.items())
+        logger.info(f'流水线完成，总耗时{self.elapsed:.2f}秒（串行累计{serial:.2f}秒）: {detail}')
+
+    def timing_report(self):
+        """返回耗时报告
+
+        Returns:
+            dict: 包含总耗时、串行累计耗时和各阶段耗时
+        """
+        return {
+            'total': round(self.elapsed, 3),
+            'serial': round(sum(t['elapsed'] for t in self.timings.values()), 3),
+            'stages': dict(self.timings)
+        }
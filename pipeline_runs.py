@@ -0,0 +1,277 @@
+# 解卦运行模块
+# 该文件为解卦流水线提供阶段级检查点：每个阶段完成后立即把结果保存到 pipeline_runs 表，
+# 某个阶段失败时已完成阶段的结果保留下来，之后通过 /hexagram/runs/<run_id>/resume 只执行缺少的阶段，
+# 已经完成的AI调用不必重复付费。同时统计每次成功解卦中结果被丢弃的上游调用次数。
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+import threading
+import uuid
+from sqlalchemy import update, or_, and_
+from models import db, PipelineRun
+from config import config
+from analysis import build_pipeline, save_record, STAGES
+from hexagram_store import hexagram_store
+from pipeline import StageError
+from metrics import analyses, analyses_in_flight, analysis_upstream_calls, analysis_wasted_calls
+from utils import jsoncodec
+from utils.logger import setup_logger
+from utils.stats import register_stats
+
+# 设置日志
+logger = setup_logger(__name__)
+
+
+class RunStats:
+    """解卦运行统计（按进程）"""
+
+    def __init__(self):
+        """初始化统计"""
+        self._lock = threading.Lock()
+        self._counts = defaultdict(int)
+
+    def add(self, **counts):
+        """累加计数器"""
+        with self._lock:
+            for name, amount in counts.items():
+                self._counts[name] += amount
+
+    def stats(self):
+        """返回统计信息
+
+        success_wasted_calls 为成功解卦（含之前失败的各次执行）中结果被丢弃的上游调用次数，
+        wasted_per_success 为平均每次成功解卦浪费的上游调用次数。
+        """
+        with self._lock:
+            counts = {name: self._counts.get(name, 0) for name in (
+                'started', 'resumed', 'succeeded', 'failed', 'repaired_stages', 'upstream_calls', 'success_wasted_calls')}
+        succeeded = counts['succeeded']
+        counts['wasted_per_success'] = round(counts['success_wasted_calls'] / succeeded, 4) if succeeded else 0.0
+        return counts
+
+
+# 全局运行统计
+run_stats = RunStats()
+register_stats('pipeline_runs', run_stats.stats)
+
+
+def start_run(user_id, question, hexagram_info, model, user_yongshen='', force_refresh=False, mode=None):
+    """创建解卦运行
+
+    Args:
+        user_id (int): 用户ID（未登录时为None）
+        question (str): 问题
+        hexagram_info (str): 卦象信息
+        model (str): 使用的模型
+        user_yongshen (str): 用户指定的用神
+        force_refresh (bool): 强制重新分析，不读取AI响应缓存
+        mode (str): 分析模式（staged 或 fast），为空时按模型配置确定
+
+    Returns:
+        PipelineRun: 解卦运行
+    """
+    run = PipelineRun(
+        run_id=str(uuid.uuid4()),
+        user_id=user_id,
+        question=question,
+        hexagram_id=hexagram_store.get(hexagram_info).id,
+        model=model,
+        user_yongshen=user_yongshen or None,
+        force_refresh=bool(force_refresh),
+        mode=mode or None,
+        status='running',
+        results='{}'
+    )
+    db.session.add(run)
+    db.session.commit()
+    run_stats.add(started=1)
+    return run
+
+
+def get_run(run_id):
+    """按运行ID查询解卦运行
+
+    Args:
+        run_id (str): 运行ID
+
+    Returns:
+        PipelineRun: 解卦运行，不存在时返回None
+    """
+    return PipelineRun.query.filter_by(run_id=run_id).first()
+
+
+def run_results(run):
+    """已完成阶段的结果
+
+    Args:
+        run (PipelineRun): 解卦运行
+
+    Returns:
+        dict: 阶段名称 -> 结果
+    """
+    return jsoncodec.loads(run.results) if run.results else {}
+
+
+def run_to_dict(run):
+    """将解卦运行转换为状态字典
+
+    Args:
+        run (PipelineRun): 解卦运行
+
+    Returns:
+        dict: 运行状态
+    """
+    return {
+        'run_id': run.run_id,
+        'status': run.status,
+        'stages': STAGES,
+        'stages_done': STAGES if run.status == 'done' else [name for name in STAGES if name in run_results(run)],
+        'failed_stage': run.failed_stage,
+        'error': run.error,
+        'attempts': run.attempts,
+        'upstream_calls': run.upstream_calls,
+        'wasted_calls': run.wasted_calls,
+        'record_id': run.record_id,
+        'created_at': run.created_at.strftime('%Y-%m-%d %H:%M:%S') if run.created_at else None,
+        'updated_at': run.updated_at.strftime('%Y-%m-%d %H:%M:%S') if run.updated_at else None
+    }
+
+
+def claim_run(run):
+    """将失败或已中断的运行标记为执行中，准备继续执行
+
+    通过带状态条件的UPDATE实现抢占，同一运行同时被多次继续执行时只有一个会成功。
+    running状态超过 PIPELINE_RUN_STALE_SECONDS 仍未更新的运行视为已中断。
+
+    Args:
+        run (PipelineRun): 解卦运行
+
+    Returns:
+        bool: 是否领取成功
+    """
+    deadline = datetime.utcnow() - timedelta(seconds=config.PIPELINE_RUN_STALE_SECONDS)
+    query = update(PipelineRun).where(PipelineRun.id == run.id, or_(
+        PipelineRun.status == 'failed',
+        and_(PipelineRun.status == 'running', PipelineRun.updated_at < deadline)
+    ))
+    claimed = db.session.execute(
+        query.values(status='running', attempts=PipelineRun.attempts + 1, updated_at=datetime.utcnow())
+    ).rowcount
+    db.session.commit()
+    if claimed != 1:
+        return False
+    db.session.refresh(run)
+    run_stats.add(resumed=1)
+    return True
+
+
+def build_run_pipeline(run, **kwargs):
+    """按运行保存的参数构建解卦流水线
+
+    Args:
+        run (PipelineRun): 解卦运行
+        **kwargs: 传给 build_pipeline 的其他参数（如 on_delta、cancel）
+
+    Returns:
+        StagePipeline: 解卦流水线
+    """
+    return build_pipeline(run.question, run.hexagram.content, run.model, run.user_yongshen or '',
+                          user_id=run.user_id, bypass_cache=bool(run.force_refresh), mode=run.mode, **kwargs)
+
+
+def save_stage(run, name, result):
+    """保存一个已完成阶段的结果（检查点）
+
+    Args:
+        run (PipelineRun): 解卦运行
+        name (str): 阶段名称
+        result: 阶段结果
+    """
+    results = run_results(run)
+    results[name] = result
+    run.results = jsoncodec.dumps(results)
+    db.session.commit()
+
+
+def _account(run, pipeline):
+    """将流水线本次执行的上游调用计数累加到运行上"""
+    counters = pipeline.counters
+    run.upstream_calls = (run.upstream_calls or 0) + counters.get('upstream_calls', 0)
+    run.wasted_calls = (run.wasted_calls or 0) + counters.get('wasted_calls', 0)
+    run_stats.add(upstream_calls=counters.get('upstream_calls', 0), repaired_stages=counters.get('repaired_stages', 0))
+    analysis_upstream_calls.inc(counters.get('upstream_calls', 0))
+    analysis_wasted_calls.inc(counters.get('wasted_calls', 0))
+
+
+def fail_run(run, pipeline, stage, error):
+    """记录运行失败，已保存的阶段结果保留，之后可以继续执行
+
+    Args:
+        run (PipelineRun): 解卦运行
+        pipeline (StagePipeline): 本次执行的流水线
+        stage (str): 失败的阶段，无法确定时为None
+        error (str): 失败原因
+    """
+    db.session.rollback()
+    _account(run, pipeline)
+    run.status = 'failed'
+    run.failed_stage = stage
+    run.error = str(error)
+    db.session.commit()
+    run_stats.add(failed=1)
+    analyses.inc(status='failed')
+    logger.warning(f'解卦运行 {run.run_id} 在阶段 {stage} 失败，可继续执行: {error}')
+
+
+def finish_run(run, pipeline, results):
+    """保存解卦记录并将运行标记为完成（与记录在同一事务中提交），完成后不再保留各阶段结果
+
+    Args:
+        run (PipelineRun): 解卦运行
+        pipeline (StagePipeline): 本次执行的流水线
+        results (dict): 各阶段的结果
+
+    Returns:
+        str: 记录ID
+    """
+    record_id = str(uuid.uuid4())
+    _account(run, pipeline)
+    run.status = 'done'
+    run.record_id = record_id
+    run.results = None
+    run.failed_stage = None
+    run.error = None
+    save_record(run.user_id, run.question, run.hexagram.content, run.model, results, record_id=record_id)
+    run_stats.add(succeeded=1, success_wasted_calls=run.wasted_calls)
+    analyses.inc(status='done')
+    return record_id
+
+
+def execute_run(run, on_stage_done=None, source='api'):
+    """执行（或继续执行）解卦运行：跳过已保存结果的阶段，其余阶段每完成一个立即保存
+
+    Args:
+        run (PipelineRun): 解卦运行
+        on_stage_done (callable): 阶段完成回调，参数为(阶段名称, 结果)，在保存检查点之前调用
+        source (str): 发起方（api、resume 或 job），用于统计正在进行的解卦数
+
+    Returns:
+        tuple: (记录ID, 本次执行的流水线)
+
+    Raises:
+        StageError: 阶段失败时抛出（运行已标记为失败，已完成阶段的结果已保存）
+    """
+    pipeline = build_run_pipeline(run)
+
+    def checkpoint(name, result):
+        if on_stage_done:
+            on_stage_done(name, result)
+        save_stage(run, name, result)
+
+    with analyses_in_flight.track(source=source):
+        try:
+            results = pipeline.run(results=run_results(run), on_stage_done=checkpoint)
+        except StageError as e:
+            fail_run(run, pipeline, e.stage, e.error)
+            raise
+        return finish_run(run, pipeline, results), pipeline
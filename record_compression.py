@@ -0,0 +1,189 @@
+# 解卦记录压缩存储维护模块
+# 该文件提供压缩字典训练、已有记录的分批压缩迁移和存储统计（压缩格式见 utils/compression.py）：
+# 迁移按主键分批读取原始列值，已压缩的值跳过（可重复执行、中断后继续），每批一个事务，
+# 批次之间可暂停以降低对线上数据库的影响。
+# 命令行：flask --app app train-compression-dict / compress-records / compression-stats
+
+import time
+import zlib
+from sqlalchemy import text, bindparam, func, select, cast, LargeBinary
+from models import db, HexagramRecord, CompressionDictionary
+from utils.compression import CompressedText, text_codec, zstandard, ZLIB_DICT_SIZE
+from utils.logger import setup_logger
+
+# 设置日志
+logger = setup_logger(__name__)
+
+# 压缩存储的列
+COMPRESSED_COLUMNS = ['hexagram_info', 'yongshen', 'yongshen_guli', 'dongyao_guli', 'shuzi_lianghua', 'payload']
+
+
+def train_dictionary(samples=2000, size=None):
+    """用最近的记录训练压缩字典，训练后新写入的数据使用该字典（需要在应用上下文中调用）
+
+    zstd 使用 zstandard 的字典训练；zlib 的预置字典最多使用32KB，
+    由各列的样本均匀拼接而成（JSON 键名、固定的分析用语等重复内容会出现在字典中）。
+
+    Args:
+        samples (int): 样本记录数
+        size (int): 字典大小（字节），默认 zstd 为112KB、zlib 为32KB
+
+    Returns:
+        CompressionDictionary: 保存的字典，没有记录时返回None
+    """
+    columns = [getattr(HexagramRecord, name) for name in COMPRESSED_COLUMNS]
+    rows = (db.session.query(*columns)
+            .order_by(HexagramRecord.id.desc())
+            .limit(samples)
+            .all())
+    if not rows:
+        return None
+
+    if text_codec.codec == 'zstd':
+        codec = 'zstd'
+        data = zstandard.train_dictionary(size or 112 * 1024, [value.encode('utf-8') for row in rows for value in row if value]).as_bytes()
+    else:
+        # zlib 预置字典中越靠后的内容匹配距离越近，因此每列的样本从旧到新排列
+        codec = 'zlib'
+        size = min(size or ZLIB_DICT_SIZE, ZLIB_DICT_SIZE)
+        per_column = size // len(COMPRESSED_COLUMNS)
+        parts = []
+        for index in range(len(COMPRESSED_COLUMNS)):
+            part = b''
+            for row in rows:
+                if row[index] and len(part) < per_column:
+                    part = row[index].encode('utf-8') + part
+            parts.append(part[-per_column:])
+        data = b''.join(parts)
+
+    dictionary = db.session.get(CompressionDictionary, zlib.crc32(data)) or CompressionDictionary(id=zlib.crc32(data), codec=codec, data=data)
+    db.session.add(dictionary)
+    db.session.commit()
+    text_codec.reset_active_dictionary()
+    logger.info(f'已训练压缩字典 {dictionary.id}（{codec}，{len(data)}字节，{len(rows)}条样本）')
+    return dictionary
+
+
+def prepare_columns():
+    """将 MySQL 中仍为 TEXT 的压缩列改为 MEDIUMBLOB（压缩数据是二进制），其他数据库无需修改
+
+    init-db 时执行：已有的 TEXT 列写入压缩数据会出错，升级后必须先改列类型。
+    已有的未压缩文本原样保留为字节，读取时仍兼容。
+
+    Returns:
+        list: 修改的列（表名.列名）
+    """
+    if db.engine.dialect.name != 'mysql':
+        return []
+    changes = []
+    for table in db.metadata.sorted_tables:
+        columns = [column for column in table.columns if isinstance(column.type, CompressedText)]
+        if not columns:
+            continue
+        types = dict(db.session.execute(
+            text('SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS '
+                 'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table'),
+            {'table': table.name}
+        ).all())
+        for column in columns:
+            if column.name in types and types[column.name].lower() != 'mediumblob':
+                null = 'NULL' if column.nullable else 'NOT NULL'
+                db.session.execute(text(f'ALTER TABLE {table.name} MODIFY COLUMN {column.name} MEDIUMBLOB {null}'))
+                changes.append(f'{table.name}.{column.name}')
+                logger.info(f'已将 {table.name}.{column.name} 改为 MEDIUMBLOB')
+    db.session.commit()
+    return changes
+
+
+def compress_records(batch_size=200, pause=0.0, recompress=False):
+    """压缩已有记录中尚未压缩的列值（需要在应用上下文中调用）
+
+    Args:
+        batch_size (int): 每批（每个事务）处理的记录数
+        pause (float): 每批之间暂停的秒数
+        recompress (bool): 是否重新压缩已压缩的值（更换算法或字典后使用）
+
+    Returns:
+        dict: 统计信息 {'records', 'updated', 'raw_bytes', 'stored_bytes', 'ratio', 'seconds'}
+    """
+    prepare_columns()
+    table = HexagramRecord.__tablename__
+    column_list = ', '.join(COMPRESSED_COLUMNS)
+    select_batch = text(f'SELECT id, {column_list} FROM {table} WHERE id > :last_id ORDER BY id LIMIT :limit')
+    # 直接写入压缩后的字节，不经过 CompressedText 再次压缩
+    update_batch = text(
+        f'UPDATE {table} SET ' + ', '.join(f'{name} = :{name}' for name in COMPRESSED_COLUMNS) + ' WHERE id = :pk'
+    ).bindparams(*[bindparam(name, type_=LargeBinary) for name in COMPRESSED_COLUMNS])
+
+    start = time.monotonic()
+    stats = {'records': 0, 'updated': 0, 'raw_bytes': 0, 'stored_bytes': 0}
+    last_id = 0
+    while True:
+        rows = db.session.execute(select_batch, {'last_id': last_id, 'limit': batch_size}).all()
+        if not rows:
+            break
+        updates = []
+        for row in rows:
+            values = {'pk': row.id}
+            changed = False
+            for name in COMPRESSED_COLUMNS:
+                stored = getattr(row, name)
+                if stored is None:
+                    values[name] = None
+                    continue
+                if text_codec.is_compressed(stored) and not recompress:
+                    values[name] = bytes(stored)
+                    continue
+                content = text_codec.decompress(stored)
+                values[name] = text_codec.compress(content)
+                stats['raw_bytes'] += len(content.encode('utf-8'))
+                stats['stored_bytes'] += len(values[name])
+                changed = True
+            if changed:
+                updates.append(values)
+        if updates:
+            db.session.execute(update_batch, updates)
+        db.session.commit()
+        stats['records'] += len(rows)
+        stats['updated'] += len(updates)
+        last_id = rows[-1].id
+        if pause:
+            time.sleep(pause)
+
+    stats['ratio'] = round(stats['raw_bytes'] / stats['stored_bytes'], 2) if stats['stored_bytes'] else 0.0
+    stats['seconds'] = round(time.monotonic() - start, 2)
+    logger.info(f"压缩完成: 检查{stats['records']}条记录，压缩{stats['updated']}条，"
+                f"{stats['raw_bytes']}字节 -> {stats['stored_bytes']}字节（{stats['ratio']}倍）")
+    return stats
+
+
+def compression_stats(sample=1000):
+    """统计压缩列的存储大小，并用最近的记录估算压缩率（需要在应用上下文中调用）
+
+    Args:
+        sample (int): 估算压缩率时解压的记录数
+
+    Returns:
+        dict: {'records', 'stored_bytes', 'sample_raw_bytes', 'sample_stored_bytes', 'ratio'}
+    """
+    table = HexagramRecord.__table__
+    sizes = db.session.execute(select(
+        func.count(),
+        *[func.coalesce(func.sum(func.length(cast(table.c[name], LargeBinary))), 0) for name in COMPRESSED_COLUMNS]
+    )).one()
+
+    raw_bytes = stored_bytes = 0
+    rows = db.session.execute(select(*[cast(table.c[name], LargeBinary) for name in COMPRESSED_COLUMNS])
+                              .order_by(table.c.id.desc()).limit(sample)).all()
+    for row in rows:
+        for value in row:
+            if value is not None:
+                raw_bytes += len(text_codec.decompress(value).encode('utf-8'))
+                stored_bytes += len(value)
+    return {
+        'records': sizes[0],
+        'stored_bytes': dict(zip(COMPRESSED_COLUMNS, sizes[1:])),
+        'sample_raw_bytes': raw_bytes,
+        'sample_stored_bytes': stored_bytes,
+        'ratio': round(raw_bytes / stored_bytes, 2) if stored_bytes else 0.0
+    }
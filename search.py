@@ -0,0 +1,275 @@
+# 历史记录全文搜索模块
+# 该文件为解卦记录的问题、用神和综合解读建立倒排索引：
+# SQLite 使用 FTS5 虚拟表（写入前将中文切分为二元词组），MySQL 使用 ngram 分词的 FULLTEXT 索引，
+# 记录插入和删除时通过 ORM 事件同步索引
+
+import re
+from sqlalchemy import event, inspect, text
+from models import db, HexagramRecord
+from config import config
+from utils.logger import setup_logger
+
+# 设置日志
+logger = setup_logger(__name__)
+
+# SQLite FTS5 虚拟表名
+FTS_TABLE = 'hexagram_search'
+
+# MySQL FULLTEXT 索引名
+FULLTEXT_INDEX = 'ft_hexagram_records_search'
+
+# 各列的相关度权重（问题 > 用神 > 综合解读）
+WEIGHTS = {'question': 5.0, 'yongshen_text': 3.0, 'zonghe_jiedu': 1.0}
+
+# 中日韩文字连续片段 / 字母数字单词
+_CJK_RE = re.compile(r'[㐀-鿿豈-﫿]+')
+_WORD_RE = re.compile(r'[㐀-鿿豈-﫿]+|[0-9A-Za-z]+')
+
+
+def tokenize(content):
+    """将文本切分为索引词元
+
+    中文片段切分为相邻两字的二元词组，并附加片段最后一个字，
+    这样任意单字都是某个词元的开头，单字查询可以用前缀匹配；
+    字母数字按单词切分并转为小写。
+
+    Args:
+        content (str): 文本
+
+    Returns:
+        list: 词元列表
+    """
+    tokens = []
+    for word in _WORD_RE.findall(content or ''):
+        if _CJK_RE.fullmatch(word):
+            tokens.extend(word[i:i + 2] for i in range(len(word) - 1))
+            tokens.append(word[-1])
+        else:
+            tokens.append(word.lower())
+    return tokens
+
+
+def _fts_query(query, user_id):
+    """将用户输入转换为 FTS5 查询表达式
+
+    以空白分隔的每个关键词都必须出现；中文关键词转换为二元词组短语，单字使用前缀匹配。
+
+    Returns:
+        str: FTS5 MATCH 表达式，没有有效关键词时返回None
+    """
+    terms = []
+    for word in _WORD_RE.findall(query):
+        if _CJK_RE.fullmatch(word) and len(word) == 1:
+            terms.append(f'"{word}"*')
+        elif _CJK_RE.fullmatch(word):
+            terms.append('"' + ' '.join(word[i:i + 2] for i in range(len(word) - 1)) + '"')
+        else:
+            terms.append(f'"{word.lower()}"*')
+    if not terms:
+        return None
+    # 用户ID作为独立列参与匹配，由倒排索引直接限定在该用户的记录内
+    return f'owner : "u{int(user_id)}" AND ' + ' AND '.join(f'{{question yongshen_text zonghe_jiedu}} : {term}' for term in terms)
+
+
+def _fts_row(record):
+    """生成 FTS5 表的一行数据"""
+    return {
+        'rowid': record.id,
+        'owner': f'u{record.user_id}',
+        'question': ' '.join(tokenize(record.question)),
+        'yongshen_text': ' '.join(tokenize(record.yongshen_text)),
+        'zonghe_jiedu': ' '.join(tokenize(record.zonghe_jiedu))
+    }
+
+
+def _dialect():
+    """当前数据库方言名称"""
+    return db.engine.dialect.name
+
+
+def init_search():
+    """创建搜索索引（已存在时跳过），新建的 FTS5 表会为已有记录建立索引
+
+    需要在应用上下文中调用。
+    """
+    dialect = _dialect()
+    if dialect == 'sqlite':
+        if FTS_TABLE in inspect(db.engine).get_table_names():
+            return
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                f'CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5('
+                f'owner, question, yongshen_text, zonghe_jiedu, tokenize="unicode61")'
+            ))
+        rebuild_search_index()
+    elif dialect == 'mysql':
+        indexes = {index['name'] for index in inspect(db.engine).get_indexes(HexagramRecord.__tablename__)}
+        if FULLTEXT_INDEX in indexes:
+            return
+        # ngram 解析器按 ngram_token_size（默认2）切分中文，索引由MySQL随表数据自动维护
+        with db.engine.begin() as conn:
+            conn.execute(text(
+                f'ALTER TABLE {HexagramRecord.__tablename__} ADD FULLTEXT INDEX {FULLTEXT_INDEX} '
+                f'(question, yongshen_text, zonghe_jiedu) WITH PARSER ngram'
+            ))
+        logger.info('已创建历史记录全文索引')
+    else:
+        logger.warning(f'数据库 {dialect} 不支持全文索引，历史记录搜索将使用LIKE查询')
+
+
+def rebuild_search_index(batch_size=500):
+    """重建 SQLite FTS5 索引
+
+    Args:
+        batch_size (int): 每批处理的记录数
+
+    Returns:
+        int: 建立索引的记录数
+    """
+    if _dialect() != 'sqlite':
+        return 0
+    db.session.execute(text(f'DELETE FROM {FTS_TABLE}'))
+    count = 0
+    last_id = 0
+    while True:
+        records = (db.session.query(HexagramRecord.id, HexagramRecord.user_id, HexagramRecord.question,
+                                    HexagramRecord.yongshen_text, HexagramRecord.zonghe_jiedu)
+                   .filter(HexagramRecord.id > last_id)
+                   .order_by(HexagramRecord.id)
+                   .limit(batch_size)
+                   .all())
+        if not records:
+            break
+        db.session.execute(
+            text(f'INSERT INTO {FTS_TABLE} (rowid, owner, question, yongshen_text, zonghe_jiedu) '
+                 f'VALUES (:rowid, :owner, :question, :yongshen_text, :zonghe_jiedu)'),
+            [_fts_row(record) for record in records]
+        )
+        count += len(records)
+        last_id = records[-1].id
+    db.session.commit()
+    logger.info(f'已为{count}条解卦记录建立全文索引')
+    return count
+
+
+def index_records(records):
+    """为批量写入（不经过ORM事件）的记录建立 FTS5 索引，与写入在同一事务中
+
+    Args:
+        records (list): 带有 id、user_id、question、yongshen_text、zonghe_jiedu 属性的记录
+    """
+    if _dialect() != 'sqlite' or not records:
+        return
+    db.session.execute(
+        text(f'INSERT INTO {FTS_TABLE} (rowid, owner, question, yongshen_text, zonghe_jiedu) '
+             f'VALUES (:rowid, :owner, :question, :yongshen_text, :zonghe_jiedu)'),
+        [_fts_row(record) for record in records]
+    )
+
+
+@event.listens_for(HexagramRecord, 'after_insert')
+def _index_record(mapper, connection, target):
+    """记录插入时写入 FTS5 索引（与记录在同一事务中）"""
+    if connection.dialect.name == 'sqlite':
+        connection.execute(
+            text(f'INSERT INTO {FTS_TABLE} (rowid, owner, question, yongshen_text, zonghe_jiedu) '
+                 f'VALUES (:rowid, :owner, :question, :yongshen_text, :zonghe_jiedu)'),
+            _fts_row(target)
+        )
+
+
+@event.listens_for(HexagramRecord, 'after_delete')
+def _unindex_record(mapper, connection, target):
+    """记录删除时从 FTS5 索引中移除"""
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :rowid'), {'rowid': target.id})
+
+
+def _snippet(content, query, width=60):
+    """截取关键词附近的文本作为摘要"""
+    content = content or ''
+    positions = [content.find(word) for word in _WORD_RE.findall(query)]
+    positions = [pos for pos in positions if pos >= 0]
+    start = max(min(positions) - width // 3, 0) if positions else 0
+    snippet = content[start:start + width]
+    return ('…' if start > 0 else '') + snippet + ('…' if start + width < len(content) else '')
+
+
+def search_records(user_id, query, page=1, limit=None):
+    """按相关度搜索用户的解卦记录
+
+    Args:
+        user_id (int): 用户ID
+        query (str): 搜索关键词，以空白分隔的多个关键词需同时出现
+        page (int): 页码，从1开始
+        limit (int): 每页记录数
+
+    Returns:
+        tuple: (记录字典列表, 是否还有下一页)
+    """
+    limit = min(max(int(limit or config.HISTORY_PAGE_SIZE), 1), config.HISTORY_PAGE_MAX)
+    page = max(int(page or 1), 1)
+    offset = (page - 1) * limit
+    dialect = _dialect()
+
+    if dialect == 'sqlite':
+        match = _fts_query(query, user_id)
+        if match is None:
+            return [], False
+        weights = ', '.join(str(weight) for weight in (0.0, WEIGHTS['question'], WEIGHTS['yongshen_text'], WEIGHTS['zonghe_jiedu']))
+        ids = [row[0] for row in db.session.execute(
+            text(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match '
+                 f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT :limit OFFSET :offset'),
+            {'match': match, 'limit': limit + 1, 'offset': offset}
+        )]
+    elif dialect == 'mysql':
+        words = _WORD_RE.findall(query)
+        if not words:
+            return [], False
+        against = ' '.join(f'+"{word}"' for word in words)
+        ids = [row[0] for row in db.session.execute(
+            text(f'SELECT id FROM {HexagramRecord.__tablename__} '
+                 f'WHERE user_id = :user_id AND MATCH(question, yongshen_text, zonghe_jiedu) AGAINST(:against IN BOOLEAN MODE) '
+                 f'ORDER BY MATCH(question, yongshen_text, zonghe_jiedu) AGAINST(:against IN BOOLEAN MODE) DESC, id DESC '
+                 f'LIMIT :limit OFFSET :offset'),
+            {'user_id': user_id, 'against': against, 'limit': limit + 1, 'offset': offset}
+        )]
+    else:
+        words = _WORD_RE.findall(query)
+        if not words:
+            return [], False
+        conditions = [db.or_(HexagramRecord.question.contains(word),
+                             HexagramRecord.yongshen_text.contains(word),
+                             HexagramRecord.zonghe_jiedu.contains(word)) for word in words]
+        ids = [row[0] for row in (db.session.query(HexagramRecord.id)
+                                  .filter(HexagramRecord.user_id == user_id, *conditions)
+                                  .order_by(HexagramRecord.timestamp.desc(), HexagramRecord.id.desc())
+                                  .limit(limit + 1).offset(offset))]
+
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    if not ids:
+        return [], False
+
+    rows = {row.id: row for row in db.session.query(
+        HexagramRecord.id, HexagramRecord.record_id, HexagramRecord.question, HexagramRecord.model,
+        HexagramRecord.timestamp, HexagramRecord.yongshen_text, HexagramRecord.yongshen_zhishu,
+        HexagramRecord.zonghe_jiedu
+    ).filter(HexagramRecord.id.in_(ids), HexagramRecord.user_id == user_id)}
+
+    results = []
+    for id in ids:
+        row = rows.get(id)
+        if row is None:
+            continue
+        results.append({
+            'id': row.id,
+            'record_id': row.record_id,
+            'question': row.question,
+            'model': row.model,
+            'timestamp': row.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            'yongshen': {'text': row.yongshen_text or ''},
+            'yongshen_zhishu': row.yongshen_zhishu,
+            'snippet': _snippet(row.zonghe_jiedu, query)
+        })
+    return results, has_more
@@ -1,3 +1,143 @@
+# 易清岚数字量化模块
+# 月建、日辰映射表在导入时编译为按地支序号索引的数组（下标为 行地支序号 × 12 + 目标地支序号），
+# 单个地支、批量地支和完整强弱立方体的查询都只做数组下标运算
+
+from array import array
+
+# 地支顺序
+DIZHI_LIST = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
+
+# 月建数字量化映射表
+YUEJIAN_MAPPING = {
+    "子": {
+        "子": 2.0, "丑": 0.5, "寅": 1.0, "卯": 1.0, "辰": -0.1, "巳": -1.0,
+        "午": -2.0, "未": -0.1, "申": -0.1, "酉": -0.1, "戌": -0.1, "亥": 1.0
+    },
+    "丑": {
+        "子": -0.5, "丑": 2.0, "寅": -0.1, "卯": -0.1, "辰": 1.0, "巳": -0.1,
+        "午": -0.1, "未": -2.0, "申": 1.0, "酉": 1.0, "戌": 1.0, "亥": -1.0
+    },
+    "寅": {
+        "子": -0.1, "丑": -1.0, "寅": 2.0, "卯": 1.0, "辰": -1.0, "巳": 1.0,
+        "午": 1.0, "未": -1.0, "申": -2.0, "酉": -0.1, "戌": -1.0, "亥": 0.5
+    },
+    "卯": {
+        "子": -0.1, "丑": -1.0, "寅": 1.0, "卯": 2.0, "辰": -1.0, "巳": 1.0,
+        "午": 1.0, "未": -1.0, "申": -0.1, "酉": -2.0, "戌": -0.1, "亥": -0.1
+    },
+    "辰": {
+        "子": -1.0, "丑": 1.0, "寅": 0.5, "卯": 0.5, "辰": 2.0, "巳": -0.1,
+        "午": -0.1, "未": 1.0, "申": 1.0, "酉": 2.0, "戌": -2.0, "亥": -1.0
+    },
+    "巳": {
+        "子": -0.1, "丑": 1.0, "寅": -0.1, "卯": -0.1, "辰": 1.0, "巳": 2.0,
+        "午": 1.0, "未": 1.0, "申": -0.5, "酉": -1.0, "戌": 1.0, "亥": -2.0
+    },
+    "午": {
+        "子": -2.0, "丑": 1.0, "寅": -0.1, "卯": -0.1, "辰": 1.0, "巳": 1.0,
+        "午": 2.0, "未": 2.0, "申": -1.0, "酉": -1.0, "戌": 1.0, "亥": -0.1
+    },
+    "未": {
+        "子": -1.0, "丑": -2.0, "寅": -0.1, "卯": -0.1, "辰": 1.0, "巳": 0.5,
+        "午": 0.5, "未": 2.0, "申": 1.0, "酉": 1.0, "戌": 1.0, "亥": 1.0
+    },
+    "申": {
+        "子": 1.0, "丑": -0.1, "寅": -2.0, "卯": -1.0, "辰": -0.1, "巳": 0.5,
+        "午": -0.1, "未": -0.1, "申": 2.0, "酉": 1.0, "戌": -0.1, "亥": 1.0
+    },
+    "酉": {
+        "子": 1.0, "丑": -0.1, "寅": -1.0, "卯": -2.0, "辰": 0.5, "巳": -0.1,
+        "午": -0.1, "未": -0.1, "申": 1.0, "酉": 2.0, "戌": -0.1, "亥": 1.0
+    },
+    "戌": {
+        "子": -1.0, "丑": 1.0, "寅": -0.1, "卯": 0.5, "辰": -2.0, "巳": -0.1,
+        "午": -0.1, "未": 1.0, "申": 1.0, "酉": 1.0, "戌": 2.0, "亥": -1.0
+    },
+    "亥": {
+        "子": 1.0, "丑": -0.1, "寅": 2.0, "卯": 1.0, "辰": -0.1, "巳": -2.0,
+        "午": -1.0, "未": -0.1, "申": -0.1, "酉": -0.1, "戌": -0.1, "亥": 2.0
+    }
+}
+
+# 日辰数字量化映射表（与月建相同的逻辑）
+RICHEN_MAPPING = {
+    "子": {
+        "子": 2.0, "丑": 0.0, "寅": 1.0, "卯": 1.0, "辰": 0.0, "巳": -1.0,
+        "午": -2.0, "未": 0.0, "申": 0.0, "酉": 0.0, "戌": 0.0, "亥": 1.0
+    },
+    "丑": {
+        "子": -1.0, "丑": 2.0, "寅": 0.0, "卯": 0.0, "辰": 1.0, "巳": 0.0,
+        "午": 0.0, "未": -2.0, "申": 1.0, "酉": 1.0, "戌": 1.0, "亥": -0.1
+    },
+    "寅": {
+        "子": 0.0, "丑": -1.0, "寅": 2.0, "卯": 1.0, "辰": -1.0, "巳": 1.0,
+        "午": 1.0, "未": -1.0, "申": -2.0, "酉": 0.0, "戌": -1.0, "亥": 0.0
+    },
+    "卯": {
+        "子": 0.0, "丑": -1.0, "寅": 1.0, "卯": 2.0, "辰": -1.0, "巳": 1.0,
+        "午": 1.0, "未": -1.0, "申": 0.0, "酉": -2.0, "戌": -1.0, "亥": 0.0
+    },
+    "辰": {
+        "子": -1.0, "丑": 1.0, "寅": 0.0, "卯": 0.0, "辰": 2.0, "巳": 0.0,
+        "午": 0.0, "未": 1.0, "申": 1.0, "酉": 2.0, "戌": -2.0, "亥": -1.0
+    },
+    "巳": {
+        "子": 0.0, "丑": 1.0, "寅": 0.0, "卯": 0.0, "辰": 1.0, "巳": 2.0,
+        "午": 1.0, "未": 1.0, "申": -1.0, "酉": -1.0, "戌": 1.0, "亥": -2.0
+    },
+    "午": {
+        "子": -2.0, "丑": 1.0, "寅": 0.0, "卯": 0.0, "辰": 1.0, "巳": 1.0,
+        "午": 2.0, "未": 2.0, "申": -1.0, "酉": -1.0, "戌": 1.0, "亥": 0.0
+    },
+    "未": {
+        "子": -1.0, "丑": -2.0, "寅": 0.0, "卯": 0.0, "辰": 1.0, "巳": 0.0,
+        "午": 0.0, "未": 2.0, "申": 1.0, "酉": 1.0, "戌": 1.0, "亥": -1.0
+    },
+    "申": {
+        "子": 1.0, "丑": 0.0, "寅": -2.0, "卯": -1.0, "辰": 0.0, "巳": 0.0,
+        "午": 0.0, "未": 0.0, "申": 2.0, "酉": 1.0, "戌": 0.0, "亥": 1.0
+    },
+    "酉": {
+        "子": 1.0, "丑": 0.0, "寅": -1.0, "卯": -2.0, "辰": 0.0, "巳": 0.0,
+        "午": 0.0, "未": 0.0, "申": 1.0, "酉": 2.0, "戌": 0.0, "亥": 1.0
+    },
+    "戌": {
+        "子": -1.0, "丑": 1.0, "寅": 0.0, "卯": 0.0, "辰": -2.0, "巳": 0.0,
+        "午": 0.0, "未": 1.0, "申": 1.0, "酉": 1.0, "戌": 2.0, "亥": -1.0
+    },
+    "亥": {
+        "子": 1.0, "丑": 0.0, "寅": 2.0, "卯": 1.0, "辰": 0.0, "巳": -2.0,
+        "午": -1.0, "未": -0.0, "申": 0.0, "酉": 0.0, "戌": 0.0, "亥": 2.0
+    }
+}
+
+
+# 地支 -> 序号
+DIZHI_INDEX = {dizhi: i for i, dizhi in enumerate(DIZHI_LIST)}
+
+
+def _compile_table(mapping):
+    """将 {行地支: {目标地支: 数值}} 映射表编译为长度144的数组"""
+    return array('d', (mapping[row][col] for row in DIZHI_LIST for col in DIZHI_LIST))
+
+
+# 编译后的月建表、日辰表
+YUEJIAN_TABLE = _compile_table(YUEJIAN_MAPPING)
+RICHEN_TABLE = _compile_table(RICHEN_MAPPING)
+
+# 强弱立方体：下标 (月建序号 × 12 + 日辰序号) × 12 + 地支序号，值为月建数 + 日辰数
+STRENGTH_CUBE = array('d', (YUEJIAN_TABLE[y * 12 + d] + RICHEN_TABLE[r * 12 + d]
+                            for y in range(12) for r in range(12) for d in range(12)))
+
+
+def _index(dizhi, label):
+    """取地支序号，无效时抛出ValueError"""
+    try:
+        return DIZHI_INDEX[dizhi]
+    except (KeyError, TypeError):
+        raise ValueError(f"无效的{label}地支: {dizhi}")
+
+
 def shuzilianghua(yuejian, richen, dizhi):
     """
     易清岚数字量化
@@ -11,133 +151,46 @@ def shuzilianghua(yuejian, richen, dizhi):
     Returns:
         tuple: (yuejianshu, richenshu) 月建数和日辰数
     """
-    dizhi_list = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
-
-    # 月建数字量化映射表
-    yuejian_mapping = {
-        "子": {
-            "子": 2.0, "丑": 0.5, "寅": 1.0, "卯": 1.0, "辰": -0.1, "巳": -1.0,
-            "午": -2.0, "未": -0.1, "申": -0.1, "酉": -0.1, "戌": -0.1, "亥": 1.0
-        },
-        "丑": {
-            "子": -0.5, "丑": 2.0, "寅": -0.1, "卯": -0.1, "辰": 1.0, "巳": -0.1,
-            "午": -0.1, "未": -2.0, "申": 1.0, "酉": 1.0, "戌": 1.0, "亥": -1.0
-        },
-        "寅": {
-            "子": -0.1, "丑": -1.0, "寅": 2.0, "卯": 1.0, "辰": -1.0, "巳": 1.0,
-            "午": 1.0, "未": -1.0, "申": -2.0, "酉": -0.1, "戌": -1.0, "亥": 0.5
-        },
-        "卯": {
-            "子": -0.1, "丑": -1.0, "寅": 1.0, "卯": 2.0, "辰": -1.0, "巳": 1.0,
-            "午": 1.0, "未": -1.0, "申": -0.1, "酉": -2.0, "戌": -0.1, "亥": -0.1
-        },
-        "辰": {
-            "子": -1.0, "丑": 1.0, "寅": 0.5, "卯": 0.5, "辰": 2.0, "巳": -0.1,
-            "午": -0.1, "未": 1.0, "申": 1.0, "酉": 2.0, "戌": -2.0, "亥": -1.0
-        },
-        "巳": {
-            "子": -0.1, "丑": 1.0, "寅": -0.1, "卯": -0.1, "辰": 1.0, "巳": 2.0,
-            "午": 1.0, "未": 1.0, "申": -0.5, "酉": -1.0, "戌": 1.0, "亥": -2.0
-        },
-        "午": {
-            "子": -2.0, "丑": 1.0, "寅": -0.1, "卯": -0.1, "辰": 1.0, "巳": 1.0,
-            "午": 2.0, "未": 2.0, "申": -1.0, "酉": -1.0, "戌": 1.0, "亥": -0.1
-        },
-        "未": {
-            "子": -1.0, "丑": -2.0, "寅": -0.1, "卯": -0.1, "辰": 1.0, "巳": 0.5,
-            "午": 0.5, "未": 2.0, "申": 1.0, "酉": 1.0, "戌": 1.0, "亥": 1.0
-        },
-        "申": {
-            "子": 1.0, "丑": -0.1, "寅": -2.0, "卯": -1.0, "辰": -0.1, "巳": 0.5,
-            "午": -0.1, "未": -0.1, "申": 2.0, "酉": 1.0, "戌": -0.1, "亥": 1.0
-        },
-        "酉": {
-            "子": 1.0, "丑": -0.1, "寅": -1.0, "卯": -2.0, "辰": 0.5, "巳": -0.1,
-            "午": -0.1, "未": -0.1, "申": 1.0, "酉": 2.0, "戌": -0.1, "亥": 1.0
-        },
-        "戌": {
-            "子": -1.0, "丑": 1.0, "寅": -0.1, "卯": 0.5, "辰": -2.0, "巳": -0.1,
-            "午": -0.1, "未": 1.0, "申": 1.0, "酉": 1.0, "戌": 2.0, "亥": -1.0
-        },
-        "亥": {
-            "子": 1.0, "丑": -0.1, "寅": 2.0, "卯": 1.0, "辰": -0.1, "巳": -2.0,
-            "午": -1.0, "未": -0.1, "申": -0.1, "酉": -0.1, "戌": -0.1, "亥": 2.0
-        }
-    }
-
-    # 日辰数字量化映射表（与月建相同的逻辑）
-    richen_mapping = {
-        "子": {
-            "子": 2.0, "丑": 0.0, "寅": 1.0, "卯": 1.0, "辰": 0.0, "巳": -1.0,
-            "午": -2.0, "未": 0.0, "申": 0.0, "酉": 0.0, "戌": 0.0, "亥": 1.0
-        },
-        "丑": {
-            "子": -1.0, "丑": 2.0, "寅": 0.0, "卯": 0.0, "辰": 1.0, "巳": 0.0,
-            "午": 0.0, "未": -2.0, "申": 1.0, "酉": 1.0, "戌": 1.0, "亥": -0.1
-        },
-        "寅": {
-            "子": 0.0, "丑": -1.0, "寅": 2.0, "卯": 1.0, "辰": -1.0, "巳": 1.0,
-            "午": 1.0, "未": -1.0, "申": -2.0, "酉": 0.0, "戌": -1.0, "亥": 0.0
-        },
-        "卯": {
-            "子": 0.0, "丑": -1.0, "寅": 1.0, "卯": 2.0, "辰": -1.0, "巳": 1.0,
-            "午": 1.0, "未": -1.0, "申": 0.0, "酉": -2.0, "戌": -1.0, "亥": 0.0
-        },
-        "辰": {
-            "子": -1.0, "丑": 1.0, "寅": 0.0, "卯": 0.0, "辰": 2.0, "巳": 0.0,
-            "午": 0.0, "未": 1.0, "申": 1.0, "酉": 2.0, "戌": -2.0, "亥": -1.0
-        },
-        "巳": {
-            "子": 0.0, "丑": 1.0, "寅": 0.0, "卯": 0.0, "辰": 1.0, "巳": 2.0,
-            "午": 1.0, "未": 1.0, "申": -1.0, "酉": -1.0, "戌": 1.0, "亥": -2.0
-        },
-        "午": {
-            "子": -2.0, "丑": 1.0, "寅": 0.0, "卯": 0.0, "辰": 1.0, "巳": 1.0,
-            "午": 2.0, "未": 2.0, "申": -1.0, "酉": -1.0, "戌": 1.0, "亥": 0.0
-        },
-        "未": {
-            "子": -1.0, "丑": -2.0, "寅": 0.0, "卯": 0.0, "辰": 1.0, "巳": 0.0,
-            "午": 0.0, "未": 2.0, "申": 1.0, "酉": 1.0, "戌": 1.0, "亥": -1.0
-        },
-        "申": {
-            "子": 1.0, "丑": 0.0, "寅": -2.0, "卯": -1.0, "辰": 0.0, "巳": 0.0,
-            "午": 0.0, "未": 0.0, "申": 2.0, "酉": 1.0, "戌": 0.0, "亥": 1.0
-        },
-        "酉": {
-            "子": 1.0, "丑": 0.0, "寅": -1.0, "卯": -2.0, "辰": 0.0, "巳": 0.0,
-            "午": 0.0, "未": 0.0, "申": 1.0, "酉": 2.0, "戌": 0.0, "亥": 1.0
-        },
-        "戌": {
-            "子": -1.0, "丑": 1.0, "寅": 0.0, "卯": 0.0, "辰": -2.0, "巳": 0.0,
-            "午": 0.0, "未": 1.0, "申": 1.0, "酉": 1.0, "戌": 2.0, "亥": -1.0
-        },
-        "亥": {
-            "子": 1.0, "丑": 0.0, "寅": 2.0, "卯": 1.0, "辰": 0.0, "巳": -2.0,
-            "午": -1.0, "未": -0.0, "申": 0.0, "酉": 0.0, "戌": 0.0, "亥": 2.0
-        }
-    }
-
-    # 初始化返回值
-    yuejianshu = 0
-    richenshu = 0
+    y = _index(yuejian, '月建')
+    r = _index(richen, '日辰')
+    d = _index(dizhi, '目标')
+    return YUEJIAN_TABLE[y * 12 + d], RICHEN_TABLE[r * 12 + d]
 
-    # 验证输入参数是否有效
-    if yuejian not in dizhi_list:
-        raise ValueError(f"无效的月建地支: {yuejian}")
-    if richen not in dizhi_list:
-        raise ValueError(f"无效的日辰地支: {richen}")
-    if dizhi not in dizhi_list:
-        raise ValueError(f"无效的目标地支: {dizhi}")
 
-    # 根据月建和地支查找对应的数值
-    if yuejian in yuejian_mapping and dizhi in yuejian_mapping[yuejian]:
-        yuejianshu = yuejian_mapping[yuejian][dizhi]
+def shuzilianghua_batch(yuejian, richen, dizhis):
+    """
+    批量数字量化
+    在同一月建、日辰下计算多个地支的数值（如用神和全部动爻）
+    
+    Args:
+        yuejian (str): 月建地支
+        richen (str): 日辰地支
+        dizhis (list): 目标地支列表
+        
+    Returns:
+        list: 与 dizhis 一一对应的 (yuejianshu, richenshu) 列表
+    """
+    y = _index(yuejian, '月建') * 12
+    r = _index(richen, '日辰') * 12
+    index = DIZHI_INDEX
+    try:
+        return [(YUEJIAN_TABLE[y + index[d]], RICHEN_TABLE[r + index[d]]) for d in dizhis]
+    except (KeyError, TypeError):
+        # 定位第一个无效地支，给出与单个查询一致的错误信息
+        for d in dizhis:
+            _index(d, '目标')
+        raise
 
-    # 根据日辰和地支查找对应的数值
-    if richen in richen_mapping and dizhi in richen_mapping[richen]:
-        richenshu = richen_mapping[richen][dizhi]
 
-    return yuejianshu, richenshu
+def strength_cube():
+    """
+    完整强弱立方体
+    
+    Returns:
+        list: cube[月建序号][日辰序号][地支序号] = 月建数 + 日辰数，序号按 DIZHI_LIST 排列
+    """
+    return [[list(STRENGTH_CUBE[(y * 12 + r) * 12:(y * 12 + r + 1) * 12]) for r in range(12)]
+            for y in range(12)]
 
 
 if __name__ == "__main__":
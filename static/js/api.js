@@ -35,6 +35,58 @@ const api = {
         }
     },
     
+    // 流式请求（Server-Sent Events），每收到一个事件调用一次 onEvent(事件名称, 数据)
+    async stream(endpoint, data, onEvent, signal = null) {
+        const url = `${this.baseUrl}${endpoint}`;
+        
+        const response = await fetch(url, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify(data),
+            signal
+        });
+        
+        if (!response.ok) {
+            const result = await response.json().catch(() => ({}));
+            throw new Error(result.error || `请求失败: ${response.status}`);
+        }
+        
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) {
+                break;
+            }
+            buffer += decoder.decode(value, { stream: true });
+            
+            // 按空行切分事件
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) >= 0) {
+                const block = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                const dataLines = [];
+                for (const line of block.split('\n')) {
+                    if (line.startsWith('event:')) {
+                        event = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        dataLines.push(line.slice(5).trim());
+                    }
+                }
+                if (dataLines.length) {
+                    onEvent(event, JSON.parse(dataLines.join('\n')));
+                }
+            }
+        }
+    },
+    
     // GET请求
     async get(endpoint, headers = {}) {
         return this.request(endpoint, 'GET', null, headers);
@@ -60,14 +112,71 @@ const api = {
         return this.post('/analyze', data);
     },
     
+    // 六爻分析（流式输出各阶段结果和综合解读）
+    async analyzeStream(data, onEvent, signal = null) {
+        return this.stream('/analyze/stream', data, onEvent, signal);
+    },
+    
+    // 六爻分析（异步任务模式，立即返回任务ID）
+    async analyzeAsync(data) {
+        return this.post('/analyze?async=1', data);
+    },
+    
+    // 查询异步解卦任务状态
+    async getJob(jobId) {
+        return this.get(`/jobs/${jobId}`);
+    },
+    
+    // 查询解卦运行状态（已完成的阶段、失败原因）
+    async getRun(runId) {
+        return this.get(`/runs/${runId}`);
+    },
+    
+    // 从失败的阶段继续解卦（已完成的阶段不再重新分析）
+    async resumeRun(runId) {
+        return this.post(`/runs/${runId}/resume`);
+    },
+    
+    // 等待异步解卦任务完成
+    async waitForJob(jobId, onProgress = null, interval = 2000) {
+        while (true) {
+            const { job } = await this.getJob(jobId);
+            if (onProgress) {
+                onProgress(job);
+            }
+            if (job.status === 'done') {
+                return job;
+            }
+            if (job.status === 'failed') {
+                throw new Error(job.error || '分析失败');
+            }
+            await new Promise(resolve => setTimeout(resolve, interval));
+        }
+    },
+    
     // 聊天功能
     async chat(data) {
         return this.post('/chat', data);
     },
     
-    // 获取历史记录
-    async getHistory() {
-        return this.get('/history');
+    // 聊天功能（流式输出）
+    async chatStream(data, onEvent, signal = null) {
+        return this.stream('/chat/stream', data, onEvent, signal);
+    },
+    
+    // 获取历史记录（游标分页，cursor为上一页返回的next_cursor）
+    async getHistory(cursor = '', limit = 20) {
+        const params = new URLSearchParams({ limit });
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        return this.get(`/history?${params}`);
+    },
+    
+    // 全文搜索历史记录（按相关度排序，page从1开始）
+    async searchHistory(query, page = 1, limit = 20) {
+        const params = new URLSearchParams({ q: query, page, limit });
+        return this.get(`/history/search?${params}`);
     },
     
     // 删除历史记录
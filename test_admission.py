@@ -0,0 +1,78 @@
+# 测试AI调用准入控制
+import io
+import threading
+import time
+import pytest
+import requests
+from admission import UpstreamLimiter, UpstreamBusyError, TokenBucket, backoff_delay, send_with_retry
+
+
+def test_concurrency_cap_and_full_queue():
+    """测试并发上限生效，排队已满时立即拒绝"""
+    limiter = UpstreamLimiter('test', max_concurrency=1, rate=100, burst=100, max_queue=1)
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        with limiter.slot():
+            entered.set()
+            release.wait(2)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    entered.wait(1)
+
+    # 第二个请求排队等待，第三个请求因队列已满被拒绝
+    waiter = threading.Thread(target=lambda: limiter.slot(timeout=2).__enter__())
+    waiter.start()
+    time.sleep(0.1)
+    with pytest.raises(UpstreamBusyError):
+        with limiter.slot(timeout=2):
+            pass
+
+    release.set()
+    holder.join()
+    waiter.join()
+    assert limiter.stats()['rejected'] == 1
+
+
+def test_wait_timeout_rejects():
+    """测试排队超时时拒绝请求，并释放排队名额"""
+    limiter = UpstreamLimiter('test', max_concurrency=1, rate=100, burst=100, max_queue=5)
+    with limiter.slot():
+        with pytest.raises(UpstreamBusyError):
+            with limiter.slot(timeout=0.1):
+                pass
+    assert limiter.stats()['waiting'] == 0
+    assert limiter.stats()['active'] == 0
+
+
+def test_token_bucket_rate():
+    """测试令牌用尽后按速率补充"""
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert bucket.acquire(0) and bucket.acquire(0)
+    assert not bucket.acquire(0)
+    assert bucket.acquire(0.2)
+
+
+def test_backoff_honours_retry_after():
+    """测试退避优先使用 Retry-After，否则在指数上限内随机取值"""
+    assert backoff_delay(0, '2') == 2
+    for attempt in range(5):
+        assert 0 <= backoff_delay(attempt) <= min(20, 2 ** attempt)
+
+
+def test_send_with_retry_on_429(monkeypatch):
+    """测试429后按 Retry-After 重试，最终返回正常响应"""
+    monkeypatch.setattr('admission.time.sleep', lambda s: None)
+    statuses = iter([429, 429, 200])
+
+    def send():
+        response = requests.Response()
+        response.status_code = next(statuses)
+        response.raw = io.BytesIO()
+        response.headers['Retry-After'] = '1'
+        return response
+
+    limiter = UpstreamLimiter('test', max_concurrency=1, rate=100, burst=100, max_queue=1)
+    assert send_with_retry(limiter, send).status_code == 200
@@ -0,0 +1,49 @@
+# 测试文本压缩编解码
+import pytest
+from utils.compression import TextCodec
+
+TEXT = '{"text": "二爻妻财", "yiju": "问财以妻财为用神。"}' * 20
+
+
+@pytest.fixture
+def codec():
+    codec = TextCodec()
+    codec.configure('zlib', None, 64)
+    return codec
+
+
+def test_round_trip(codec):
+    """测试压缩后可以还原，且数据带有压缩头"""
+    data = codec.compress(TEXT)
+    assert codec.is_compressed(data)
+    assert len(data) < len(TEXT.encode('utf-8'))
+    assert codec.decompress(data) == TEXT
+
+
+def test_legacy_values(codec):
+    """测试未压缩的旧数据（文本或UTF-8编码）原样读取，短文本不压缩"""
+    assert codec.decompress(TEXT) == TEXT
+    assert codec.decompress(TEXT.encode('utf-8')) == TEXT
+    assert codec.compress('短文本') == '短文本'.encode('utf-8')
+
+
+def test_dictionary(codec):
+    """测试使用字典压缩的数据在更换字典后仍按数据头中的字典ID解压"""
+    dictionaries = {1: TEXT.encode('utf-8'), 2: b'other'}
+    active = [1]
+    codec.set_dictionary_source(dictionaries.get, lambda: (active[0], dictionaries[active[0]]))
+    data = codec.compress(TEXT)
+    assert len(data) < len(TextCodec().compress(TEXT))
+
+    active[0] = 2
+    codec.reset_active_dictionary()
+    assert codec.decompress(data) == TEXT
+
+
+def test_missing_dictionary(codec):
+    """测试字典不存在时解压失败"""
+    codec.set_dictionary_source(lambda dict_id: None, lambda: (7, TEXT.encode('utf-8')))
+    data = codec.compress(TEXT)
+    codec._dictionaries.clear()
+    with pytest.raises(ValueError):
+        codec.decompress(data)
@@ -0,0 +1,61 @@
+# 测试快速模式组合响应的解析和校验
+import json
+from analysis import build_pipeline, parse_combined, resolve_mode, SECTION_VALIDATORS
+
+SECTIONS = {
+    'yongshen': {'text': '二爻妻财', 'yiju': '问财以妻财为用神。'},
+    'yongshen_guli': {name: '' for name in ('月建关系', '日辰关系', '动爻关系', '特殊状态', '回头生克', '原神忌神', '旺衰评估')},
+    'dongyao_guli': {'有动爻': True, '动爻列表': [{'爻位': '五爻'}]},
+    'shuzi_lianghua': {'月建': '亥', '日辰': '酉', '用神': '卯', '动爻列表': ['申']},
+    'zonghe_jiedu': '财运平稳。'
+}
+
+
+def test_all_sections_valid():
+    """测试全部阶段通过校验，代码块包裹的响应也能解析"""
+    result = '```json\n' + json.dumps(SECTIONS, ensure_ascii=False) + '\n```'
+    assert parse_combined(result) == SECTIONS
+    assert set(SECTION_VALIDATORS) == set(SECTIONS)
+
+
+def test_invalid_sections_are_dropped():
+    """测试未通过校验的阶段不包含在结果中，其余阶段保留"""
+    data = dict(SECTIONS, shuzi_lianghua={'月建': '亥月', '日辰': '酉', '用神': '卯', '动爻列表': []},
+                yongshen_guli={'月建关系': ''})
+    del data['zonghe_jiedu']
+    assert set(parse_combined(json.dumps(data, ensure_ascii=False))) == {'yongshen', 'dongyao_guli'}
+
+
+def test_unparseable_response():
+    """测试无法解析的响应返回空结果（全部阶段单独请求）"""
+    assert parse_combined('API请求失败') == {}
+    assert parse_combined('{"yongshen": ') == {}
+
+
+def test_resolve_mode():
+    """测试请求指定的模式优先，未指定时使用默认模式"""
+    assert resolve_mode('fast', 'gpt-4') == 'fast'
+    assert resolve_mode(None, 'gpt-4') == 'staged'
+
+
+def test_combined_sections_are_used(app, fake_ai):
+    """测试组合结果全部通过校验时只发送一次请求"""
+    fake_ai.responses['fast'] = SECTIONS
+    results = build_pipeline('财运如何？', '无法本地解析的卦象', 'gpt-4', mode='fast').run()
+    assert fake_ai.calls == ['fast']
+    assert results['shuzi_lianghua']['用神'] == '卯'
+
+
+def test_sections_depending_on_yongshen_follow_separate_yongshen(app, fake_ai):
+    """测试组合结果中的用神未通过校验、单独请求得到另一个用神时，依赖用神的阶段也单独请求"""
+    fake_ai.responses['fast'] = dict(SECTIONS, yongshen={'text': ''})
+    fake_ai.responses['yongshen'] = {'text': '五爻官鬼', 'yiju': '问事业以官鬼为用神。'}
+    fake_ai.responses['shuzi_lianghua'] = {'月建': '亥', '日辰': '酉', '用神': '申', '动爻列表': ['申']}
+
+    results = build_pipeline('事业如何？', '无法本地解析的卦象', 'gpt-4', mode='fast').run()
+
+    assert results['yongshen']['text'] == '五爻官鬼'
+    assert sorted(fake_ai.calls) == ['fast', 'shuzi_lianghua', 'yongshen', 'yongshen_guli', 'zonghe_jiedu']
+    # 数字量化使用单独请求提取的用神地支，不使用组合结果中基于另一个用神的地支
+    assert results['shuzi_lianghua']['用神'] == '申'
+    assert results['dongyao_guli'] == SECTIONS['dongyao_guli']
@@ -0,0 +1,82 @@
+# 测试卦象信息解析
+import json
+import os
+import pytest
+from hexagram_parser import parse_hexagram_info, extract_shuzi_inputs, HexagramInfo, HexagramParseError
+
+# 使用历史记录中的真实排盘文本作为样例
+SAMPLE_FILE = os.path.join(os.path.dirname(__file__), 'history', '5c5f6f22-e337-4034-b157-99317e9fd3e9.json')
+
+with open(SAMPLE_FILE, encoding='utf-8') as f:
+    SAMPLE = json.load(f)['hexagram_info']
+
+
+def test_parse_pillars_and_header():
+    """测试四柱、旬空、卦名和动爻解析"""
+    info = parse_hexagram_info(SAMPLE)
+
+    assert [p.gan + p.zhi for p in info.pillars] == ['乙巳', '丁亥', '己酉', '甲子']
+    assert info.yuejian == '亥'
+    assert info.richen == '酉'
+    assert info.xunkong == ['戌', '亥']
+    assert info.ben.name == '归妹卦'
+    assert info.bian.name == '兑卦'
+    assert info.moving_lines == [5]
+    assert info.moving_dizhi == ['申']
+
+
+def test_parse_line_tables():
+    """测试本卦、变卦爻表解析"""
+    info = parse_hexagram_info(SAMPLE)
+
+    fifth = info.ben.line(5)
+    assert (fifth.liuqin, fifth.gan, fifth.zhi, fifth.wuxing) == ('兄弟', '庚', '申', '金')
+    assert fifth.moving and fifth.yinyang == '老阴'
+    assert fifth.fushen.liuqin == '兄弟' and fifth.fushen.zhi == '酉'
+    assert fifth.liushen == '朱雀'
+    assert fifth.shensha == ['贵人']
+
+    assert info.ben.shi == 3 and info.ben.ying == 6
+    assert info.bian.shi == 6 and info.bian.ying == 3
+    assert info.bian.line(4).zhi == '亥'
+    assert info.bian.line(4).liushen == ''
+
+
+def test_yongshen_dizhi():
+    """测试由用神文本确定用神地支"""
+    info = parse_hexagram_info(SAMPLE)
+
+    assert info.yongshen_dizhi('二爻妻财') == '卯'
+    assert info.yongshen_dizhi('上爻父母') == '戌'
+    assert info.yongshen_dizhi('四爻伏神子孙') == '亥'
+    assert info.yongshen_dizhi('世爻') == '丑'
+    assert info.yongshen_dizhi('妻财') == '卯'
+    with pytest.raises(HexagramParseError):
+        info.yongshen_dizhi('父母')
+
+
+def test_extract_shuzi_inputs():
+    """测试提取数字量化输入"""
+    info = parse_hexagram_info(SAMPLE)
+
+    assert extract_shuzi_inputs(info, '二爻妻财') == {
+        '月建': '亥',
+        '日辰': '酉',
+        '用神': '卯',
+        '动爻列表': ['申']
+    }
+
+
+def test_from_dict_round_trip():
+    """测试解析结果经JSON保存后可以还原"""
+    info = parse_hexagram_info(SAMPLE)
+    restored = HexagramInfo.from_dict(json.loads(json.dumps(info.to_dict(), ensure_ascii=False)))
+
+    assert restored == info
+    assert restored.yongshen_dizhi('五爻伏神妻财') == info.yongshen_dizhi('五爻伏神妻财')
+
+
+def test_unparseable_text():
+    """测试无法识别的文本抛出HexagramParseError"""
+    with pytest.raises(HexagramParseError):
+        parse_hexagram_info('乾为天，初九潜龙勿用')
@@ -0,0 +1,50 @@
+# 测试旧版历史记录文件解析
+import json
+import os
+import pytest
+from history_import import parse_history_file, HistoryFileError, iter_history_files
+
+RECORD = {
+    'id': '5c5f6f22-e337-4034-b157-99317e9fd3e9',
+    'timestamp': '2025-12-06 03:22:11',
+    'question': '最近的财运如何？',
+    'hexagram_info': '起卦时间（公历）：2025-12-6 0:12',
+    'model': 'qwen-max',
+    'yongshen': {'text': '二爻妻财', 'yiju': '问财以妻财为用神。'},
+    'yongshen_guli': {'月建关系': '相'},
+    'dongyao_guli': {'有动爻': False},
+    'shuzi_lianghua': {'用神指数': {'总指数': 1.5}},
+    'zonghe_jiedu': '财运平稳。'
+}
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+def test_parse_valid_file(tmp_path):
+    """测试解析出写入所需的列值和冗余字段"""
+    row = parse_history_file(write(tmp_path, 'a.json', RECORD))
+    assert row['record_id'] == RECORD['id']
+    assert row['yongshen_text'] == '二爻妻财'
+    assert row['yongshen_zhishu'] == 1.5
+    assert row['payload'].startswith('{"id":null')
+    assert json.loads(row['yongshen']) == RECORD['yongshen']
+
+
+@pytest.mark.parametrize('change', [{'id': 'not-a-uuid'}, {'question': ''}, {'yongshen': '二爻妻财'}])
+def test_parse_invalid_file(tmp_path, change):
+    """测试缺少字段或类型错误的文件被拒绝"""
+    with pytest.raises(HistoryFileError):
+        parse_history_file(write(tmp_path, 'b.json', dict(RECORD, **change)))
+
+
+def test_iter_skips_imported(tmp_path):
+    """测试文件名为已导入记录ID的文件直接跳过"""
+    write(tmp_path, f"{RECORD['id']}.json", RECORD)
+    write(tmp_path, 'other.json', RECORD)
+    (tmp_path / 'notes.txt').write_text('x')
+    skipped = {os.path.basename(path): imported for path, imported in iter_history_files(str(tmp_path), {RECORD['id']})}
+    assert skipped == {f"{RECORD['id']}.json": True, 'other.json': False}
@@ -0,0 +1,114 @@
+# 测试异步解卦任务队列
+from datetime import datetime, timedelta
+import pytest
+from admission import UpstreamBusyError
+from config import config
+from jobs import enqueue_job, _claim_next_job, _run_job, requeue_stale_jobs, heartbeat_jobs
+from models import db, User, AnalysisJob, PipelineRun, HexagramRecord
+from pipeline_runs import claim_run, get_run
+
+# 无法本地解析的卦象，数字量化阶段也调用AI
+HEXAGRAM_INFO = '测试卦象'
+
+
+@pytest.fixture
+def user_id(app):
+    """测试用户（解卦记录需要所属用户）"""
+    user = User(username='tester', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def _busy(text):
+    """上游繁忙"""
+    raise UpstreamBusyError('test', retry_after=1)
+
+
+def test_interrupted_job_is_requeued(app, fake_ai, user_id):
+    """测试执行中的任务没有心跳（进程已退出）时重新入队，其解卦运行标记为失败；有心跳的任务不受影响"""
+    enqueue_job(user_id, '财运如何？', HEXAGRAM_INFO, 'gpt-4')
+    enqueue_job(user_id, '事业如何？', HEXAGRAM_INFO, 'gpt-4')
+    dead = _claim_next_job('old-host:1:0')
+    alive = _claim_next_job('host:2:0')
+    run = PipelineRun(run_id='r1', user_id=user_id, question='财运如何？', hexagram_id=1, model='gpt-4', status='running')
+    db.session.add(run)
+    dead.run_id = 'r1'
+    db.session.commit()
+    assert requeue_stale_jobs() == 0
+
+    # 服务重启：旧进程的任务不再有心跳，本进程的心跳继续更新
+    old = datetime.utcnow() - timedelta(seconds=config.JOB_HEARTBEAT_TIMEOUT + 1)
+    dead.heartbeat_at = alive.heartbeat_at = old
+    db.session.commit()
+    heartbeat_jobs('host:2')
+    assert requeue_stale_jobs() == 1
+
+    db.session.refresh(dead)
+    db.session.refresh(alive)
+    db.session.refresh(run)
+    assert dead.status == 'pending' and dead.worker is None
+    assert alive.status == 'running'
+    assert run.status == 'failed'
+    assert _claim_next_job('host:2:1').id == dead.id
+
+
+def test_busy_upstream_retries_are_delayed_and_capped(app, fake_ai, user_id, monkeypatch):
+    """测试上游繁忙时任务延迟后重新入队，超过重试次数后失败"""
+    monkeypatch.setattr(config, 'JOB_MAX_RETRIES', 1)
+    fake_ai.responses['yongshen'] = _busy
+    job_id = enqueue_job(user_id, '财运如何？', HEXAGRAM_INFO, 'gpt-4')
+
+    job = _claim_next_job('host:1:0')
+    _run_job(job)
+    assert job.status == 'pending' and job.retries == 1
+    assert job.not_before >= datetime.utcnow() + timedelta(seconds=config.JOB_RETRY_DELAY - 1)
+    assert _claim_next_job('host:1:0') is None
+
+    job.not_before = datetime.utcnow()
+    db.session.commit()
+    job = _claim_next_job('host:1:0')
+    assert job.job_id == job_id
+    _run_job(job)
+    assert job.status == 'failed'
+    assert AnalysisJob.query.filter_by(status='pending').count() == 0
+
+
+def test_job_uses_run_resumed_by_user(app, fake_ai, user_id):
+    """测试任务因上游繁忙重新入队后，用户继续执行了其运行：正在执行时任务不同时执行，完成后任务直接使用其记录"""
+    fake_ai.responses['yongshen'] = _busy
+    enqueue_job(user_id, '财运如何？', HEXAGRAM_INFO, 'gpt-4')
+    job = _claim_next_job('host:1:0')
+    _run_job(job)
+    assert job.status == 'pending'
+    run = get_run(job.run_id)
+    assert run.status == 'failed'
+
+    # 运行正在继续执行时，任务不强制领取
+    assert claim_run(run)
+    job.not_before = datetime.utcnow()
+    db.session.commit()
+    job = _claim_next_job('host:1:0')
+    fake_ai.calls.clear()
+    _run_job(job)
+    assert job.status == 'pending' and fake_ai.calls == []
+    run.status = 'failed'
+    db.session.commit()
+
+    # 用户继续执行完成
+    fake_ai.responses['yongshen'] = {'text': '二爻妻财', 'yiju': '问财以妻财为用神。'}
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = db.session.get(User, user_id).get_id()
+    record_id = client.post(f'/hexagram/runs/{run.run_id}/resume').get_json()['record_id']
+
+    job.not_before = datetime.utcnow()
+    db.session.commit()
+    job = _claim_next_job('host:1:0')
+    fake_ai.calls.clear()
+    _run_job(job)
+    assert job.status == 'done' and job.record_id == record_id
+    assert fake_ai.calls == []
+    assert HexagramRecord.query.count() == 1
+    db.session.refresh(run)
+    assert run.record_id == record_id
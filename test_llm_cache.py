@@ -0,0 +1,28 @@
+# 测试AI响应缓存的数据库层
+from datetime import datetime, timedelta
+from config import config
+from llm_cache import llm_cache
+from models import db, LLMCacheEntry
+
+
+def test_db_hits_touch_entry_at_most_once_per_interval(app, monkeypatch):
+    """测试数据库缓存命中不是每次都写数据库，命中次数累计后与最近使用时间一起写回"""
+    monkeypatch.setattr(config, 'LLM_CACHE_ENABLED', True)
+    llm_cache.set('k' * 64, '{"text": "二爻妻财"}', 'yongshen', 'gpt-4')
+    entry = LLMCacheEntry.query.filter_by(cache_key='k' * 64).one()
+    stored_at = entry.last_used_at
+
+    for _ in range(3):
+        llm_cache.clear_memory()
+        assert llm_cache.get('k' * 64, 'yongshen') == '{"text": "二爻妻财"}'
+    db.session.refresh(entry)
+    assert entry.hits == 0 and entry.last_used_at == stored_at
+
+    # 超过写回间隔后，下一次命中写回累计的命中次数
+    entry.last_used_at = datetime.utcnow() - timedelta(seconds=config.LLM_CACHE_TOUCH_INTERVAL)
+    db.session.commit()
+    llm_cache.clear_memory()
+    llm_cache.get('k' * 64, 'yongshen')
+    db.session.refresh(entry)
+    assert entry.hits == 4 and entry.last_used_at > stored_at
+    llm_cache.clear_memory()
@@ -0,0 +1,57 @@
+# 测试监控指标注册表
+import os
+from utils.metrics import Counter, Gauge, Histogram, MetricsRegistry, mark_process_dead
+
+
+def _metrics(registry):
+    """在注册表中创建一组测试指标"""
+    return (Counter('calls_total', '调用次数', ['stage'], registry=registry),
+            Gauge('in_flight', '进行中', registry=registry),
+            Histogram('latency_seconds', '耗时', ['stage'], buckets=(0.1, 1), registry=registry))
+
+
+def test_render():
+    """测试输出 Prometheus 文本格式，直方图的桶为累计计数"""
+    registry = MetricsRegistry()
+    calls, in_flight, latency = _metrics(registry)
+    calls.inc(stage='yongshen')
+    calls.inc(2, stage='yongshen')
+    in_flight.inc()
+    for value in (0.05, 0.5, 3):
+        latency.observe(value, stage='yongshen')
+
+    text = registry.render()
+    assert '# TYPE calls_total counter' in text
+    assert 'calls_total{stage="yongshen"} 3' in text
+    assert 'in_flight 1' in text
+    assert 'latency_seconds_bucket{stage="yongshen",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{stage="yongshen",le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{stage="yongshen",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{stage="yongshen"} 3' in text
+
+
+def test_multiprocess_merge(tmp_path):
+    """测试汇总其他进程的快照：计数器和直方图求和，已退出进程的仪表盘不再统计"""
+    worker, scraper = MetricsRegistry(), MetricsRegistry()
+    worker.directory = scraper.directory = str(tmp_path)
+    worker_calls, worker_in_flight, worker_latency = _metrics(worker)
+    calls, in_flight, latency = _metrics(scraper)
+
+    worker_calls.inc(stage='chat')
+    worker_in_flight.inc(2)
+    worker_latency.observe(0.5, stage='chat')
+    worker.write()
+    calls.inc(stage='chat')
+    in_flight.inc()
+    latency.observe(0.05, stage='chat')
+
+    merged = scraper.collect()
+    assert merged['calls_total'][('chat',)] == 2
+    assert merged['in_flight'][()] == 3
+    assert merged['latency_seconds'][('chat',)][-1] == 2
+
+    # 同一进程号的快照都被标记为已退出，本进程内存中的值不受影响
+    mark_process_dead(os.getpid(), str(tmp_path))
+    merged = scraper.collect()
+    assert merged['calls_total'][('chat',)] == 2
+    assert merged['in_flight'][()] == 1
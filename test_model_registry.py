@@ -0,0 +1,48 @@
+# 测试模型注册表缓存的失效
+from sqlalchemy import insert, update
+from config import config
+from llm_client import resolve_endpoint
+from model_registry import model_registry
+from models import db, User, CustomModel
+
+
+def _user():
+    """创建测试用户"""
+    user = User(username='tester', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def test_cache_invalidated_after_commit(app):
+    """测试自定义模型变更在事务提交后才使缓存失效，回滚时不失效"""
+    user_id = _user()
+    model_registry.get(user_id)
+
+    db.session.add(CustomModel(user_id=user_id, name='m1', api_url='https://a.example/v1', api_key='k1'))
+    db.session.flush()
+    assert user_id in model_registry._items
+    db.session.commit()
+    assert user_id not in model_registry._items
+    assert model_registry.get(user_id).endpoints['m1'] == ('https://a.example/v1', 'k1')
+
+    db.session.add(CustomModel(user_id=user_id, name='m2', api_url='https://b.example/v1', api_key='k2'))
+    db.session.flush()
+    db.session.rollback()
+    assert user_id in model_registry._items
+
+
+def test_endpoint_uses_current_version(app, monkeypatch):
+    """测试其他进程修改了自定义模型（本进程缓存未失效）时，接口地址解析读取数据库中的版本号"""
+    monkeypatch.setattr(config, 'AI_API_URL', '')
+    user_id = _user()
+    assert resolve_endpoint('m1', user_id) is None
+
+    # 不经过ORM事件，模拟其他进程的修改
+    db.session.execute(insert(CustomModel.__table__).values(
+        user_id=user_id, name='m1', api_url='https://a.example/v1', api_key='k1'))
+    db.session.execute(update(User.__table__).where(User.__table__.c.id == user_id)
+                       .values(models_version=User.__table__.c.models_version + 1))
+    db.session.commit()
+
+    assert resolve_endpoint('m1', user_id) == ('https://a.example/v1', 'k1')
@@ -0,0 +1,46 @@
+# 测试密码计算线程池
+import threading
+import pytest
+from config import config
+from password_hasher import PasswordHasher, PasswordHasherBusyError, hash_rounds, needs_rehash
+
+
+def test_hash_and_verify_with_rounds():
+    """测试按指定成本因子计算哈希并校验"""
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    password_hash = hasher.hash('secret1', rounds=4)
+    assert hash_rounds(password_hash) == 4
+    assert hasher.verify('secret1', password_hash)
+    assert not hasher.verify('secret2', password_hash)
+    assert hasher.stats()['completed'] == 3
+
+
+def test_needs_rehash(monkeypatch):
+    """测试成本因子与配置不同时需要重新计算"""
+    monkeypatch.setattr(config, 'BCRYPT_ROUNDS', 4)
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    assert not needs_rehash(hasher.hash('secret1'))
+    assert needs_rehash(hasher.hash('secret1', rounds=5))
+    assert needs_rehash('not-a-bcrypt-hash')
+
+
+def test_full_queue_rejects():
+    """测试计算和排队名额都已占满时立即拒绝"""
+    hasher = PasswordHasher(workers=1, max_queue=0)
+    started = threading.Event()
+    release = threading.Event()
+
+    def hold():
+        started.set()
+        release.wait(2)
+
+    holder = threading.Thread(target=lambda: hasher._submit(hold))
+    holder.start()
+    started.wait(1)
+    assert hasher.stats()['saturation'] == 1
+    with pytest.raises(PasswordHasherBusyError):
+        hasher.hash('secret1', rounds=4)
+    release.set()
+    holder.join()
+    assert hasher.stats()['rejected'] == 1
+    assert hasher.stats()['saturation'] == 0
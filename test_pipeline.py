@@ -0,0 +1,97 @@
+# 测试阶段流水线
+import time
+import pytest
+from pipeline import Stage, StagePipeline, StageError
+
+
+def _sleeper(value, delay=0.2):
+    """返回一个延时后返回固定值的阶段函数"""
+    def func(results):
+        time.sleep(delay)
+        return value
+    return func
+
+
+def test_independent_stages_run_concurrently():
+    """测试互不依赖的阶段并发执行，总耗时约为三轮而非五轮"""
+    pipeline = StagePipeline([
+        Stage('yongshen', _sleeper('ys')),
+        Stage('dongyao_guli', _sleeper('dy')),
+        Stage('yongshen_guli', _sleeper('ysgl'), deps=['yongshen']),
+        Stage('shuzi_lianghua', _sleeper('szlh'), deps=['yongshen']),
+        Stage('zonghe_jiedu', lambda r: '+'.join(r[k] for k in sorted(r)),
+              deps=['yongshen', 'yongshen_guli', 'dongyao_guli', 'shuzi_lianghua'])
+    ])
+
+    results = pipeline.run()
+
+    assert results['zonghe_jiedu'] == 'dy+szlh+ys+ysgl'
+    assert pipeline.elapsed < 0.6
+    report = pipeline.timing_report()
+    assert set(report['stages']) == {'yongshen', 'dongyao_guli', 'yongshen_guli', 'shuzi_lianghua', 'zonghe_jiedu'}
+    assert report['serial'] >= 0.8
+
+
+def test_stage_failure_raises_stage_error():
+    """测试阶段失败时抛出StageError并带有阶段名称"""
+    def boom(results):
+        raise ValueError('bad json')
+
+    pipeline = StagePipeline([
+        Stage('a', _sleeper(1, 0)),
+        Stage('b', boom, deps=['a']),
+        Stage('c', _sleeper(3, 0), deps=['b'])
+    ])
+
+    with pytest.raises(StageError) as exc_info:
+        pipeline.run()
+    assert exc_info.value.stage == 'b'
+    assert isinstance(exc_info.value.error, ValueError)
+
+
+def test_running_stages_are_kept_on_failure():
+    """测试阶段失败时等待已在执行的阶段结束，其结果回调并包含在异常中，依赖失败阶段的阶段不执行"""
+    def boom(results):
+        raise ValueError('bad json')
+
+    done = []
+    pipeline = StagePipeline([
+        Stage('a', boom),
+        Stage('b', _sleeper('slow', 0.1)),
+        Stage('c', _sleeper('never', 0), deps=['a'])
+    ])
+
+    with pytest.raises(StageError) as exc_info:
+        pipeline.run(on_stage_done=lambda name, result: done.append(name))
+    assert exc_info.value.stage == 'a'
+    assert exc_info.value.results == {'b': 'slow'}
+    assert done == ['b']
+
+
+def test_preset_results_are_skipped():
+    """测试已给出结果的阶段不会重复执行"""
+    calls = []
+
+    def record(name):
+        def func(results):
+            calls.append(name)
+            return name
+        return func
+
+    pipeline = StagePipeline([
+        Stage('a', record('a')),
+        Stage('b', record('b'), deps=['a'])
+    ])
+    results = pipeline.run({'a': 'cached'})
+
+    assert calls == ['b']
+    assert results['a'] == 'cached'
+
+
+def test_cycle_is_rejected():
+    """测试循环依赖会被拒绝"""
+    with pytest.raises(ValueError):
+        StagePipeline([
+            Stage('a', _sleeper(1, 0), deps=['b']),
+            Stage('b', _sleeper(2, 0), deps=['a'])
+        ])
@@ -0,0 +1,117 @@
+# 测试解卦运行的阶段检查点和继续执行
+import threading
+import time
+from datetime import datetime, timedelta
+from models import db, User, PipelineRun, HexagramRecord
+from pipeline_runs import claim_run, get_run, run_results, run_stats
+
+# 无法本地解析的卦象，数字量化阶段也调用AI
+HEXAGRAM_INFO = '测试卦象'
+
+# 动爻卦理响应无法解析（纠正提示重新请求后仍然无法解析）
+BROKEN = '{"有动爻": true, "动爻列表": ['
+
+
+def _client(app):
+    """已登录测试用户的客户端（解卦记录需要所属用户）"""
+    user = User(username='tester', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = user.get_id()
+        session['_fresh'] = True
+    return client
+
+
+def _analyze(client):
+    """发起一次同步解卦"""
+    return client.post('/hexagram/analyze', json={'question': '财运如何？', 'hexagram_info': HEXAGRAM_INFO})
+
+
+def _broken_dongyao(text):
+    """稍后返回无法解析的动爻卦理，依赖用神的阶段先完成"""
+    time.sleep(0.1)
+    return BROKEN
+
+
+def test_resume_runs_only_missing_stages(app, fake_ai):
+    """测试阶段失败后保留已完成阶段的结果，继续执行时只请求失败和未开始的阶段，并统计被丢弃的上游调用"""
+    client = _client(app)
+    fake_ai.responses['dongyao_guli'] = _broken_dongyao
+    before = run_stats.stats()
+
+    response = _analyze(client)
+    assert response.status_code == 500
+    data = response.get_json()
+    assert data['failed_stage'] == 'dongyao_guli'
+    assert sorted(data['stages_done']) == ['shuzi_lianghua', 'yongshen', 'yongshen_guli']
+
+    run = client.get(f"/hexagram/runs/{data['run_id']}").get_json()['run']
+    assert run['status'] == 'failed'
+    # 动爻卦理请求了两次（含一次纠正），两次的结果都被丢弃
+    assert run['upstream_calls'] == 5
+    assert run['wasted_calls'] == 2
+
+    fake_ai.responses['dongyao_guli'] = {'有动爻': False, '动爻列表': []}
+    fake_ai.calls.clear()
+    response = client.post(f"/hexagram/runs/{data['run_id']}/resume")
+    assert response.status_code == 200, response.get_json()
+    resumed = response.get_json()
+    assert sorted(resumed['reused_stages']) == ['shuzi_lianghua', 'yongshen', 'yongshen_guli']
+    assert sorted(fake_ai.calls) == ['dongyao_guli', 'zonghe_jiedu']
+    assert HexagramRecord.query.filter_by(record_id=resumed['record_id']).count() == 1
+
+    run = client.get(f"/hexagram/runs/{data['run_id']}").get_json()['run']
+    assert run['status'] == 'done' and run['attempts'] == 2
+    assert run['upstream_calls'] == 7 and run['wasted_calls'] == 2
+    after = run_stats.stats()
+    assert after['succeeded'] - before['succeeded'] == 1
+    assert after['success_wasted_calls'] - before['success_wasted_calls'] == 2
+
+    # 已完成的运行再次继续时直接返回记录ID
+    fake_ai.calls.clear()
+    again = client.post(f"/hexagram/runs/{data['run_id']}/resume").get_json()
+    assert again['record_id'] == resumed['record_id']
+    assert fake_ai.calls == []
+
+
+def test_concurrent_resume_is_rejected(app, fake_ai):
+    """测试同一运行只能被领取一次，正在执行的运行继续执行时返回409，中断超时后可以重新领取"""
+    client = _client(app)
+    fake_ai.responses['dongyao_guli'] = BROKEN
+    run_id = _analyze(client).get_json()['run_id']
+
+    run = get_run(run_id)
+    assert claim_run(run)
+    assert not claim_run(run)
+    assert client.post(f'/hexagram/runs/{run_id}/resume').status_code == 409
+
+    # 执行中的运行长时间没有更新时视为已中断
+    run.updated_at = datetime.utcnow() - timedelta(hours=1)
+    db.session.commit()
+    assert claim_run(run)
+    assert run.attempts == 3
+
+
+def test_stream_disconnect_fails_run(app, fake_ai):
+    """测试流式解卦中途客户端断开时运行标记为失败，已完成阶段的结果保留"""
+    client = _client(app)
+    fake_ai.responses['zonghe_jiedu'] = lambda text: time.sleep(0.5) or '财运平稳。'
+
+    response = client.post('/hexagram/analyze/stream', json={'question': '财运如何？', 'hexagram_info': HEXAGRAM_INFO},
+                           buffered=False)
+    events = iter(response.response)
+    assert b'event: stage' in next(events)
+    response.close()
+
+    run = db.session.query(PipelineRun).one()
+    db.session.refresh(run)
+    assert run.status == 'failed'
+    assert run.error == '客户端断开连接'
+    assert run_results(run)
+
+    # 等待后台的流水线线程结束
+    for thread in threading.enumerate():
+        if thread.name == 'analyze-stream':
+            thread.join(2)
@@ -0,0 +1,56 @@
+# 测试结果页面的缓存
+from sqlalchemy import delete, insert, update
+from analysis import save_record
+from models import db, User, CustomModel, HexagramRecord
+
+
+def _client_and_record(app):
+    """已登录测试用户的客户端和该用户的一条解卦记录"""
+    user = User(username='tester', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    results = {
+        'yongshen': {'text': '二爻妻财', 'yiju': '问财以妻财为用神。'},
+        'yongshen_guli': {'旺衰评估': '旺'},
+        'dongyao_guli': {'有动爻': False, '动爻列表': []},
+        'shuzi_lianghua': {'月建': '亥', '日辰': '酉', '用神': '卯', '动爻列表': [],
+                           '用神指数': {'月建数': 1.0, '日辰数': 0.0, '总指数': 1.0}, '动爻指数': []},
+        'zonghe_jiedu': '财运平稳。'
+    }
+    record_id = save_record(user.id, '财运如何？', '测试卦象', 'gpt-4', results)
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = user.get_id()
+    return client, record_id
+
+
+def test_cached_page_of_deleted_record(app):
+    """测试记录在其他进程中删除后（本进程的页面缓存未失效），不再返回缓存的页面"""
+    client, record_id = _client_and_record(app)
+    assert client.get(f'/result/{record_id}').status_code == 200
+
+    # 不经过删除接口，模拟其他进程删除记录
+    db.session.execute(delete(HexagramRecord).where(HexagramRecord.record_id == record_id))
+    db.session.commit()
+
+    assert client.get(f'/result/{record_id}').status_code == 404
+
+
+def test_page_follows_model_changes_in_other_processes(app):
+    """测试其他进程添加自定义模型后（本进程的用户快照未失效），页面的ETag和模型列表随之变化"""
+    client, record_id = _client_and_record(app)
+    response = client.get(f'/result/{record_id}')
+    etag = response.headers['ETag']
+
+    # 不经过ORM事件，模拟其他进程的修改
+    user_id = db.session.query(User.id).scalar()
+    db.session.execute(insert(CustomModel.__table__).values(
+        user_id=user_id, name='my-model', api_url='https://a.example/v1', api_key='k1'))
+    db.session.execute(update(User.__table__).where(User.__table__.c.id == user_id)
+                       .values(models_version=User.__table__.c.models_version + 1))
+    db.session.commit()
+
+    response = client.get(f'/result/{record_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 'my-model' in response.get_data(as_text=True)
@@ -0,0 +1,35 @@
+# 测试登录用户缓存的失效
+from config import config
+from models import db, User
+from user_cache import UserCache
+
+
+def test_password_change_invalidates_other_processes(app, tmp_path, monkeypatch):
+    """测试修改密码后，其他进程缓存的旧会话在下次请求时失效"""
+    monkeypatch.setattr(config, 'BCRYPT_ROUNDS', 4)
+    monkeypatch.setattr(config, 'AUTH_SIGNAL_DIR', str(tmp_path / 'auth'))
+    user = User(username='tester')
+    user.set_password('secret1')
+    db.session.add(user)
+    db.session.commit()
+    session_id = user.get_id()
+
+    # 另一个进程中的缓存
+    other = UserCache()
+    assert other.get(session_id).username == 'tester'
+    assert other.get(session_id) is not None
+    assert other.stats()['hits'] == 1
+
+    user.set_password('secret2')
+    db.session.commit()
+    assert other.get(session_id) is None
+    assert other.get(user.get_id()).username == 'tester'
+
+
+def test_legacy_session_rejected(app):
+    """测试不带认证版本号的旧格式会话需要重新登录"""
+    user = User(username='tester', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+    assert UserCache().get(str(user.id)) is None
+    assert UserCache().get(user.get_id()) is not None
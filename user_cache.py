@@ -0,0 +1,196 @@
+# 登录用户缓存模块
+# 该文件为 Flask-Login 的 user_loader 提供进程内用户快照缓存（LRU + TTL），
+# 缓存命中时加载当前用户不查询数据库。
+# 会话中保存的用户标识为 "用户ID.认证版本号"，修改密码时认证版本号递增：
+# 修改密码的会话随即使用新标识，任何进程都会重新查询；提交后本进程立即删除该用户的缓存，
+# 并更新 AUTH_SIGNAL_DIR 中该用户的信号文件，其他进程命中缓存时检查信号文件的修改时间（一次 stat），
+# 晚于缓存加载时间则重新查询数据库，发现版本号不一致，旧会话即失效。
+# 未配置 AUTH_SIGNAL_DIR 时（单进程）其他进程中旧标识的缓存最多保留 USER_CACHE_TTL 秒。
+
+from collections import OrderedDict
+import os
+import threading
+import time
+from flask_login import UserMixin
+from config import config
+from utils.logger import setup_logger
+from utils.stats import register_stats
+
+# 设置日志
+logger = setup_logger(__name__)
+
+
+class UserSnapshot(UserMixin):
+    """当前用户的轻量快照（不绑定数据库会话）"""
+
+    def __init__(self, id, username, auth_version, models_version):
+        """初始化用户快照
+
+        Args:
+            id (int): 用户ID
+            username (str): 用户名
+            auth_version (int): 认证版本号
+            models_version (int): 自定义模型版本号
+        """
+        self.id = id
+        self.username = username
+        self.auth_version = auth_version
+        self.models_version = models_version
+
+    def get_id(self):
+        """返回保存在会话中的用户标识"""
+        return session_user_id(self.id, self.auth_version)
+
+    def __repr__(self):
+        """返回用户快照的字符串表示"""
+        return f'<UserSnapshot {self.username}>'
+
+
+def session_user_id(user_id, auth_version):
+    """生成会话中的用户标识
+
+    Args:
+        user_id (int): 用户ID
+        auth_version (int): 认证版本号
+
+    Returns:
+        str: 如 "12.3"
+    """
+    return f'{user_id}.{auth_version or 0}'
+
+
+class UserCache:
+    """用户快照缓存"""
+
+    def __init__(self):
+        """初始化缓存"""
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, session_id):
+        """按会话中的用户标识加载用户
+
+        Args:
+            session_id (str): 会话中的用户标识
+
+        Returns:
+            UserSnapshot: 用户快照，用户不存在、认证版本已变化或为旧格式的标识时返回None
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._items.get(session_id)
+        if entry is not None and entry[0] > now and not _auth_changed_since(entry[1].id, entry[2]):
+            with self._lock:
+                self._items.move_to_end(session_id)
+                self.hits += 1
+            return entry[1]
+        with self._lock:
+            self.misses += 1
+
+        # 加载时间取查询之前的时间，查询期间其他进程提交的修改也会在下次命中时发现
+        loaded_at = time.time_ns()
+        snapshot = self._load(session_id)
+        if snapshot is not None:
+            with self._lock:
+                self._items[session_id] = (now + config.USER_CACHE_TTL, snapshot, loaded_at)
+                self._items.move_to_end(session_id)
+                while len(self._items) > config.USER_CACHE_SIZE:
+                    self._items.popitem(last=False)
+        return snapshot
+
+    def _load(self, session_id):
+        """查询数据库生成用户快照"""
+        from models import db, User
+        user_id, _, version = session_id.partition('.')
+        try:
+            user_id = int(user_id)
+            version = int(version)
+        except ValueError:
+            # 旧格式（纯数字用户ID）的会话不带认证版本号，无法判断密码是否已修改，需要重新登录
+            return None
+
+        row = (db.session.query(User.id, User.username, User.auth_version, User.models_version)
+               .filter(User.id == user_id)
+               .first())
+        if row is None:
+            return None
+        # 密码修改后旧会话的认证版本号不再匹配
+        if version != (row.auth_version or 0):
+            logger.info(f'用户 {row.username} 的会话认证版本已失效')
+            return None
+        return UserSnapshot(row.id, row.username, row.auth_version or 0, row.models_version or 0)
+
+    def invalidate(self, user_id):
+        """删除某个用户的全部缓存
+
+        Args:
+            user_id (int): 用户ID
+        """
+        prefix = f'{user_id}.'
+        with self._lock:
+            for key in [key for key in self._items if key.startswith(prefix)]:
+                del self._items[key]
+
+    def clear(self):
+        """删除全部缓存"""
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'items': len(self._items),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# 比较信号文件修改时间时预留的时钟误差（纳秒）：部分文件系统的修改时间精度较低，
+# 信号写入前后1秒内加载的缓存都视为可能过期，代价只是多查询几次
+_MTIME_SLACK_NS = 1_000_000_000
+
+
+def _signal_path(user_id):
+    """用户的认证变更信号文件，未配置 AUTH_SIGNAL_DIR 时返回None"""
+    if not config.AUTH_SIGNAL_DIR:
+        return None
+    return os.path.join(config.AUTH_SIGNAL_DIR, str(user_id))
+
+
+def _auth_changed_since(user_id, loaded_at):
+    """用户的认证信息是否在缓存加载之后被（任何进程）修改过"""
+    path = _signal_path(user_id)
+    if path is None:
+        return False
+    try:
+        return os.stat(path).st_mtime_ns >= loaded_at - _MTIME_SLACK_NS
+    except FileNotFoundError:
+        return False
+
+
+def publish_auth_change(user_id):
+    """通知所有进程用户的认证信息已修改（在事务提交后调用）
+
+    Args:
+        user_id (int): 用户ID
+    """
+    user_cache.invalidate(user_id)
+    path = _signal_path(user_id)
+    if path is None:
+        return
+    try:
+        os.makedirs(config.AUTH_SIGNAL_DIR, exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(str(time.time()))
+    except OSError as e:
+        logger.error(f'写入用户 {user_id} 的认证变更信号失败: {str(e)}')
+
+
+# 全局用户缓存
+user_cache = UserCache()
+register_stats('user_cache', user_cache.stats)
@@ -0,0 +1,229 @@
+import struct
+import threading
+import zlib
+from sqlalchemy.types import TypeDecorator, LargeBinary
+from sqlalchemy.dialects.mysql import MEDIUMBLOB
+
+# 优先使用 zstandard（压缩率和速度更好，支持训练字典），未安装时使用标准库 zlib（预置字典）
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 压缩数据的格式：MAGIC + 算法(1字节) + 字典ID(4字节，0表示不使用字典) + 压缩数据
+# 文本的UTF-8编码不会以 \x00 开头，未压缩的旧数据可以直接区分
+MAGIC = b'\x00'
+CODEC_ZLIB = b'z'
+CODEC_ZSTD = b's'
+HEADER = struct.Struct('>cI')
+HEADER_SIZE = len(MAGIC) + HEADER.size
+
+# zlib 预置字典的最大有效长度
+ZLIB_DICT_SIZE = 32 * 1024
+
+
+class TextCodec:
+    """文本压缩编解码器
+
+    写入时按配置的算法和当前字典压缩，读取时根据数据头选择算法和字典，
+    因此更换算法或字典后旧数据仍可读取。字典由 set_dictionary_source 注册的函数按ID加载并缓存。
+    """
+
+    def __init__(self):
+        """初始化编解码器"""
+        self.codec = 'zlib'
+        self.level = 6
+        self.min_bytes = 64
+        self._dictionaries = {}
+        self._active_id = None
+        self._load_dictionary = None
+        self._load_active = None
+        self._lock = threading.Lock()
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def configure(self, codec, level, min_bytes):
+        """设置写入时使用的算法
+
+        参数:
+            codec (str): 'zstd'、'zlib' 或 'none'（不压缩），zstd 不可用时回退到 zlib
+            level (int): 压缩级别，为None时使用算法的默认级别（zstd 为3，zlib 为6）
+            min_bytes (int): 小于该长度（UTF-8字节）的文本不压缩
+        """
+        self.codec = 'zlib' if codec == 'zstd' and zstandard is None else codec
+        self.level = level or (3 if self.codec == 'zstd' else 6)
+        self.min_bytes = min_bytes
+
+    def set_dictionary_source(self, load_dictionary, load_active):
+        """注册字典的加载函数
+
+        参数:
+            load_dictionary (callable): 按字典ID返回字典内容（bytes），不存在时返回None
+            load_active (callable): 返回当前使用的 (字典ID, 字典内容)，没有字典时返回None
+        """
+        self._load_dictionary = load_dictionary
+        self._load_active = load_active
+
+    def reset_active_dictionary(self):
+        """重新加载当前字典（训练出新字典后调用）"""
+        with self._lock:
+            self._active_id = None
+
+    def _active_dictionary(self):
+        """当前写入使用的 (字典ID, 字典内容)，没有字典时字典ID为0"""
+        with self._lock:
+            if self._active_id is not None:
+                return self._active_id, self._dictionaries.get(self._active_id)
+        active = self._load_active() if self._load_active else None
+        with self._lock:
+            if active is None:
+                self._active_id = 0
+                return 0, None
+            self._dictionaries[active[0]] = active[1]
+            self._active_id = active[0]
+            return active
+
+    def _dictionary(self, dict_id):
+        """按ID获取字典"""
+        with self._lock:
+            data = self._dictionaries.get(dict_id)
+        if data is None:
+            data = self._load_dictionary(dict_id) if self._load_dictionary else None
+            if data is None:
+                raise ValueError(f'压缩字典 {dict_id} 不存在')
+            with self._lock:
+                self._dictionaries[dict_id] = data
+        return data
+
+    def compress(self, text):
+        """
+        压缩文本
+
+        参数:
+            text (str): 文本
+
+        返回:
+            bytes: 压缩数据；不压缩时为文本的UTF-8编码
+        """
+        raw = text.encode('utf-8')
+        if self.codec == 'none' or len(raw) < self.min_bytes:
+            return raw
+        dict_id, dictionary = self._active_dictionary()
+        if self.codec == 'zstd':
+            zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            data = zstandard.ZstdCompressor(level=self.level, dict_data=zdict).compress(raw)
+            codec = CODEC_ZSTD
+        else:
+            if dictionary:
+                compressor = zlib.compressobj(self.level, zlib.DEFLATED, 15, 9, zlib.Z_DEFAULT_STRATEGY,
+                                              dictionary[-ZLIB_DICT_SIZE:])
+            else:
+                compressor = zlib.compressobj(self.level)
+            data = compressor.compress(raw) + compressor.flush()
+            codec = CODEC_ZLIB
+        stored = MAGIC + HEADER.pack(codec, dict_id) + data
+        # 压缩后没有变小时保存原文
+        if len(stored) >= len(raw):
+            stored = raw
+        with self._lock:
+            self.raw_bytes += len(raw)
+            self.stored_bytes += len(stored)
+        return stored
+
+    def decompress(self, data):
+        """
+        解压数据
+
+        参数:
+            data (bytes | str): 压缩数据、未压缩的UTF-8编码或旧数据中的文本
+
+        返回:
+            str: 文本
+        """
+        if isinstance(data, str):
+            return data
+        data = bytes(data)
+        if not data.startswith(MAGIC):
+            return data.decode('utf-8')
+        codec, dict_id = HEADER.unpack_from(data, len(MAGIC))
+        body = data[HEADER_SIZE:]
+        dictionary = self._dictionary(dict_id) if dict_id else None
+        if codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise ValueError('数据使用zstd压缩，需要安装 zstandard')
+            zdict = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            raw = zstandard.ZstdDecompressor(dict_data=zdict).decompressobj().decompress(body)
+        elif codec == CODEC_ZLIB:
+            decompressor = zlib.decompressobj(15, zdict=dictionary[-ZLIB_DICT_SIZE:]) if dictionary else zlib.decompressobj()
+            raw = decompressor.decompress(body) + decompressor.flush()
+        else:
+            raise ValueError(f'未知的压缩算法: {codec!r}')
+        return raw.decode('utf-8')
+
+    @staticmethod
+    def is_compressed(data):
+        """判断数据是否已压缩"""
+        return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:1]) == MAGIC
+
+    def stats(self):
+        """
+        返回本进程写入的压缩统计
+
+        返回:
+            dict: 算法、原始字节数、存储字节数和压缩率
+        """
+        with self._lock:
+            return {
+                'codec': self.codec,
+                'dictionary': self._active_id,
+                'raw_bytes': self.raw_bytes,
+                'stored_bytes': self.stored_bytes,
+                'ratio': round(self.raw_bytes / self.stored_bytes, 2) if self.stored_bytes else 0.0
+            }
+
+
+# 全局编解码器
+text_codec = TextCodec()
+
+
+class _Binary(LargeBinary):
+    """二进制类型，读取时原样返回驱动给出的值（迁移前的旧数据可能是文本）"""
+
+    def result_processor(self, dialect, coltype):
+        return None
+
+
+class _MediumBlob(MEDIUMBLOB):
+    """MySQL MEDIUMBLOB，读取时原样返回驱动给出的值"""
+
+    def result_processor(self, dialect, coltype):
+        return None
+
+
+class CompressedText(TypeDecorator):
+    """压缩存储的文本列
+
+    Python 中的值为 str，数据库中保存为二进制（MySQL 为 MEDIUMBLOB）。
+    读取时兼容尚未迁移的未压缩文本。
+    """
+
+    impl = _Binary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        """MySQL 使用 MEDIUMBLOB（BLOB 最大只有64KB）"""
+        if dialect.name == 'mysql':
+            return dialect.type_descriptor(_MediumBlob())
+        return dialect.type_descriptor(_Binary())
+
+    def process_bind_param(self, value, dialect):
+        """写入时压缩"""
+        if value is None:
+            return None
+        return text_codec.compress(value)
+
+    def process_result_value(self, value, dialect):
+        """读取时解压"""
+        if value is None:
+            return None
+        return text_codec.decompress(value)
@@ -0,0 +1,141 @@
+from collections import OrderedDict
+import hashlib
+import threading
+from flask import request, make_response
+
+# 浏览器缓存策略：解卦记录生成后不再修改，仅允许浏览器（不允许共享缓存）长期缓存
+PRIVATE_IMMUTABLE = 'private, max-age={max_age}'
+
+
+def make_etag(*parts):
+    """
+    根据若干组成部分生成强ETag
+
+    参数:
+        parts: 决定响应内容的各个部分（如记录ID、用户ID、渲染版本）
+
+    返回:
+        str: 带引号的ETag
+    """
+    digest = hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    return f'"{digest}"'
+
+
+def set_cache_headers(response, etag, max_age):
+    """
+    为响应设置ETag和缓存头
+
+    参数:
+        response (Response): 响应
+        etag (str): 带引号的ETag
+        max_age (int): 浏览器缓存时间（秒）
+
+    返回:
+        Response: 设置了缓存头的响应
+    """
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = PRIVATE_IMMUTABLE.format(max_age=max_age)
+    response.vary.add('Cookie')
+    return response
+
+
+def not_modified(etag, max_age):
+    """
+    请求的 If-None-Match 与ETag一致时返回304响应
+
+    参数:
+        etag (str): 带引号的ETag
+        max_age (int): 浏览器缓存时间（秒）
+
+    返回:
+        Response: 304响应，不一致时返回None
+    """
+    if request.if_none_match.contains(etag.strip('"')):
+        return set_cache_headers(make_response('', 304), etag, max_age)
+    return None
+
+
+class PageCache:
+    """按内存大小限制的渲染结果缓存（LRU）"""
+
+    def __init__(self, max_bytes):
+        """
+        初始化缓存
+
+        参数:
+            max_bytes (int): 缓存内容总大小上限（字节），为0时不缓存
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        读取缓存
+
+        参数:
+            key (tuple): 缓存键
+
+        返回:
+            bytes: 缓存的内容，未命中时返回None
+        """
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        写入缓存，超出大小上限时淘汰最久未使用的内容
+
+        参数:
+            key (tuple): 缓存键
+            value (bytes): 内容
+        """
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def invalidate(self, prefix):
+        """
+        删除键的第一项等于 prefix 的全部缓存（如某条记录的所有渲染结果）
+
+        参数:
+            prefix: 键的第一项
+        """
+        with self._lock:
+            for key in [key for key in self._items if key[0] == prefix]:
+                self.size -= len(self._items.pop(key))
+
+    def stats(self):
+        """
+        返回缓存统计信息
+
+        返回:
+            dict: 条目数、占用字节数和命中情况
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'items': len(self._items),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
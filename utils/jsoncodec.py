@@ -0,0 +1,40 @@
+import json
+
+# 优先使用 orjson（C实现，编码直接输出UTF-8字节），未安装时使用标准库 json
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(obj):
+    """
+    将对象编码为JSON文本（保留中文，不转义为\\uXXXX）
+
+    参数:
+        obj: 可JSON序列化的对象
+
+    返回:
+        str: JSON文本
+    """
+    if orjson is not None:
+        return orjson.dumps(obj).decode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(text):
+    """
+    解析JSON文本
+
+    参数:
+        text (str | bytes): JSON文本
+
+    返回:
+        解析后的对象
+
+    异常:
+        ValueError: 文本不是合法的JSON（json.JSONDecodeError 和 orjson.JSONDecodeError 均为其子类）
+    """
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
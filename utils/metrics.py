@@ -0,0 +1,462 @@
+import atexit
+import bisect
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from utils import jsoncodec
+
+# 直方图默认的桶上界（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Metric:
+    """指标基类：按标签值保存样本，更新时只在本进程内存中加锁累加"""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        """
+        初始化指标并注册
+
+        参数:
+            name (str): 指标名称
+            documentation (str): 说明
+            labelnames (tuple): 标签名称
+            registry (MetricsRegistry): 注册表，默认使用全局注册表
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry or metrics_registry).register(self)
+
+    def _key(self, labels):
+        """由标签参数生成样本键（按标签名称顺序的标签值）"""
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f'指标 {self.name} 的标签应为 {self.labelnames}，实际为 {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """
+        返回本进程的样本快照
+
+        返回:
+            dict: 标签值元组 -> 样本值
+        """
+        with self._lock:
+            return {key: self._copy(value) for key, value in self._values.items()}
+
+    @staticmethod
+    def _copy(value):
+        """复制样本值"""
+        return value
+
+    @staticmethod
+    def _merge(total, value):
+        """合并两个进程的样本值"""
+        return total + value
+
+    def _reset(self):
+        """清空样本（fork 出的子进程不继承父进程的样本）"""
+        with self._lock:
+            self._values.clear()
+
+    def _render(self, lines, labels, value):
+        """输出一个样本的文本格式"""
+        lines.append(f'{self.name}{_format_labels(labels)} {_format_value(value)}')
+
+
+class Counter(_Metric):
+    """计数器（只增不减，多进程汇总时求和，已退出进程的计数保留）"""
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """
+        增加计数
+
+        参数:
+            amount (float): 增加的数量
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """仪表盘（可增可减的当前值，多进程汇总时只对仍在运行的进程求和）"""
+
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        """
+        增加当前值
+
+        参数:
+            amount (float): 增加的数量
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        """
+        减少当前值
+
+        参数:
+            amount (float): 减少的数量
+            **labels: 标签值
+        """
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        """
+        设置当前值
+
+        参数:
+            value (float): 当前值
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track(self, **labels):
+        """进入时加一、退出时减一（统计正在进行的操作数）"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    """直方图（各桶计数、总和与次数，多进程汇总时逐项求和）"""
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        """
+        初始化直方图
+
+        参数:
+            name (str): 指标名称
+            documentation (str): 说明
+            labelnames (tuple): 标签名称
+            buckets (tuple): 桶上界（升序，不含 +Inf）
+            registry (MetricsRegistry): 注册表，默认使用全局注册表
+        """
+        self.buckets = tuple(float(bound) for bound in buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        """
+        记录一次观测值
+
+        参数:
+            value (float): 观测值
+            **labels: 标签值
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            sample = self._values.get(key)
+            if sample is None:
+                # 各桶（最后一个为 +Inf）的非累计计数 + [总和, 次数]
+                sample = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            sample[index] += 1
+            sample[-2] += value
+            sample[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块的执行耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def _copy(value):
+        return list(value)
+
+    @staticmethod
+    def _merge(total, value):
+        if len(total) != len(value):
+            # 桶定义不同（进程使用了不同版本的代码），保留已有的值
+            return total
+        return [a + b for a, b in zip(total, value)]
+
+    def _render(self, lines, labels, value):
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), value):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_format_labels(labels, ("le", _format_value(bound)))} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(labels)} {_format_value(value[-2])}')
+        lines.append(f'{self.name}_count{_format_labels(labels)} {value[-1]}')
+
+
+def _escape(value):
+    """转义标签值中的反斜杠、双引号和换行"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    """格式化标签，labels 为 ((名称, 值), ...)"""
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    """格式化样本值"""
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return f'{value:.1f}'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _pid_alive(pid):
+    """判断进程是否仍在运行"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class MetricsRegistry:
+    """指标注册表
+
+    单进程时直接输出内存中的样本。设置了快照目录时（gunicorn 等多进程部署），
+    每个进程定期把自己的样本写入目录中的快照文件（写入临时文件后原子替换），
+    输出时汇总目录中所有进程的快照：计数器和直方图保留已退出进程的值，仪表盘只统计仍在运行的进程。
+    更新指标只在本进程内存中进行，不涉及文件和进程间通信。
+    """
+
+    def __init__(self):
+        """初始化注册表"""
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.directory = None
+        self.flush_interval = 5.0
+        self._token = uuid.uuid4().hex[:8]
+        self._thread = None
+        self._stopping = threading.Event()
+
+    def register(self, metric):
+        """
+        注册指标
+
+        参数:
+            metric (_Metric): 指标
+
+        异常:
+            ValueError: 指标名称重复
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'指标 {metric.name} 已注册')
+            self._metrics[metric.name] = metric
+
+    def configure(self, directory, flush_interval=5.0):
+        """
+        设置快照目录并启动定期写入线程
+
+        参数:
+            directory (str): 快照目录，为空时只统计本进程
+            flush_interval (float): 写入间隔（秒）
+        """
+        self.directory = directory or None
+        self.flush_interval = flush_interval
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            self._start()
+
+    @property
+    def path(self):
+        """本进程的快照文件路径"""
+        return os.path.join(self.directory, f'{os.getpid()}-{self._token}.json')
+
+    def _start(self):
+        """启动定期写入线程（每个进程一个）"""
+        if self._thread is not None:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True)
+        self._thread.start()
+
+    def _flush_loop(self):
+        """定期写入快照"""
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.write()
+            except OSError:
+                pass
+
+    def _after_fork(self):
+        """fork 出的子进程：清空继承的样本，使用新的快照文件并重新启动写入线程"""
+        for metric in list(self._metrics.values()):
+            metric._reset()
+            metric._lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex[:8]
+        self._thread = None
+        self._stopping = threading.Event()
+        if self.directory:
+            self._start()
+
+    def snapshot(self):
+        """
+        返回本进程所有指标的样本
+
+        返回:
+            dict: 指标名称 -> 标签值元组 -> 样本值
+        """
+        return {name: metric.samples() for name, metric in list(self._metrics.items())}
+
+    def write(self, dead=False):
+        """
+        将本进程的样本写入快照文件
+
+        参数:
+            dead (bool): 进程即将退出，汇总时不再统计其仪表盘
+        """
+        if not self.directory:
+            return
+        data = {
+            'pid': os.getpid(),
+            'dead': dead,
+            'metrics': {name: [[list(key), value] for key, value in samples.items()]
+                        for name, samples in self.snapshot().items() if samples}
+        }
+        path = self.path
+        temp = f'{path}.tmp'
+        with open(temp, 'w', encoding='utf-8') as f:
+            f.write(jsoncodec.dumps(data))
+        os.replace(temp, path)
+
+    def _read_snapshots(self):
+        """读取其他进程的快照文件"""
+        own = os.path.basename(self.path)
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        snapshots = []
+        for name in names:
+            if not name.endswith('.json') or name == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    snapshots.append(jsoncodec.loads(f.read()))
+            except (OSError, ValueError):
+                # 文件正在被替换或已被删除
+                continue
+        return snapshots
+
+    def collect(self):
+        """
+        汇总本进程和其他进程的样本
+
+        返回:
+            dict: 指标名称 -> 标签值元组 -> 样本值
+        """
+        merged = self.snapshot()
+        if not self.directory:
+            return merged
+        for snapshot in self._read_snapshots():
+            alive = not snapshot.get('dead') and _pid_alive(snapshot.get('pid', 0))
+            for name, samples in snapshot.get('metrics', {}).items():
+                metric = self._metrics.get(name)
+                if metric is None or (metric.type == 'gauge' and not alive):
+                    continue
+                values = merged.setdefault(name, {})
+                for key, value in samples:
+                    key = tuple(key)
+                    values[key] = metric._merge(values[key], value) if key in values else value
+        return merged
+
+    def render(self):
+        """
+        输出 Prometheus 文本格式（0.0.4）
+
+        返回:
+            str: 指标文本
+        """
+        merged = self.collect()
+        lines = []
+        for name, metric in list(self._metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.type}')
+            for key, value in sorted(merged.get(name, {}).items()):
+                metric._render(lines, tuple(zip(metric.labelnames, key)), value)
+        return '\n'.join(lines) + '\n'
+
+    def shutdown(self):
+        """停止写入线程并写入最后一次快照（进程退出时调用）"""
+        self._stopping.set()
+        try:
+            self.write(dead=True)
+        except OSError:
+            pass
+
+
+def mark_process_dead(pid, directory):
+    """
+    将已退出进程的快照标记为已退出，汇总时不再统计其仪表盘（进程号被复用时也不会误计）
+
+    参数:
+        pid (int): 进程号
+        directory (str): 快照目录
+    """
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if not name.startswith(f'{pid}-') or not name.endswith('.json'):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = jsoncodec.loads(f.read())
+            data['dead'] = True
+            with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+                f.write(jsoncodec.dumps(data))
+            os.replace(f'{path}.tmp', path)
+        except (OSError, ValueError):
+            continue
+
+
+def clear_directory(directory):
+    """
+    删除快照目录中上次运行留下的快照文件（服务启动时调用）
+
+    参数:
+        directory (str): 快照目录
+    """
+    if not directory or not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith(('.json', '.tmp')):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
+
+
+# 全局注册表
+metrics_registry = MetricsRegistry()
+os.register_at_fork(after_in_child=metrics_registry._after_fork)
+atexit.register(metrics_registry.shutdown)
@@ -0,0 +1,70 @@
+from sqlalchemy import inspect, text
+from utils.logger import setup_logger
+
+# 设置日志
+logger = setup_logger(__name__)
+
+
+def _column_ddl(column, dialect):
+    """
+    生成 ALTER TABLE ADD COLUMN 使用的列定义
+
+    参数:
+        column (Column): 模型中的列
+        dialect: 数据库方言
+
+    返回:
+        str: 列定义，如 "yongshen_text VARCHAR(255)"
+    """
+    ddl = f'{column.name} {column.type.compile(dialect=dialect)}'
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        if isinstance(default, bool):
+            default = int(default)
+        ddl += f' DEFAULT {default!r}' if isinstance(default, str) else f' DEFAULT {default}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    return ddl
+
+
+def ensure_schema(db):
+    """
+    补齐已存在的表中缺少的列和索引
+
+    db.create_all() 只会创建不存在的表，已有表新增的列和索引需要在这里补上。
+    新增列必须可为空或带有默认值。需要在应用上下文中调用。
+
+    参数:
+        db (SQLAlchemy): 数据库对象
+
+    返回:
+        list: 执行的变更说明
+    """
+    engine = db.engine
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    changes = []
+
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            ddl = _column_ddl(column, engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {ddl}'))
+            changes.append(f'{table.name}.{column.name}')
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            index.create(bind=engine, checkfirst=True)
+            changes.append(index.name)
+
+    for change in changes:
+        logger.info(f'数据库结构已更新: {change}')
+    return changes
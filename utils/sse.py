@@ -0,0 +1,45 @@
+import json
+from flask import Response
+
+# SSE心跳间隔（秒），同时用于及时发现客户端断开
+KEEPALIVE_INTERVAL = 15
+
+
+def format_sse(event, data):
+    """
+    格式化一条Server-Sent Events消息
+
+    参数:
+        event (str): 事件名称
+        data (dict): 事件数据，将以JSON格式发送
+
+    返回:
+        str: SSE消息文本
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def format_keepalive():
+    """
+    格式化SSE心跳注释行
+
+    返回:
+        str: SSE注释文本
+    """
+    return ': keepalive\n\n'
+
+
+def sse_response(generator):
+    """
+    创建SSE响应
+
+    参数:
+        generator: 生成SSE消息文本的生成器
+
+    返回:
+        Response: text/event-stream 响应，禁用缓存和反向代理缓冲
+    """
+    return Response(generator, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
@@ -0,0 +1,29 @@
+import threading
+
+# 已注册的统计信息提供函数
+_providers = {}
+_lock = threading.Lock()
+
+
+def register_stats(name, provider):
+    """
+    注册统计信息提供函数
+
+    参数:
+        name (str): 统计项名称，如 'llm_cache'
+        provider (callable): 无参数函数，返回可JSON序列化的统计数据
+    """
+    with _lock:
+        _providers[name] = provider
+
+
+def collect_stats():
+    """
+    收集所有已注册的统计信息
+
+    返回:
+        dict: 统计项名称 -> 统计数据
+    """
+    with _lock:
+        providers = dict(_providers)
+    return {name: provider() for name, provider in providers.items()}
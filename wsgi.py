@@ -0,0 +1,9 @@
+# 生产环境WSGI入口
+# 该文件创建供WSGI服务器加载的应用对象，不执行建表（部署时先运行 flask --app app init-db）。
+# 推荐使用 gunicorn 加载：gunicorn -c gunicorn.conf.py wsgi:app
+# 异步解卦任务工作线程由 gunicorn.conf.py 在各工作进程 fork 之后启动；
+# 使用其他WSGI服务器时可设置 JOB_WORKERS=0，并通过 python jobs.py 单独运行任务进程。
+
+from app import create_app
+
+app = create_app(start_workers=False)